@@ -0,0 +1 @@
+"""Benchmarks and local stand-ins for the services the ops scripts talk to."""
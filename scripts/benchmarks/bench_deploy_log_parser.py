@@ -0,0 +1,109 @@
+"""Peak RSS and throughput of the streaming deployment log parser.
+
+Generates synthetic ``deployment.log`` files at each requested size and
+parses them in a fresh subprocess per approach, so ``ru_maxrss`` reflects
+only that approach.  For the ``mmap`` approach that figure includes
+file-backed page cache mapped into the process, which the kernel can drop
+at any time, unlike the heap the ``legacy`` approach allocates:
+
+    python scripts/benchmarks/bench_deploy_log_parser.py --sizes 100M 1G 5G
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from benchmarks.synthetic import deploy_log_lines, write_lines
+
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    text = text.upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def run_legacy(path):
+    # The previous implementation: whole-file read plus two findall passes
+    with open(path, 'r') as file:
+        log_content = file.read()
+    stages = re.findall(r'\[DEPLOY\] (.*?) - Started at (.*?) - Completed at (.*?)', log_content)
+    errors = re.findall(r'ERROR: (.*?)', log_content)
+    return len(stages), len(errors)
+
+
+def run_streaming(path):
+    from emrnext_ops.deploy_log import DeploymentLogAccumulator, parse_events, read_lines
+    accumulator = DeploymentLogAccumulator(lambda start, end: None)
+    accumulator.consume(parse_events(read_lines(path)))
+    return len(accumulator.stages), accumulator.error_count
+
+
+def run_mmap(path):
+    from emrnext_ops.deploy_log import DeploymentLogAccumulator, scan_log
+    accumulator = DeploymentLogAccumulator(lambda start, end: None)
+    accumulator.consume(scan_log(path))
+    return len(accumulator.stages), accumulator.error_count
+
+
+APPROACHES = {'legacy': run_legacy, 'streaming': run_streaming, 'mmap': run_mmap}
+
+
+def measure(approach, path):
+    # Re-invoke this file in a child so peak RSS is isolated per approach
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', approach, path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    child = json.loads(output)
+    return child['elapsed'], child['peak_rss_kb']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['100M'])
+    parser.add_argument('--approaches', nargs='+', default=list(APPROACHES), choices=list(APPROACHES))
+    parser.add_argument('--child', nargs=2, metavar=('APPROACH', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        approach, path = args.child
+        started = time.perf_counter()
+        APPROACHES[approach](path)
+        print(json.dumps({
+            "elapsed": time.perf_counter() - started,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        }))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            path = os.path.join(workdir, 'deployment.log')
+            written = write_lines(path, deploy_log_lines(), parse_size(size))
+            for approach in args.approaches:
+                elapsed, peak_rss_kb = measure(approach, path)
+                results.append({
+                    "approach": approach,
+                    "size_bytes": written,
+                    "wall_s": round(elapsed, 3),
+                    "throughput_mb_s": round(written / UNITS['M'] / elapsed, 1),
+                    "peak_rss_kb": peak_rss_kb
+                })
+            os.remove(path)
+
+    print(json.dumps({"benchmark": "deploy_log_parser", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
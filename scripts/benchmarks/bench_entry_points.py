@@ -0,0 +1,212 @@
+"""Wall time, peak RSS and syscalls of every report entry point.
+
+For each scale, generates a synthetic ``/var/log/emrnext`` tree. It then
+starts local stand-ins for the remote services. The Railway URLs become an
+HTTPS stub with a certificate from a throwaway CA, and Prometheus becomes a
+``FakePrometheus``. Each entry point runs in a fresh subprocess, so every
+measurement starts from a cold interpreter. A measurement records:
+
+* ``wall_s``, ``user_s`` and ``sys_s``, including imports;
+* ``peak_rss_kb``: ``ru_maxrss`` of the entry point process;
+  ``children_peak_rss_kb`` is its largest worker process;
+* ``read_syscalls`` and ``write_syscalls``, with ``read_bytes`` and
+  ``write_bytes``: the read/write family counted in ``/proc/self/io``
+  (Linux only, entry point process only);
+* voluntary and involuntary context switches.
+
+The JSON document goes to stdout. ``--output`` also appends it as a single
+line, so results from successive commits can be compared:
+
+    python scripts/benchmarks/bench_entry_points.py --scales small medium --output bench.ndjson
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from benchmarks.stubs import FakePrometheus, StubHTTPServer, make_test_ca, server_tls_context
+from benchmarks.synthetic import SCALES, build_log_tree
+from emrnext_ops.loader import load_script
+
+# Paths served by the Railway stand-in
+RAILWAY_ROUTES = {'/': (200, b'<html></html>'), '/api/health': (200, b'ok'), '/api/db-health': (200, b'ok')}
+
+
+def redirect_health_targets(railway_url, log_dir):
+    # Point the health checker's Railway, external and TLS targets at the stub
+    checker = load_script('system-health-checker.py').SystemHealthChecker
+    checker.services = [
+        {"name": service['name'], "url": railway_url + (urlsplit(service['url']).path or '/')}
+        for service in checker.services
+    ]
+    checker.external_sites = [f"{railway_url}/external/{index}" for index in range(len(checker.external_sites))]
+    checker.ssl_targets = [urlsplit(railway_url).netloc]
+    checker.tls_cache_path = None
+    checker.report_dir = log_dir
+
+
+def prometheus_client(endpoints):
+    from emrnext_ops.prometheus import PrometheusClient
+    return PrometheusClient(endpoints['prometheus'], timeout=5)
+
+
+def run_deployment_log_analyzer(log_dir, endpoints):
+    # Log at INFO as main() does, but inside the synthetic tree
+    logging.basicConfig(filename=os.path.join(log_dir, 'deployment_analysis.log'), level=logging.INFO)
+    analyzer = load_script('deployment-log-analyzer.py').DeploymentAnalyzer(
+        os.path.join(log_dir, 'deployment.log'), history_path=os.path.join(log_dir, 'stage_history.json')
+    )
+    analyzer.parse_deployment_log()
+    analyzer.generate_deployment_report(os.path.join(log_dir, 'deployment_report.md'))
+
+
+def run_deployment_readiness_report(log_dir, endpoints):
+    load_script('deployment-readiness-report.py').DeploymentReadinessReport(log_dir).create_report()
+
+
+def run_continuous_improvement(log_dir, endpoints):
+    load_script('continuous-improvement.py').ContinuousImprovementAnalyzer(
+        log_dir=log_dir, prometheus=prometheus_client(endpoints)
+    ).generate_improvement_report()
+
+
+def run_system_health_checker(log_dir, endpoints):
+    redirect_health_targets(endpoints['railway'], log_dir)
+    load_script('system-health-checker.py').SystemHealthChecker().generate_health_report()
+
+
+def run_generate_reports(log_dir, endpoints):
+    logging.basicConfig(filename=os.path.join(log_dir, 'deployment_analysis.log'), level=logging.INFO)
+    redirect_health_targets(endpoints['railway'], log_dir)
+    load_script('generate-reports.py').ReportPipeline(log_dir, prometheus=prometheus_client(endpoints)).run()
+
+
+ENTRY_POINTS = {
+    'deployment-log-analyzer': run_deployment_log_analyzer,
+    'deployment-readiness-report': run_deployment_readiness_report,
+    'continuous-improvement': run_continuous_improvement,
+    'system-health-checker': run_system_health_checker,
+    'generate-reports': run_generate_reports
+}
+
+
+def proc_io():
+    # Read/write syscall counters of this process; None where /proc has no io file
+    try:
+        with open('/proc/self/io', 'r') as io:
+            return {key: int(value) for key, value in (line.split(': ') for line in io)}
+    except OSError:
+        return None
+
+
+def run_child(entry_point, log_dir, endpoints):
+    io_before = proc_io()
+    started = time.perf_counter()
+    # The entry points report progress on stdout, which carries our result
+    with contextlib.redirect_stdout(sys.stderr):
+        ENTRY_POINTS[entry_point](log_dir, endpoints)
+    wall = time.perf_counter() - started
+    io_after = proc_io()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    result = {
+        "wall_s": round(wall, 4),
+        "user_s": round(usage.ru_utime + children.ru_utime, 4),
+        "sys_s": round(usage.ru_stime + children.ru_stime, 4),
+        "peak_rss_kb": usage.ru_maxrss,
+        "children_peak_rss_kb": children.ru_maxrss,
+        "voluntary_ctx_switches": usage.ru_nvcsw,
+        "involuntary_ctx_switches": usage.ru_nivcsw
+    }
+    for name, key in (('read_syscalls', 'syscr'), ('write_syscalls', 'syscw'),
+                      ('read_bytes', 'rchar'), ('write_bytes', 'wchar')):
+        result[name] = io_after[key] - io_before[key] if io_before and io_after else None
+    return result
+
+
+def measure(entry_point, log_dir, endpoints, env):
+    # Re-invoke this file in a child so every entry point starts cold
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', entry_point, log_dir, json.dumps(endpoints)],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPTS_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scales, entry_points, repeat=1, workdir=None):
+    """Measure ``entry_points`` on a fresh tree per scale; the fastest of ``repeat`` runs is kept."""
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        ca_file, cert_file, key_file = make_test_ca(tmp)
+        # Both the ssl module and requests trust the throwaway CA in the children
+        env = dict(os.environ, SSL_CERT_FILE=ca_file, REQUESTS_CA_BUNDLE=ca_file)
+        performance_queries = load_script('continuous-improvement.py').PERFORMANCE_QUERIES
+        railway = StubHTTPServer(RAILWAY_ROUTES, tls_context=server_tls_context(cert_file, key_file))
+        prometheus = FakePrometheus(expressions={query: 250 for query in performance_queries.values()})
+        with railway, prometheus:
+            endpoints = {'railway': railway.url, 'prometheus': prometheus.url}
+            for scale in scales:
+                log_dir = os.path.join(tmp, scale)
+                tree_bytes = build_log_tree(log_dir, **SCALES[scale])
+                for entry_point in entry_points:
+                    runs = [measure(entry_point, log_dir, endpoints, env) for _ in range(repeat)]
+                    results.append({
+                        "entry_point": entry_point,
+                        "scale": scale,
+                        "tree_bytes": tree_bytes,
+                        **min(runs, key=lambda run: run['wall_s'])
+                    })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', default=['small'], choices=list(SCALES))
+    parser.add_argument('--entry-points', nargs='+', default=list(ENTRY_POINTS), choices=list(ENTRY_POINTS))
+    parser.add_argument('--repeat', type=int, default=1, help='runs per entry point; the fastest is kept')
+    parser.add_argument('--workdir', default=None, help='where the synthetic trees are generated')
+    parser.add_argument('--output', help='append the results as one JSON line to this file')
+    parser.add_argument('--child', nargs=3, metavar=('ENTRY_POINT', 'LOG_DIR', 'ENDPOINTS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        entry_point, log_dir, endpoints = args.child
+        print(json.dumps(run_child(entry_point, log_dir, json.loads(endpoints))))
+        return
+
+    document = {
+        "benchmark": "entry_points",
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "results": run_benchmarks(args.scales, args.entry_points, args.repeat, args.workdir)
+    }
+    if args.output:
+        with open(args.output, 'a') as out:
+            out.write(json.dumps(document) + '\n')
+    print(json.dumps(document, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare the native error scanner with the former shell pipeline.
+
+Builds a synthetic log directory whose timestamps span the last 36 hours
+and times both the ``grep | awk | grep | sort | uniq -c`` pipeline and
+``emrnext_ops.error_scan.scan_error_logs`` over it.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import error_log_lines, write_lines
+from emrnext_ops.error_scan import scan_error_logs
+
+# As formerly run by analyze_error_logs. With several files grep prefixes
+# each match with its file name, so the date filter drops every line; the
+# "-h" variant is what the pipeline meant to compute (still without the
+# 24 hour window) and is the fair comparison.
+SHELL_PIPELINE = (
+    "grep {grep_flags} -E 'ERROR|CRITICAL' {log_dir}/* | "
+    "awk '{{print $1, $2, $3, $4, $5}}' | "
+    "grep -E '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}' | "
+    "sort | uniq -c"
+)
+
+
+def build_log_dir(log_dir, files, size_mb):
+    start = datetime.now() - timedelta(hours=36)
+    for index in range(files):
+        write_lines(os.path.join(log_dir, f"service-{index}.log"),
+                    error_log_lines(start=start, seed=index), size_mb * 1024 * 1024)
+
+
+def time_call(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--size-mb', type=int, default=32, help='size of each synthetic log file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        build_log_dir(log_dir, args.files, args.size_mb)
+        paths = sorted(glob.glob(os.path.join(log_dir, '*')))
+        cutoff = datetime.now() - timedelta(hours=24)
+
+        shell_s = time_call(lambda: subprocess.run(
+            SHELL_PIPELINE.format(grep_flags='', log_dir=log_dir), shell=True, capture_output=True
+        ))
+        shell_h_s = time_call(lambda: subprocess.run(
+            SHELL_PIPELINE.format(grep_flags='-h', log_dir=log_dir), shell=True, capture_output=True
+        ))
+        native_s = time_call(lambda: scan_error_logs(paths, cutoff=cutoff, max_workers=args.workers))
+        single_s = time_call(lambda: scan_error_logs(paths, cutoff=cutoff, max_workers=1))
+
+    print(json.dumps({
+        "benchmark": "error_scan",
+        "files": args.files,
+        "total_mb": args.files * args.size_mb,
+        "shell_pipeline_s": round(shell_s, 3),
+        "shell_pipeline_no_filenames_s": round(shell_h_s, 3),
+        "native_single_process_s": round(single_s, 3),
+        "native_parallel_s": round(native_s, 3),
+        "workers": args.workers
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
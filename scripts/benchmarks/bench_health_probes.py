@@ -0,0 +1,61 @@
+"""Compare sequential ``requests.get`` probing with the concurrent ProbeEngine.
+
+Runs against a local stub HTTP server so results do not depend on the
+network.  Prints one JSON document with wall times for both approaches.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.stubs import StubHTTPServer
+from emrnext_ops.probes import ProbeEngine
+
+
+def bench_sequential(urls, timeout):
+    started = time.perf_counter()
+    for url in urls:
+        requests.get(url, timeout=timeout)
+    return time.perf_counter() - started
+
+
+def bench_concurrent(urls, timeout, rounds):
+    engine = ProbeEngine(max_workers=len(urls))
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        engine.run({url: (lambda url=url: engine.http_probe(url, timeout)) for url in urls}, deadline=timeout * 2)
+        timings.append(time.perf_counter() - started)
+    engine.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--probes', type=int, default=6)
+    parser.add_argument('--delay', type=float, default=0.2, help='stub server latency per request (s)')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    with StubHTTPServer(delay=args.delay) as server:
+        urls = [f"{server.url}/probe/{i}" for i in range(args.probes)]
+        sequential = [bench_sequential(urls, 5) for _ in range(args.rounds)]
+        concurrent = bench_concurrent(urls, 5, args.rounds)
+
+    print(json.dumps({
+        "benchmark": "health_probes",
+        "probes": args.probes,
+        "stub_delay_s": args.delay,
+        "sequential_s": min(sequential),
+        "concurrent_s": min(concurrent),
+        "speedup": round(min(sequential) / min(concurrent), 2)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
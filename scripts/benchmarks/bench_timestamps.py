@@ -0,0 +1,85 @@
+"""Microbenchmark for stage timestamp parsing.
+
+Times computing stage durations from ``[DEPLOY]`` timestamp pairs with
+``datetime.strptime`` (as ``_calculate_duration`` used to), with the
+scalar fast path in ``emrnext_ops.timestamps`` and with its NumPy batch
+conversion.  Prints one JSON document with the best time per approach.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emrnext_ops.timestamps import TIMESTAMP_FORMAT, duration_seconds, durations
+
+
+def stage_pairs(count, days, seed=0):
+    rng = random.Random(seed)
+    moment = datetime(2024, 1, 1)
+    step = timedelta(days=days) / count
+    starts, ends = [], []
+    for _ in range(count):
+        moment += step
+        starts.append(moment.strftime(TIMESTAMP_FORMAT))
+        ends.append((moment + timedelta(seconds=rng.randint(5, 600))).strftime(TIMESTAMP_FORMAT))
+    return starts, ends
+
+
+def with_strptime(starts, ends):
+    return [
+        (datetime.strptime(end, TIMESTAMP_FORMAT) - datetime.strptime(start, TIMESTAMP_FORMAT)).total_seconds()
+        for start, end in zip(starts, ends)
+    ]
+
+
+def with_fast_path(starts, ends):
+    return [duration_seconds(start, end) for start, end in zip(starts, ends)]
+
+
+def with_numpy(starts, ends):
+    return durations(starts, ends)
+
+
+def best_of(function, rounds, *args):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stages', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=730, help='span of the timestamps (distinct dates)')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    starts, ends = stage_pairs(args.stages, args.days)
+    results = {}
+    expected = None
+    for name, function in (('strptime', with_strptime), ('fast_path', with_fast_path), ('numpy', with_numpy)):
+        seconds, values = best_of(function, args.rounds, starts, ends)
+        expected = values if expected is None else expected
+        if values != expected:
+            raise SystemExit(f"{name} disagrees with strptime")
+        results[name] = seconds
+
+    print(json.dumps({
+        "benchmark": "timestamps",
+        "stages": args.stages,
+        "distinct_dates": args.days,
+        **{f"{name}_s": round(seconds, 4) for name, seconds in results.items()},
+        "fast_path_speedup": round(results['strptime'] / results['fast_path'], 2),
+        "numpy_speedup": round(results['strptime'] / results['numpy'], 2)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
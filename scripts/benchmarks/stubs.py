@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import ssl
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    routes = {}
+    delay = 0
+    received = None
+    received_headers = None
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.received.append((self.command, self.path, body))
+        self.received_headers.append(dict(self.headers))
+        url = urlsplit(self.path)
+        route = self.routes.get(url.path, self.routes.get(self.path, (200, b'ok')))
+        # Callable routes get the query parameters and build the response
+        status, body, *headers = route({key: values[-1] for key, values in parse_qs(url.query).items()}) \
+            if callable(route) else route
+        self.send_response(status)
+        for name, value in (headers[0] if headers else {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_PUT = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer:
+    """Local HTTP server answering canned responses, optionally after a delay.
+
+    ``routes`` maps a path to ``(status, body)`` or to a callable taking the
+    query parameters and returning ``(status, body)``; a third item, a dict,
+    adds response headers.  Every request is recorded in ``received`` as
+    ``(method, path, body)`` and its headers in ``headers``.
+    """
+
+    def __init__(self, routes=None, delay=0, tls_context=None):
+        self.received = []
+        self.headers = []
+        handler = type('Handler', (StubHandler,), {'routes': routes or {}, 'delay': delay, 'received': self.received,
+                                                   'received_headers': self.headers})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.scheme = 'http'
+        if tls_context is not None:
+            self.server.socket = tls_context.wrap_socket(self.server.socket, server_side=True)
+            self.scheme = 'https'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def url(self):
+        host = 'localhost' if self.scheme == 'https' else '127.0.0.1'
+        return f"{self.scheme}://{host}:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+_MATCHER_PATTERN = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*(=~|=)\s*"([^"]*)"\s*,?')
+
+
+class FakePrometheus(StubHTTPServer):
+    """Stub answering the Prometheus query API from in-memory series.
+
+    ``series`` is a list of ``(labels, value)`` with the metric name under
+    ``__name__``; plain selectors with ``=`` and ``=~`` matchers are evaluated
+    against it.  Any other expression is looked up in ``expressions``
+    (``{expr: value}``) and answers an empty vector when unknown.  Every
+    query received is appended to ``queries``.
+    """
+
+    def __init__(self, series=(), expressions=None, delay=0):
+        self.series = list(series)
+        self.expressions = expressions or {}
+        self.queries = []
+        ok = (200, json.dumps({'status': 'success', 'data': {}}).encode())
+        super().__init__({
+            '/-/healthy': (200, b'Prometheus is Healthy.\n'),
+            '/api/v1/query': self._instant,
+            '/api/v1/query_range': self._range,
+            '/api/v1/rules': (200, json.dumps({'status': 'success', 'data': {'groups': []}}).encode()),
+            '/api/v1/status/config': ok
+        }, delay=delay)
+
+    def _select(self, expr):
+        match = re.match(r'^\s*([a-zA-Z_:][a-zA-Z0-9_:]*)?\s*(?:\{(.*)\})?\s*$', expr)
+        if not match or not (match.group(1) or match.group(2)):
+            value = self.expressions.get(expr)
+            return [] if value is None else [({}, value)]
+        matchers = [('__name__', '=', match.group(1))] if match.group(1) else []
+        matchers += _MATCHER_PATTERN.findall(match.group(2) or '')
+        selected = []
+        for labels, value in self.series:
+            if all(
+                re.fullmatch(expected, labels.get(name, '')) if op == '=~' else labels.get(name) == expected
+                for name, op, expected in matchers
+            ):
+                selected.append((labels, value))
+        return selected
+
+    def _respond(self, result_type, result):
+        payload = {'status': 'success', 'data': {'resultType': result_type, 'result': result}}
+        return 200, json.dumps(payload).encode()
+
+    def _instant(self, params):
+        self.queries.append(params['query'])
+        at = float(params.get('time', time.time()))
+        return self._respond('vector', [
+            {'metric': labels, 'value': [at, str(value)]} for labels, value in self._select(params['query'])
+        ])
+
+    def _range(self, params):
+        self.queries.append(params['query'])
+        start, end, step = float(params['start']), float(params['end']), float(params['step'])
+        steps = [start + step * index for index in range(int((end - start) // step) + 1)]
+        return self._respond('matrix', [
+            {'metric': labels, 'values': [[at, str(value)] for at in steps]}
+            for labels, value in self._select(params['query'])
+        ])
+
+
+def _openssl(*args, cwd):
+    subprocess.run(['openssl', *args], cwd=cwd, check=True, capture_output=True)
+
+
+def make_test_ca(directory, days=30):
+    """Create a throwaway CA and a ``localhost`` certificate it signed, using the openssl CLI.
+
+    Returns ``(ca_file, cert_file, key_file)``.
+    """
+    _openssl('req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', 'ca.key', '-out', 'ca.pem',
+             '-days', str(days), '-subj', '/CN=EMRNext Test CA', cwd=directory)
+    _openssl('req', '-newkey', 'rsa:2048', '-nodes', '-keyout', 'server.key', '-out', 'server.csr',
+             '-subj', '/CN=localhost', cwd=directory)
+    with open(os.path.join(directory, 'san.ext'), 'w') as ext:
+        ext.write('subjectAltName=DNS:localhost,IP:127.0.0.1\n')
+    _openssl('x509', '-req', '-in', 'server.csr', '-CA', 'ca.pem', '-CAkey', 'ca.key', '-CAcreateserial',
+             '-out', 'server.pem', '-days', str(days), '-extfile', 'san.ext', cwd=directory)
+    return tuple(os.path.join(directory, name) for name in ('ca.pem', 'server.pem', 'server.key'))
+
+
+def server_tls_context(cert_file, key_file):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    return context
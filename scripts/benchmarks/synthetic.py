@@ -0,0 +1,110 @@
+"""Generators for synthetic ``/var/log/emrnext`` content used by the benchmarks."""
+import json
+import os
+import random
+from itertools import chain
+from datetime import datetime, timedelta
+
+STAGES = ['checkout', 'restore', 'build', 'test', 'migrate', 'publish', 'deploy', 'verify']
+LEVELS = ['INFO'] * 90 + ['WARNING'] * 6 + ['ERROR'] * 3 + ['CRITICAL']
+
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def deploy_log_lines(start=None, seed=0):
+    """Endless stream of deployment log lines with ``[DEPLOY]`` stage markers."""
+    rng = random.Random(seed)
+    moment = start or datetime(2024, 1, 1)
+    stage_index = 0
+    while True:
+        moment += timedelta(seconds=rng.randint(0, 3))
+        roll = rng.random()
+        if roll < 0.01:
+            stage = STAGES[stage_index % len(STAGES)]
+            stage_index += 1
+            finished = moment + timedelta(seconds=rng.randint(5, 600))
+            yield (f"{_timestamp(moment)} [DEPLOY] {stage} - Started at {_timestamp(moment)}"
+                   f" - Completed at {_timestamp(finished)}\n")
+        elif roll < 0.015:
+            yield f"{_timestamp(moment)} ERROR: step {rng.randint(1, 50)} failed with exit code {rng.randint(1, 3)}\n"
+        else:
+            yield f"{_timestamp(moment)} INFO: worker {rng.randint(1, 16)} processed batch {rng.randint(1, 10 ** 6)}\n"
+
+
+def error_log_lines(start=None, seed=0):
+    """Endless stream of application log lines with mixed severities."""
+    rng = random.Random(seed)
+    moment = start or datetime(2024, 1, 1)
+    while True:
+        moment += timedelta(milliseconds=rng.randint(0, 2000))
+        level = rng.choice(LEVELS)
+        yield (f"{_timestamp(moment)} {level} [api-{rng.randint(1, 4)}] "
+               f"request {rng.randint(1, 10 ** 6)} handled in {rng.randint(1, 900)}ms\n")
+
+
+def write_lines(path, lines, size_bytes):
+    """Write lines from ``lines`` to ``path`` until at least ``size_bytes`` are written."""
+    written = 0
+    chunk = []
+    with open(path, 'w') as out:
+        for line in lines:
+            chunk.append(line)
+            written += len(line)
+            if len(chunk) >= 10000:
+                out.write(''.join(chunk))
+                chunk = []
+            if written >= size_bytes:
+                break
+        out.write(''.join(chunk))
+    return written
+
+
+# Sizes of the generated trees: deployment.log, number and size of service logs
+SCALES = {
+    'small': {'deploy_bytes': 1024 ** 2, 'error_logs': 2, 'error_log_bytes': 1024 ** 2},
+    'medium': {'deploy_bytes': 32 * 1024 ** 2, 'error_logs': 8, 'error_log_bytes': 16 * 1024 ** 2},
+    'large': {'deploy_bytes': 256 * 1024 ** 2, 'error_logs': 16, 'error_log_bytes': 64 * 1024 ** 2}
+}
+
+
+def deployment_metrics(start, seed=0):
+    """``deployment_metrics.json`` content: one entry per stage, the last one failed."""
+    rng = random.Random(seed)
+    stages = {}
+    moment = start
+    for index, stage in enumerate(STAGES):
+        finished = moment + timedelta(seconds=rng.randint(5, 600))
+        stages[stage] = {
+            "start": moment.isoformat(),
+            "end": finished.isoformat(),
+            "status": "Failed" if index == len(STAGES) - 1 else "Success"
+        }
+        moment = finished
+    return {"stages": stages}
+
+
+def build_log_tree(log_dir, deploy_bytes, error_logs, error_log_bytes, now=None):
+    """Fill ``log_dir`` like ``/var/log/emrnext``; log lines span the 36 hours before ``now``.
+
+    Returns the number of bytes written.
+    """
+    start = (now or datetime.now()) - timedelta(hours=36)
+    os.makedirs(log_dir, exist_ok=True)
+    versions = [f"{_timestamp(start)} INFO: {name} Version: 2.{index}.0\n"
+                for index, name in enumerate(('Backend', 'Frontend', 'Database'))]
+    written = write_lines(os.path.join(log_dir, 'deployment.log'),
+                          chain(versions, deploy_log_lines(start=start)), deploy_bytes)
+    for index in range(error_logs):
+        written += write_lines(os.path.join(log_dir, f"service-{index}.log"),
+                               error_log_lines(start=start, seed=index), error_log_bytes)
+
+    documents = {
+        'deployment_metrics.json': deployment_metrics(start),
+        'performance_metrics.json': {"response_time": 420, "database_query_time": 35, "error_rate": 0.4}
+    }
+    for name, document in documents.items():
+        with open(os.path.join(log_dir, name), 'w') as out:
+            written += out.write(json.dumps(document, indent=2))
+    return written
@@ -1,10 +1,68 @@
 import os
+import glob
 import json
-import subprocess
+import time
+import argparse
+from collections import Counter
 from datetime import datetime, timedelta
+from emrnext_ops.error_index import ErrorIndex, minute_from_bucket, minute_ordinal
+from emrnext_ops.error_scan import BUCKET_MINUTE, count_lines, is_log_file, scan_error_logs
+from emrnext_ops.json_stream import METRICS_PATHS, read_selected
+from emrnext_ops.prometheus import PrometheusClient, PrometheusError, sample_value
+from emrnext_ops.report_store import ReportStore
+from emrnext_ops.tailing import PositionStore
+from emrnext_ops.telemetry import Telemetry, add_arguments, from_arguments
+
+LOG_DIR = '/var/log/emrnext'
+ERROR_WINDOW_HOURS = 24
+
+# Error recommendation thresholds, evaluated on the error index
+ERROR_RATE_THRESHOLD = 1.0      # errors per minute over the last hour
+ERROR_TREND_THRESHOLD = 2.0     # last hour rate vs. the preceding 23 hours
+ERROR_TREND_MIN_ERRORS = 10     # ignore trends on a handful of errors
+
+# Live performance metrics (milliseconds), averaged over the last 5 minutes.
+# No service exports a database latency metric, so database_query_time only
+# comes from performance_metrics.json
+PERFORMANCE_QUERIES = {
+    "response_time": 'sum(rate(http_request_duration_milliseconds_sum[5m])) / sum(rate(http_request_duration_milliseconds_count[5m]))'
+}
+
+# Series whose deviation from their own history drives the performance and
+# resource recommendations (percent for CPU and memory)
+BASELINE_QUERIES = {
+    **PERFORMANCE_QUERIES,
+    "cpu_usage": 'rate(process_cpu_seconds_total[5m]) * 100',
+    "memory_usage": 'process_resident_memory_bytes / process_virtual_memory_bytes * 100'
+}
+BASELINE_DAYS = 7
+BASELINE_STEP = 60              # seconds; a week stays under Prometheus' 11000 points per series
+BASELINE_MIN_SAMPLES = 60       # an hour of history before a baseline is trusted
+ANOMALY_Z_SCORE = 3.0           # standard deviations above the EWMA baseline
+ANOMALY_SEASONAL_RATIO = 1.5    # times the median of the same minute on previous days
+
+# Static thresholds, used until a series has enough history for a baseline
+STATIC_THRESHOLDS = {
+    "response_time": 500,       # ms
+    "database_query_time": 200, # ms
+    "cpu_usage": 70,            # %
+    "memory_usage": 80          # %
+}
 
 class ContinuousImprovementAnalyzer:
-    def __init__(self):
+    def __init__(self, pos_file=None, log_dir=LOG_DIR, index_path=None, prometheus=None, telemetry=None,
+                 rules_path=None):
+        # With a position file error logs are scanned incrementally
+        self.pos_file = pos_file
+        self.log_dir = log_dir
+        # Minute-bucket error counts persisted between runs
+        self.index_path = index_path or os.path.join(log_dir, 'error_index.bin')
+        # PrometheusClient for live performance metrics; None uses the files only
+        self.prometheus = prometheus
+        # Phase timings and processed volumes of this run
+        self.telemetry = telemetry or Telemetry('continuous_improvement')
+        # Alert rules evaluated locally; None uses monitoring/alert-rules.yml
+        self.rules_path = rules_path
         self.improvement_report = {
             "timestamp": datetime.now().isoformat(),
             "performance_metrics": {},
@@ -12,45 +70,150 @@ class ContinuousImprovementAnalyzer:
             "optimization_recommendations": []
         }
 
-    def collect_performance_metrics(self):
+    def collect_performance_metrics(self, sources=None):
         # Collect performance metrics from various sources
         metrics_sources = [
-            "/var/log/emrnext/performance_metrics.json",
-            "/var/log/emrnext/deployment_metrics.json"
+            os.path.join(self.log_dir, "performance_metrics.json"),
+            os.path.join(self.log_dir, "deployment_metrics.json")
         ]
 
         for source in metrics_sources:
-            try:
-                with open(source, 'r') as metrics_file:
-                    metrics = json.load(metrics_file)
+            if sources is not None:
+                # Already read by the shared collection pass
+                metrics = sources.documents.get(os.path.basename(source))
+                if metrics is None:
+                    print(f"Metrics file not found: {source}")
+                else:
                     self.improvement_report['performance_metrics'].update(metrics)
+                continue
+            try:
+                # Only the keys used here; large files are streamed, not loaded whole
+                metrics = read_selected(source, METRICS_PATHS)
+                self.improvement_report['performance_metrics'].update(metrics)
             except FileNotFoundError:
                 print(f"Metrics file not found: {source}")
 
-    def analyze_error_logs(self):
-        # Analyze error logs from the past 24 hours
+        if self.prometheus is not None:
+            with self.telemetry.span('query_prometheus'):
+                self.improvement_report['performance_metrics'].update(self._query_performance_metrics())
+
+    def _query_performance_metrics(self):
+        # One batch for all metrics; live values take precedence over the files
         try:
-            # Use grep to find recent errors
-            error_log_cmd = (
-                "grep -E 'ERROR|CRITICAL' /var/log/emrnext/* | "
-                "awk '{print $1, $2, $3, $4, $5}' | "
-                "grep -E '^[0-9]{4}-[0-9]{2}-[0-9]{2}' | "
-                "sort | uniq -c"
-            )
-            
-            error_analysis = subprocess.check_output(
-                error_log_cmd, 
-                shell=True, 
-                text=True
-            )
+            results = self.prometheus.query_many(PERFORMANCE_QUERIES.values())
+        except PrometheusError as e:
+            print(f"Prometheus query failed: {e}")
+            return {}
+
+        metrics = {}
+        for name, query in PERFORMANCE_QUERIES.items():
+            value = sample_value(results[query][0]) if results[query] else None
+            # NaN (no traffic in the window) is left out rather than reported as 0
+            if value is not None:
+                metrics[name] = round(value, 3)
+        return metrics
+
+    def analyze_anomalies(self, now=None):
+        # Evaluate the alert rules and the baselines over the last week of
+        # Prometheus history, fetched as one batch of range queries
+        try:
+            from emrnext_ops.alert_rules import RULES_PATH, RuleEngine, SeriesStore, parse, selectors
+        except ImportError as e:
+            # numpy and PyYAML (scripts/requirements.txt); the static thresholds still apply
+            print(f"Anomaly detection unavailable ({e}); using static thresholds")
+            return
+        engine = RuleEngine.load(self.rules_path or RULES_PATH)
+        wanted = set(engine.selectors())
+        for query in BASELINE_QUERIES.values():
+            wanted.update(str(selector) for selector in selectors(parse(query)))
+
+        end = (now or time.time()) // BASELINE_STEP * BASELINE_STEP
+        try:
+            store = SeriesStore.from_prometheus(self.prometheus, sorted(wanted),
+                                                end - BASELINE_DAYS * 86400, end, BASELINE_STEP)
+        except PrometheusError as e:
+            print(f"Prometheus range query failed: {e}")
+            return
 
-            self.improvement_report['error_analysis'] = {
-                "error_frequency": error_analysis.strip().split('\n')
-            }
-        except subprocess.CalledProcessError:
-            self.improvement_report['error_analysis'] = {
-                "error_frequency": []
-            }
+        self.improvement_report['alerts'] = engine.evaluate(store)
+        self.improvement_report['anomalies'] = engine.baselines(store, BASELINE_QUERIES)
+        if engine.errors:
+            self.improvement_report['alert_rule_errors'] = engine.errors
+
+    def _exceeds_baseline(self, name):
+        # True/False once some series of the metric has enough history, else None
+        verdicts = [
+            (series['z_score'] is not None and series['z_score'] > ANOMALY_Z_SCORE) or
+            (series['seasonal_ratio'] is not None and series['seasonal_ratio'] > ANOMALY_SEASONAL_RATIO)
+            for series in self.improvement_report.get('anomalies', {}).get(name, [])
+            if series['samples'] >= BASELINE_MIN_SAMPLES
+        ]
+        return any(verdicts) if verdicts else None
+
+    def _needs_attention(self, name, value):
+        deviates = self._exceeds_baseline(name)
+        if deviates is None:
+            return (value or 0) > STATIC_THRESHOLDS[name]
+        return deviates
+
+    def _error_log_paths(self):
+        # Only log files; the index, pos file, reports and archives are skipped
+        own_files = [self.index_path] + ([self.pos_file] if self.pos_file else [])
+        return [
+            path for path in sorted(glob.glob(os.path.join(self.log_dir, '*.log*')))
+            if is_log_file(path) and not any(path.startswith(own) for own in own_files)
+        ]
+
+    def analyze_error_logs(self, sources=None):
+        # Analyze error logs from the past 24 hours
+        now = sources.collected_at if sources is not None else datetime.now()
+        window_start = now - timedelta(hours=ERROR_WINDOW_HOURS)
+        index = ErrorIndex.load(self.index_path)
+
+        if sources is not None:
+            # Counted by the shared collection pass over the same window
+            counts = sources.error_counts
+            index.replace_window(minute_ordinal(window_start), minute_ordinal(now), _by_minute(counts))
+        elif self.pos_file:
+            counts = self._scan_error_logs_incremental()
+            index.add(_by_minute(counts))
+        else:
+            paths = self._error_log_paths()
+            self.telemetry.count('error_log_bytes', sum(os.path.getsize(path) for path in paths))
+            counts = scan_error_logs(paths, cutoff=window_start, bucket_width=BUCKET_MINUTE)
+            index.replace_window(minute_ordinal(window_start), minute_ordinal(now), _by_minute(counts))
+        self.telemetry.count('error_lines', sum(counts.values()))
+        index.save(self.index_path)
+
+        now_minute = minute_ordinal(now)
+        window_minutes = ERROR_WINDOW_HOURS * 60
+        trend = index.trend(60, window_minutes - 60, now_minute)
+        self.improvement_report['error_analysis'] = {
+            "window_start": window_start.isoformat(),
+            **index.summary(window_minutes, bucket_minutes=60, now=now_minute),
+            "errors_last_hour": index.total(60, now_minute),
+            "rate_per_minute_1h": round(index.rate(60, now_minute), 3),
+            "rate_per_minute_24h": round(index.rate(window_minutes, now_minute), 3),
+            # None when there is no baseline to compare against
+            "trend_1h_vs_23h": None if trend is None or trend == float('inf') else round(trend, 2),
+            "critical_last_hour": index.count(60, now_minute, severity='CRITICAL')
+        }
+
+    def _scan_error_logs_incremental(self):
+        # Count only lines appended since the previous run; the error index
+        # holds the running totals
+        store = PositionStore(self.pos_file)
+        counts = Counter()
+
+        for path in self._error_log_paths():
+            tailer = store.tailer(path)
+            if not tailer.unchanged():
+                count_lines(tailer.read_lines(encoding=None), os.path.basename(path), None, counts, BUCKET_MINUTE)
+                self.telemetry.count('error_log_bytes', tailer.bytes_read)
+                tailer.commit()
+
+        store.save()
+        return counts
 
     def generate_optimization_recommendations(self):
         recommendations = []
@@ -59,55 +222,108 @@ class ContinuousImprovementAnalyzer:
         if 'performance_metrics' in self.improvement_report:
             perf_metrics = self.improvement_report['performance_metrics']
             
-            if perf_metrics.get('response_time', 0) > 500:  # ms
+            if self._needs_attention('response_time', perf_metrics.get('response_time')):
                 recommendations.append(
                     "Optimize backend response times by implementing caching"
                 )
             
-            if perf_metrics.get('database_query_time', 0) > 200:  # ms
+            if self._needs_attention('database_query_time', perf_metrics.get('database_query_time')):
                 recommendations.append(
                     "Review and optimize database query performance"
                 )
 
         # Error Mitigation Recommendations
         if 'error_analysis' in self.improvement_report:
-            errors = self.improvement_report['error_analysis'].get('error_frequency', [])
-            
-            if len(errors) > 10:
+            errors = self.improvement_report['error_analysis']
+
+            if errors.get('rate_per_minute_1h', 0) > ERROR_RATE_THRESHOLD:
                 recommendations.append(
                     "Conduct comprehensive error log analysis to identify recurring issues"
                 )
 
+            trend = errors.get('trend_1h_vs_23h')
+            if errors.get('errors_last_hour', 0) >= ERROR_TREND_MIN_ERRORS and (
+                trend is None or trend > ERROR_TREND_THRESHOLD
+            ):
+                recommendations.append(
+                    "Error rate is rising above the daily baseline; review recent deployments and changes"
+                )
+
+            for source, count in sorted(errors.get('critical_last_hour', {}).items()):
+                recommendations.append(
+                    f"Investigate {count} CRITICAL errors logged by {source} in the last hour"
+                )
+
         # Resource Utilization Recommendations
         system_resources = self.improvement_report.get('system_resources', {})
-        if system_resources.get('cpu_usage', 0) > 70:
+        if self._needs_attention('cpu_usage', system_resources.get('cpu_usage')):
             recommendations.append(
                 "Consider horizontal scaling or optimizing CPU-intensive processes"
             )
 
-        if system_resources.get('memory_usage', 0) > 80:
+        if self._needs_attention('memory_usage', system_resources.get('memory_usage')):
             recommendations.append(
                 "Implement memory profiling and optimize memory-intensive operations"
             )
 
+        # Alert rules firing on the local evaluation
+        firing = Counter(alert['alert'] for alert in self.improvement_report.get('alerts', [])
+                         if alert['state'] == 'firing')
+        summaries = {alert['alert']: alert['summary'] for alert in self.improvement_report.get('alerts', [])}
+        for name, count in sorted(firing.items()):
+            recommendations.append(
+                f"Resolve {name} ({summaries[name] or 'alert'}), firing for {count} series"
+            )
+
         self.improvement_report['optimization_recommendations'] = recommendations
 
-    def generate_improvement_report(self):
-        # Collect and analyze data
-        self.collect_performance_metrics()
-        self.analyze_error_logs()
-        self.generate_optimization_recommendations()
+    def generate_improvement_report(self, sources=None):
+        # Collect and analyze data; sources is a collection.SourceSnapshot
+        with self.telemetry.run():
+            with self.telemetry.span('collect_performance_metrics'):
+                self.collect_performance_metrics(sources)
+            with self.telemetry.span('analyze_error_logs'):
+                self.analyze_error_logs(sources)
+            if self.prometheus is not None:
+                with self.telemetry.span('analyze_anomalies'):
+                    self.analyze_anomalies()
+            with self.telemetry.span('generate_optimization_recommendations'):
+                self.generate_optimization_recommendations()
+        self.improvement_report['telemetry'] = self.telemetry.summary()
 
         # Save improvement report
-        report_path = f'/var/log/emrnext/continuous_improvement_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        with open(report_path, 'w') as report_file:
-            json.dump(self.improvement_report, report_file, indent=2)
+        ReportStore(os.path.join(self.log_dir, 'reports')).append('improvement', self.improvement_report)
 
         return self.improvement_report
 
-def main():
-    improvement_analyzer = ContinuousImprovementAnalyzer()
+def _by_minute(counts):
+    # (bucket, level, source) scanner keys -> (minute ordinal, level, source)
+    minutes = {}
+    by_minute = Counter()
+    for (bucket, level, source), count in counts.items():
+        if bucket not in minutes:
+            minutes[bucket] = minute_from_bucket(bucket)
+        by_minute[(minutes[bucket], level, source)] += count
+    return by_minute
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the EMRNext continuous improvement report")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only scan error log data appended since the previous incremental run")
+    parser.add_argument('--pos-file', default=os.path.join(LOG_DIR, 'error_analysis.pos'))
+    parser.add_argument('--prometheus-url', default=os.getenv('PROMETHEUS_URL', ''),
+                        help="Prometheus to read live performance metrics and baselines from "
+                             "(default: $PROMETHEUS_URL; without either, only the log files are used)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    improvement_analyzer = ContinuousImprovementAnalyzer(
+        pos_file=args.pos_file if args.incremental else None,
+        prometheus=PrometheusClient(args.prometheus_url, timeout=5) if args.prometheus_url else None,
+        telemetry=from_arguments('continuous_improvement', args)
+    )
     report = improvement_analyzer.generate_improvement_report()
+    improvement_analyzer.telemetry.export(args.metrics_file, args.pushgateway)
     print(json.dumps(report, indent=2))
 
 if __name__ == "__main__":
@@ -1,64 +1,165 @@
 import os
-import re
+import argparse
 import json
-from datetime import datetime
 import logging
+from emrnext_ops.deploy_log import DeploymentLogAccumulator, parse_events, scan_log
+from emrnext_ops.stage_history import StageHistory
+from emrnext_ops.tailing import PositionStore
+from emrnext_ops.telemetry import Telemetry, add_arguments, from_arguments
+from emrnext_ops.timestamps import duration_seconds
+
+HISTORY_PATH = '/var/log/emrnext/stage_history.json'
+ANALYSIS_LOG = '/var/log/emrnext/deployment_analysis.log'
 
 class DeploymentAnalyzer:
-    def __init__(self, log_file):
+    def __init__(self, log_file, pos_file=None, history_path=None, telemetry=None):
         self.log_file = log_file
+        # With a position file only bytes appended since the last run are parsed
+        self.pos_file = pos_file
+        # Duration sketches of every stage run seen so far, across deployments
+        self.history = StageHistory(history_path)
+        self.history_baseline = {}
+        # Phase timings and processed volumes of this run
+        self.telemetry = telemetry or Telemetry('deployment_analysis')
         self.deployment_metrics = {
             "start_time": None,
             "end_time": None,
             "total_duration": None,
             "stages": {},
             "errors": [],
+            "error_count": 0,
+            "stage_percentiles": {},
+            "stage_regressions": {},
             "status": "Pending"
         }
-        logging.basicConfig(filename='/var/log/emrnext/deployment_analysis.log', level=logging.INFO)
 
-    def parse_deployment_log(self):
+    def accumulator(self):
+        """An empty accumulator feeding this analyzer's stage history.
+
+        For a caller that scans the log itself (the shared collection pass)
+        and then hands the filled accumulator to :meth:`parse_deployment_log`.
+        """
+        # Judge this deployment against the history as it was before it
+        self.history_baseline = self.history.percentiles()
+        return DeploymentLogAccumulator(self._calculate_duration, history=self.history)
+
+    def parse_deployment_log(self, accumulator=None):
+        with self.telemetry.span('parse_deployment_log'):
+            self._parse_deployment_log(accumulator)
+        self.deployment_metrics['telemetry'] = self.telemetry.summary()
+        return self.deployment_metrics
+
+    def _parse_deployment_log(self, accumulator):
         try:
-            with open(self.log_file, 'r') as file:
-                log_content = file.read()
-                
-                # Extract deployment stages and timings
-                stage_pattern = r'\[DEPLOY\] (.*?) - Started at (.*?) - Completed at (.*?)'
-                stages = re.findall(stage_pattern, log_content)
-                
-                for stage, start, end in stages:
-                    self.deployment_metrics['stages'][stage] = {
-                        'start': start,
-                        'end': end,
-                        'duration': self._calculate_duration(start, end)
-                    }
-                
-                # Detect errors
-                error_pattern = r'ERROR: (.*?)'
-                self.deployment_metrics['errors'] = re.findall(error_pattern, log_content)
-                
-                # Determine overall status
-                self.deployment_metrics['status'] = (
-                    'Success' if not self.deployment_metrics['errors'] 
-                    else 'Partial Failure' if len(self.deployment_metrics['errors']) < 3 
-                    else 'Critical Failure'
-                )
-                
-                # Log analysis results
-                logging.info(f"Deployment Analysis: {json.dumps(self.deployment_metrics, indent=2)}")
-                
-                return self.deployment_metrics
+            # Feed stage and error events into the accumulators, unless a
+            # caller already did (from self.accumulator())
+            if accumulator is None and self.pos_file:
+                accumulator, status_errors = self._parse_incremental()
+            else:
+                if accumulator is None:
+                    # Regexes run on a memory-mapped view of the log
+                    self.telemetry.count('log_bytes', os.path.getsize(self.log_file))
+                    accumulator = self.accumulator().consume(scan_log(self.log_file))
+                status_errors = accumulator.error_count
+        except OSError as e:
+            logging.error(f"Unable to read deployment log {self.log_file}: {e}")
+            return self.deployment_metrics
+
+        self.telemetry.count('stage_events', len(accumulator.stages))
+        self.telemetry.count('error_events', accumulator.error_count)
+        with self.telemetry.span('update_stage_history'):
+            self.history.save()
+            percentiles = self.history.percentiles()
+        self.deployment_metrics['stages'] = accumulator.stages
+        self.deployment_metrics['errors'] = accumulator.errors
+        self.deployment_metrics['error_count'] = accumulator.error_count
+        self.deployment_metrics['stage_percentiles'] = percentiles
+        self.deployment_metrics['stage_regressions'] = self.history.regressions(
+            accumulator.stages, self.history_baseline
+        )
+
+        # Determine overall status, from the errors of the latest deployment
+        self.deployment_metrics['status'] = (
+            'Success' if not status_errors
+            else 'Partial Failure' if status_errors < 3
+            else 'Critical Failure'
+        )
+
+        # Log analysis results; the dump is only built when INFO is enabled
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info(f"Deployment Analysis: {json.dumps(self.deployment_metrics, indent=2)}")
+
+        return self.deployment_metrics
+
+    def _parse_incremental(self):
+        # The accumulator plus the error count of the span read last, which
+        # is the latest deployment's
+        store = PositionStore(self.pos_file)
+        tailer = store.tailer(self.log_file)
+        self.history_baseline = self.history.percentiles()
+        state = store.aggregates(self.log_file) or {}
+        accumulator = DeploymentLogAccumulator.from_state(self._calculate_duration, state)
+        if tailer.unchanged():
+            return accumulator, state.get('span_error_count', accumulator.error_count)
+
+        span = DeploymentLogAccumulator(self._calculate_duration, history=self.history)
+        span.consume(parse_events(tailer.read_lines()))
+        self.telemetry.count('log_bytes', tailer.bytes_read)
+        if tailer.rotated or tailer.truncated:
+            # A new log: the aggregates of the previous one do not describe it
+            accumulator = span
+        else:
+            accumulator.merge(span)
+        tailer.commit({**accumulator.state(), 'span_error_count': span.error_count})
+        store.save()
+        return accumulator, span.error_count
 
     def _calculate_duration(self, start, end):
         try:
-            start_time = datetime.strptime(start, '%Y-%m-%d %H:%M:%S')
-            end_time = datetime.strptime(end, '%Y-%m-%d %H:%M:%S')
-            return (end_time - start_time).total_seconds()
+            # Same result as subtracting the two strptime() datetimes
+            return duration_seconds(start, end)
         except Exception as e:
             logging.error(f"Duration calculation error: {e}")
             return None
 
-    def generate_deployment_report(self):
+    def _percentile_table(self):
+        percentiles = self.deployment_metrics['stage_percentiles']
+        if not percentiles:
+            return 'No stage history'
+        rows = ['| Stage | Latest (s) | p50 (s) | p95 (s) | p99 (s) | Runs |', '|---|---|---|---|---|---|']
+        for stage, history in percentiles.items():
+            latest = self.deployment_metrics['stages'].get(stage, {}).get('duration')
+            flag = ' (regression)' if stage in self.deployment_metrics['stage_regressions'] else ''
+            rows.append(
+                f"| {stage} | {'-' if latest is None else latest}{flag} | {history['p50']} | {history['p95']}"
+                f" | {history['p99']} | {history['runs']} |"
+            )
+        return '\n'.join(rows)
+
+    def _recommendations(self):
+        recommendations = [
+            f"Investigate {stage}: took {regression['duration']}s, above its historical p95 of "
+            f"{regression['p95']}s over {regression['runs']} runs"
+            for stage, regression in self.deployment_metrics['stage_regressions'].items()
+        ] or ["Stage durations are within their historical range"]
+        recommendations += [
+            "Investigate any detected errors",
+            "Consider optimization for future deployments"
+        ]
+        return '\n'.join(f"{number}. {text}" for number, text in enumerate(recommendations, 1))
+
+    def _telemetry_table(self):
+        telemetry = self.telemetry.summary()
+        rows = ['| Phase | Seconds | Calls |', '|---|---|---|']
+        rows += [f"| {name} | {span['seconds']} | {span['calls']} |" for name, span in telemetry['spans'].items()]
+        counters = ', '.join(f"{name}={value}" for name, value in telemetry['counters'].items())
+        return '\n'.join(rows) + (f"\n\nProcessed: {counters}" if counters else '')
+
+    def generate_deployment_report(self, report_path='/var/log/emrnext/deployment_report.md'):
+        with self.telemetry.span('generate_deployment_report'):
+            return self._write_report(report_path)
+
+    def _write_report(self, report_path):
         report = f"""
 # EMRNext Deployment Analysis Report
 
@@ -67,24 +168,58 @@ class DeploymentAnalyzer:
 ### Deployment Stages:
 {json.dumps(self.deployment_metrics['stages'], indent=2)}
 
-### Errors Detected:
+### Stage Durations Across Deployments:
+{self._percentile_table()}
+
+### Errors Detected ({self.deployment_metrics['error_count']}):
 {', '.join(self.deployment_metrics['errors']) or 'No errors'}
 
 ### Recommendations:
-1. Review stages with longer durations
-2. Investigate any detected errors
-3. Consider optimization for future deployments
+{self._recommendations()}
+
+### Analyzer Telemetry:
+{self._telemetry_table()}
 """
         
-        with open('/var/log/emrnext/deployment_report.md', 'w') as report_file:
+        with open(report_path, 'w') as report_file:
             report_file.write(report)
         
         return report
 
-def main():
-    analyzer = DeploymentAnalyzer('/var/log/emrnext/deployment.log')
-    metrics = analyzer.parse_deployment_log()
-    report = analyzer.generate_deployment_report()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze EMRNext deployment logs")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only parse log data appended since the previous incremental run")
+    parser.add_argument('--pos-file', default='/var/log/emrnext/deployment_analysis.pos')
+    parser.add_argument('--history', default=HISTORY_PATH, help="stage duration history file")
+    parser.add_argument('--ingest', nargs='+', metavar='LOG',
+                        help="add the stage runs of these (archived) logs to the history and exit")
+    parser.add_argument('--workers', type=int, default=None, help="processes used by --ingest")
+    parser.add_argument('--log-file', default=ANALYSIS_LOG, help="where the analysis is logged ('' for stderr)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Logging is configured by the command line, not by constructing an analyzer
+    logging.basicConfig(filename=args.log_file or None, level=logging.INFO)
+
+    if args.ingest:
+        history = StageHistory(args.history)
+        added = history.ingest_logs(args.ingest, max_workers=args.workers)
+        history.save()
+        print(f"Added {added} stage runs from {len(args.ingest)} logs")
+        print(json.dumps(history.percentiles(), indent=2))
+        return
+
+    analyzer = DeploymentAnalyzer(
+        '/var/log/emrnext/deployment.log',
+        pos_file=args.pos_file if args.incremental else None,
+        history_path=args.history,
+        telemetry=from_arguments('deployment_analysis', args)
+    )
+    with analyzer.telemetry.run():
+        analyzer.parse_deployment_log()
+        report = analyzer.generate_deployment_report()
+    analyzer.telemetry.export(args.metrics_file, args.pushgateway)
     print(report)
 
 if __name__ == "__main__":
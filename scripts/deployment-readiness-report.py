@@ -1,9 +1,19 @@
 import os
 import json
+import argparse
 from datetime import datetime
+from emrnext_ops.deploy_log import VERSION_PATTERNS
+from emrnext_ops.json_stream import read_selected
+from emrnext_ops.log_access import search_first
+from emrnext_ops.readiness_archive import AnalysisCache, analyze_archive, summarize, summarize_metrics
+from emrnext_ops.report_store import ReportStore
+from emrnext_ops.telemetry import Telemetry, add_arguments, from_arguments
 
 class DeploymentReadinessReport:
-    def __init__(self):
+    def __init__(self, log_dir='/var/log/emrnext', telemetry=None):
+        self.log_dir = log_dir
+        # Phase timings and processed volumes of this run
+        self.telemetry = telemetry or Telemetry('deployment_readiness')
         self.report = {
             "timestamp": datetime.now().isoformat(),
             "system_components": {
@@ -21,47 +31,38 @@ class DeploymentReadinessReport:
 
     def load_deployment_logs(self, log_path):
         try:
-            with open(log_path, 'r') as log_file:
-                logs = log_file.read()
-                # Extract versions and statuses
-                self.report['system_components']['backend']['version'] = self._extract_version(logs, 'backend')
-                self.report['system_components']['frontend']['version'] = self._extract_version(logs, 'frontend')
-                self.report['system_components']['database']['version'] = self._extract_version(logs, 'database')
+            # Extract versions; each search stops at its first match
+            for component, details in self.report['system_components'].items():
+                details['version'] = self._extract_version(log_path, component)
         except Exception as e:
             print(f"Error loading deployment logs: {e}")
 
-    def _extract_version(self, logs, component):
-        # Implement version extraction logic
-        version_patterns = {
-            'backend': r'Backend Version: ([\d.]+)',
-            'frontend': r'Frontend Version: ([\d.]+)',
-            'database': r'Database Version: ([\d.]+)'
-        }
-        import re
-        match = re.search(version_patterns.get(component, ''), logs)
-        return match.group(1) if match else "Unknown"
+    def apply_versions(self, versions):
+        # Versions found by the shared collection pass (empty if there was no log)
+        for component, details in self.report['system_components'].items():
+            if component in versions:
+                details['version'] = versions[component] or "Unknown"
+
+    def _extract_version(self, log_path, component):
+        pattern = VERSION_PATTERNS.get(component)
+        match = search_first(log_path, pattern) if pattern else None
+        return match[0].decode('ascii') if match else "Unknown"
 
     def analyze_deployment_performance(self, metrics_path):
         try:
-            with open(metrics_path, 'r') as metrics_file:
-                metrics = json.load(metrics_file)
-                
-                # Calculate total deployment time
-                start_times = [stage['start'] for stage in metrics['stages'].values()]
-                end_times = [stage['end'] for stage in metrics['stages'].values()]
-                
-                self.report['deployment_metrics']['total_deployment_time'] = (
-                    datetime.fromisoformat(max(end_times)) - 
-                    datetime.fromisoformat(min(start_times))
-                ).total_seconds()
-                
-                # Count successful and failed stages
-                self.report['deployment_metrics']['successful_stages'] = len(
-                    [stage for stage in metrics['stages'].values() if stage.get('status') == 'Success']
-                )
-                self.report['deployment_metrics']['failed_stages'] = len(
-                    [stage for stage in metrics['stages'].values() if stage.get('status') != 'Success']
-                )
+            metrics = read_selected(metrics_path, ('stages.*',))
+        except Exception as e:
+            print(f"Error analyzing deployment performance: {e}")
+            return
+        self.analyze_metrics(metrics)
+
+    def analyze_metrics(self, metrics):
+        try:
+            self.telemetry.count('deployment_stages', len(metrics['stages']))
+            # Total deployment time and stage outcomes in one pass over the stages
+            summary = summarize_metrics(metrics)
+            for key in ('total_deployment_time', 'successful_stages', 'failed_stages'):
+                self.report['deployment_metrics'][key] = summary[key]
         except Exception as e:
             print(f"Error analyzing deployment performance: {e}")
 
@@ -81,21 +82,70 @@ class DeploymentReadinessReport:
         
         self.report['recommendations'] = recommendations
 
-    def create_report(self):
-        self.load_deployment_logs('/var/log/emrnext/deployment.log')
-        self.analyze_deployment_performance('/var/log/emrnext/deployment_metrics.json')
-        self.generate_recommendations()
+    def create_report(self, sources=None):
+        with self.telemetry.run():
+            if sources is None:
+                with self.telemetry.span('load_deployment_logs'):
+                    self.load_deployment_logs(os.path.join(self.log_dir, 'deployment.log'))
+                with self.telemetry.span('analyze_deployment_performance'):
+                    self.analyze_deployment_performance(os.path.join(self.log_dir, 'deployment_metrics.json'))
+            else:
+                # Inputs already read by the shared collection pass
+                self.apply_versions(sources.versions)
+                with self.telemetry.span('analyze_deployment_performance'):
+                    if 'deployment_metrics.json' in sources.documents:
+                        self.analyze_metrics(sources.documents['deployment_metrics.json'])
+                    else:
+                        print("Error analyzing deployment performance: deployment_metrics.json not found")
+            with self.telemetry.span('generate_recommendations'):
+                self.generate_recommendations()
+        self.report['telemetry'] = self.telemetry.summary()
         
-        # Write report to file
-        report_path = f'/var/log/emrnext/deployment_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        with open(report_path, 'w') as report_file:
-            json.dump(self.report, report_file, indent=2)
+        # Write report to the report store
+        ReportStore(os.path.join(self.log_dir, 'reports')).append('readiness', self.report)
         
         return self.report
 
-def main():
-    readiness_report = DeploymentReadinessReport()
+def create_archive_report(archive_dir, cache_path=None, max_workers=None, log_dir='/var/log/emrnext',
+                          telemetry=None):
+    # Batch mode: every deployment in the archive, summarized across deployments
+    telemetry = telemetry or Telemetry('deployment_readiness_archive')
+    with telemetry.run():
+        with telemetry.span('analyze_archive'):
+            analyses = analyze_archive(archive_dir, AnalysisCache(cache_path), max_workers, telemetry)
+        with telemetry.span('summarize'):
+            summary = summarize(analyses)
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "archive": archive_dir,
+        "summary": summary,
+        "deployments": analyses,
+        "telemetry": telemetry.summary()
+    }
+    ReportStore(os.path.join(log_dir, 'reports')).append('readiness_archive', report)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the EMRNext deployment readiness report")
+    parser.add_argument('--log-dir', default='/var/log/emrnext')
+    parser.add_argument('--archive', help="analyze every deployment in this archive directory instead")
+    parser.add_argument('--workers', type=int, default=None, help="processes parsing the archive")
+    parser.add_argument('--cache', default=None,
+                        help="per-file result cache (default: readiness_cache.json in the log directory)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.archive:
+        telemetry = from_arguments('deployment_readiness_archive', args)
+        report = create_archive_report(args.archive, args.cache or os.path.join(args.log_dir, 'readiness_cache.json'),
+                                       args.workers, args.log_dir, telemetry)
+        telemetry.export(args.metrics_file, args.pushgateway)
+        print(json.dumps(report, indent=2))
+        return
+
+    readiness_report = DeploymentReadinessReport(args.log_dir, telemetry=from_arguments('deployment_readiness', args))
     final_report = readiness_report.create_report()
+    readiness_report.telemetry.export(args.metrics_file, args.pushgateway)
     print(json.dumps(final_report, indent=2))
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+"""Run several EMRNext reports in one process.
+
+Cron jobs that run more than one report start the interpreter and import
+the shared modules once instead of once per script:
+
+    python scripts/emrnext-cli.py health then improvement --incremental then deployment --incremental
+
+Each command takes the options of its script (``emrnext-cli.py health --help``)
+and only that script is imported.  Commands run in order; the exit status
+is non-zero when any of them failed.
+"""
+import sys
+import traceback
+from emrnext_ops.loader import load_script
+
+COMMANDS = {
+    'health': 'system-health-checker.py',
+    'improvement': 'continuous-improvement.py',
+    'readiness': 'deployment-readiness-report.py',
+    'deployment': 'deployment-log-analyzer.py',
+    'reports': 'generate-reports.py'
+}
+SEPARATOR = 'then'
+
+def usage():
+    commands = '\n'.join(f"  {name:<12} {script}" for name, script in COMMANDS.items())
+    return f"{__doc__}\ncommands:\n{commands}\n"
+
+def split_commands(argv):
+    """``[(command, args)]`` from ``cmd [args] then cmd [args] ...``."""
+    commands = [[]]
+    for arg in argv:
+        if arg == SEPARATOR:
+            commands.append([])
+        else:
+            commands[-1].append(arg)
+    parsed = []
+    for command in commands:
+        if not command or command[0] not in COMMANDS:
+            raise ValueError(f"expected one of {', '.join(COMMANDS)}, got {command[0] if command else 'nothing'}")
+        parsed.append((command[0], command[1:]))
+    return parsed
+
+def run(argv):
+    try:
+        commands = split_commands(argv)
+    except ValueError as e:
+        print(f"emrnext-cli: {e}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    status = 0
+    for name, args in commands:
+        try:
+            load_script(COMMANDS[name]).main(args)
+        except SystemExit as e:
+            # argparse errors and --help exit; the remaining commands still run
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            status = max(status, code)
+        except Exception:
+            print(f"emrnext-cli: {name} failed", file=sys.stderr)
+            traceback.print_exc()
+            status = max(status, 1)
+    return status
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print(usage())
+        return
+    sys.exit(run(sys.argv[1:]))
+
+if __name__ == "__main__":
+    main()
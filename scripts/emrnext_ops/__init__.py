@@ -0,0 +1 @@
+"""Shared building blocks for the EMRNext operations scripts in ``scripts/``."""
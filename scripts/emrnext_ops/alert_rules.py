@@ -0,0 +1,684 @@
+"""Local evaluation of the Prometheus alert rules and deviation baselines.
+
+:class:`RuleEngine` loads ``monitoring/alert-rules.yml`` and evaluates each
+rule over a :class:`SeriesStore`, i.e. time series on a regular grid
+collected locally or fetched once with range queries.  Every series of a
+metric is one row of a ``(series, steps)`` NumPy matrix, so a rule is
+evaluated for all series and all steps with a handful of array operations:
+range functions use cumulative sums and sliding windows, ``for:`` uses the
+length of the run of true steps ending at each step.
+
+The supported PromQL subset covers the rules in this repository: numbers,
+selectors with ``=``/``!=``/``=~``/``!~`` matchers, ``rate``/``irate``/
+``increase``/``delta``/``*_over_time`` over a range, ``sum``/``avg``/
+``min``/``max`` with optional ``by``/``without``, ``time()``, arithmetic
+with one-to-one label matching and one comparison.  Rules outside it are
+reported in ``RuleEngine.errors`` instead of failing the whole file.
+
+:func:`deviation` gives the statistics recommendations are based on: the
+last value against an EWMA baseline (as a z-score) and against the median
+of the same time in previous seasons (e.g. yesterday and the days before).
+"""
+import math
+import os
+import re
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+
+from emrnext_ops.loader import SCRIPTS_DIR
+
+RULES_PATH = os.path.join(os.path.dirname(SCRIPTS_DIR), 'monitoring', 'alert-rules.yml')
+
+DEFAULT_ALPHA = 0.05
+DEFAULT_SEASONS = 7
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+RANGE_FUNCTIONS = ('rate', 'irate', 'increase', 'delta', 'avg_over_time', 'min_over_time', 'max_over_time',
+                   'sum_over_time')
+AGGREGATIONS = ('sum', 'avg', 'min', 'max')
+COMPARISONS = ('>', '<', '>=', '<=', '==', '!=')
+
+_TOKEN_PATTERN = re.compile(r'''\s*(?:
+    (?P<duration>(?:\d+[smhdwy])+)(?![a-zA-Z0-9_:])
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+  | (?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<op>==|!=|>=|<=|=~|!~|[-+*/()<>\[\]{},=])
+)''', re.VERBOSE)
+
+
+class RuleError(Exception):
+    pass
+
+
+def parse_duration(text):
+    return sum(int(amount) * DURATION_UNITS[unit] for amount, unit in re.findall(r'(\d+)([smhdwy])', text))
+
+
+# Expression tree
+
+class Number:
+    def __init__(self, value):
+        self.value = value
+
+
+class Time:
+    pass
+
+
+class Selector:
+    def __init__(self, name, matchers):
+        self.name = name
+        # [(label, op, value)]
+        self.matchers = matchers
+
+    def __str__(self):
+        matchers = ','.join(f'{label}{op}"{value}"' for label, op, value in self.matchers)
+        return self.name + (f'{{{matchers}}}' if matchers else '')
+
+
+class RangeFunction:
+    def __init__(self, function, selector, seconds):
+        self.function = function
+        self.selector = selector
+        self.seconds = seconds
+
+
+class Aggregation:
+    def __init__(self, operator, expr, by=None, without=None):
+        self.operator = operator
+        self.expr = expr
+        self.by = by
+        self.without = without
+
+
+class Binary:
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise RuleError(f"Unexpected input at {text[position:position + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self, value=None):
+        if self.position >= len(self.tokens):
+            return None
+        token = self.tokens[self.position]
+        return token if value is None or token[1] == value else None
+
+    def take(self, value=None, kind=None):
+        token = self.peek()
+        if token is None or (value is not None and token[1] != value) or (kind is not None and token[0] != kind):
+            raise RuleError(f"Expected {value or kind} in {self.text!r}")
+        self.position += 1
+        return token[1]
+
+    def parse(self):
+        node = self.comparison()
+        if self.peek() is not None:
+            raise RuleError(f"Unexpected {self.peek()[1]!r} in {self.text!r}")
+        return node
+
+    def comparison(self):
+        node = self.additive()
+        token = self.peek()
+        if token and token[0] == 'op' and token[1] in COMPARISONS:
+            self.position += 1
+            node = Binary(token[1], node, self.additive())
+        return node
+
+    def additive(self):
+        node = self.term()
+        while self.peek('+') or self.peek('-'):
+            node = Binary(self.take(), node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek('*') or self.peek('/'):
+            node = Binary(self.take(), node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek('-'):
+            self.take()
+            return Binary('*', Number(-1.0), self.unary())
+        return self.primary()
+
+    def primary(self):
+        token = self.peek()
+        if token is None:
+            raise RuleError(f"Unexpected end of {self.text!r}")
+        kind, value = token
+        if kind == 'number':
+            self.position += 1
+            return Number(float(value))
+        if value == '(':
+            self.take('(')
+            node = self.comparison()
+            self.take(')')
+            return node
+        if kind != 'name':
+            raise RuleError(f"Unexpected {value!r} in {self.text!r}")
+
+        self.position += 1
+        if value == 'time' and self.peek('('):
+            self.take('(')
+            self.take(')')
+            return Time()
+        if value in RANGE_FUNCTIONS and self.peek('('):
+            self.take('(')
+            selector = self.selector(self.take(kind='name'))
+            self.take('[')
+            seconds = parse_duration(self.take(kind='duration'))
+            self.take(']')
+            self.take(')')
+            return RangeFunction(value, selector, seconds)
+        if value in AGGREGATIONS and (self.peek('(') or self.peek('by') or self.peek('without')):
+            grouping = self.grouping()
+            self.take('(')
+            expr = self.comparison()
+            self.take(')')
+            grouping = grouping or self.grouping()
+            return Aggregation(value, expr, **(grouping or {}))
+        if self.peek('('):
+            raise RuleError(f"Unsupported function {value}() in {self.text!r}")
+        return self.selector(value)
+
+    def grouping(self):
+        token = self.peek()
+        if not token or token[1] not in ('by', 'without'):
+            return None
+        keyword = self.take()
+        self.take('(')
+        labels = []
+        while not self.peek(')'):
+            labels.append(self.take(kind='name'))
+            if self.peek(','):
+                self.take(',')
+        self.take(')')
+        return {keyword: labels}
+
+    def selector(self, name):
+        matchers = []
+        if self.peek('{'):
+            self.take('{')
+            while not self.peek('}'):
+                label = self.take(kind='name')
+                op = self.take()
+                if op not in ('=', '!=', '=~', '!~'):
+                    raise RuleError(f"Unsupported matcher {op!r} in {self.text!r}")
+                matchers.append((label, op, self.take(kind='string')[1:-1].replace('\\"', '"')))
+                if self.peek(','):
+                    self.take(',')
+            self.take('}')
+        return Selector(name, matchers)
+
+
+def parse(text):
+    """Expression tree of a PromQL expression in the supported subset; raises :class:`RuleError`."""
+    return _Parser(text).parse()
+
+
+def selectors(node):
+    """Every selector an expression reads, e.g. to fetch them in one batch."""
+    if isinstance(node, Selector):
+        return [node]
+    if isinstance(node, RangeFunction):
+        return [node.selector]
+    if isinstance(node, Aggregation):
+        return selectors(node.expr)
+    if isinstance(node, Binary):
+        return selectors(node.left) + selectors(node.right)
+    return []
+
+
+# Series storage
+
+class Vector:
+    """Series sharing the store's time grid: ``labels[i]`` describes row ``i`` of ``values``."""
+
+    def __init__(self, labels, values):
+        self.labels = labels
+        self.values = values
+
+
+def _label_key(labels):
+    return tuple(sorted((name, value) for name, value in labels.items() if name != '__name__'))
+
+
+class SeriesStore:
+    """Time series on the grid ``start, start + step, ...`` (``length`` steps); gaps are NaN."""
+
+    def __init__(self, start, step, length):
+        self.start = start
+        self.step = step
+        self.length = length
+        self._series = {}
+        self._matrices = {}
+
+    @property
+    def timestamps(self):
+        return self.start + self.step * np.arange(self.length)
+
+    def add(self, labels, values):
+        """Add one series; ``labels`` holds the metric name under ``__name__``."""
+        values = np.asarray(values, dtype=float)
+        if values.shape != (self.length,):
+            raise ValueError(f"Expected {self.length} values, got {values.shape}")
+        name = labels['__name__']
+        rows = self._series.setdefault(name, ({}, []))
+        key = _label_key(labels)
+        if key in rows[0]:
+            rows[1][rows[0][key]] = values
+        else:
+            rows[0][key] = len(rows[1])
+            rows[1].append(values)
+        self._matrices.pop(name, None)
+
+    def add_samples(self, labels, samples):
+        """Add a series from ``[(timestamp, value)]``, placing each sample on the nearest step."""
+        values = np.full(self.length, np.nan)
+        if samples:
+            times, observed = np.asarray(samples, dtype=float).T
+            index = np.rint((times - self.start) / self.step).astype(int)
+            inside = (index >= 0) & (index < self.length)
+            values[index[inside]] = observed[inside]
+        self.add(labels, values)
+
+    def matrix(self, name):
+        """``(label keys, values)`` of every series of a metric."""
+        if name not in self._matrices:
+            keys, rows = self._series.get(name, ({}, []))
+            values = np.vstack(rows) if rows else np.empty((0, self.length))
+            self._matrices[name] = (list(keys), values)
+        return self._matrices[name]
+
+    def select(self, selector):
+        keys, values = self.matrix(selector.name)
+        keep = np.ones(len(keys), dtype=bool)
+        for label, op, expected in selector.matchers:
+            actual = [dict(key).get(label, '') for key in keys]
+            if op in ('=', '!='):
+                matched = np.fromiter((value == expected for value in actual), dtype=bool, count=len(keys))
+            else:
+                pattern = re.compile(expected)
+                matched = np.fromiter((bool(pattern.fullmatch(value)) for value in actual), dtype=bool,
+                                      count=len(keys))
+            keep &= matched if op in ('=', '=~') else ~matched
+        return Vector([key for key, kept in zip(keys, keep) if kept], values[keep])
+
+    @classmethod
+    def from_prometheus(cls, client, exprs, start, end, step):
+        """Fetch ``exprs`` (plain selectors) with one batch of range queries."""
+        store = cls(start, step, int((end - start) // step) + 1)
+        results = client.query_range_many(list(exprs), start, end, step)
+        for expr, series in results.items():
+            name = parse(expr).name
+            for sample in series:
+                labels = dict(sample['metric'])
+                labels.setdefault('__name__', name)
+                store.add_samples(labels, [(float(at), float(value)) for at, value in sample['values']])
+        return store
+
+
+# Evaluation
+
+def _window_steps(seconds, step):
+    return max(1, int(round(seconds / step)))
+
+
+def _cumulative_increase(values, reset_adjusted):
+    # Running sum of the per-step increase; a counter reset counts as the new value
+    diffs = np.diff(values, axis=1)
+    if reset_adjusted:
+        diffs = np.where(diffs < 0, values[:, 1:], diffs)
+    diffs = np.where(np.isnan(diffs), 0.0, diffs)
+    return np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(diffs, axis=1)], axis=1)
+
+
+def _range_function(function, values, window, step):
+    n, length = values.shape
+    result = np.full((n, length), np.nan)
+    if length <= window:
+        return result
+    present = ~np.isnan(values)
+    if function in ('rate', 'increase', 'delta'):
+        cumulative = _cumulative_increase(values, reset_adjusted=function != 'delta')
+        increase = cumulative[:, window:] - cumulative[:, :-window]
+        # Both ends of the window need a sample
+        increase[~(present[:, window:] & present[:, :-window])] = np.nan
+        result[:, window:] = increase / (window * step) if function == 'rate' else increase
+    elif function == 'irate':
+        diffs = np.diff(values, axis=1)
+        diffs = np.where(diffs < 0, values[:, 1:], diffs)
+        result[:, 1:] = diffs / step
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window + 1, axis=1)
+        reduce = {'avg_over_time': np.nanmean, 'min_over_time': np.nanmin, 'max_over_time': np.nanmax,
+                  'sum_over_time': np.nansum}[function]
+        with _quiet_nan_warnings():
+            result[:, window:] = reduce(windows, axis=2)
+        # nansum of an empty window is 0; no samples means no value
+        empty = ~np.lib.stride_tricks.sliding_window_view(present, window + 1, axis=1).any(axis=2)
+        result[:, window:][empty] = np.nan
+    return result
+
+
+@contextmanager
+def _quiet_nan_warnings():
+    # nanmean/nanmin of an all-NaN window warn; the NaN result is what we want
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        yield
+
+
+def _aggregate(node, vector):
+    if node.by is not None:
+        group_of = lambda key: tuple((name, value) for name, value in key if name in node.by)
+    elif node.without is not None:
+        group_of = lambda key: tuple((name, value) for name, value in key if name not in node.without)
+    else:
+        group_of = lambda key: ()
+    groups = {}
+    for index, key in enumerate(vector.labels):
+        groups.setdefault(group_of(key), []).append(index)
+
+    labels, rows = [], []
+    for key, indexes in groups.items():
+        values = vector.values[indexes]
+        present = (~np.isnan(values)).any(axis=0)
+        with _quiet_nan_warnings():
+            row = {'sum': np.nansum, 'avg': np.nanmean, 'min': np.nanmin, 'max': np.nanmax}[node.operator](
+                values, axis=0)
+        row = np.where(present, row, np.nan)
+        labels.append(key)
+        rows.append(row)
+    length = vector.values.shape[1]
+    return Vector(labels, np.vstack(rows) if rows else np.empty((0, length)))
+
+
+def _apply(operator, left, right):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if operator == '+':
+            return left + right
+        if operator == '-':
+            return left - right
+        if operator == '*':
+            return left * right
+        if operator == '/':
+            return left / right
+    raise RuleError(f"Unsupported operator {operator}")
+
+
+def _compare(operator, left, right):
+    with np.errstate(invalid='ignore'):
+        return {'>': np.greater, '<': np.less, '>=': np.greater_equal, '<=': np.less_equal,
+                '==': np.equal, '!=': np.not_equal}[operator](left, right)
+
+
+def _binary(node, left, right):
+    if not isinstance(left, Vector) and not isinstance(right, Vector):
+        if node.operator in COMPARISONS:
+            return np.where(_compare(node.operator, left, right), left, np.nan)
+        return _apply(node.operator, left, right)
+    if isinstance(left, Vector) and isinstance(right, Vector):
+        # One-to-one matching on identical label sets
+        index = {key: row for row, key in enumerate(right.labels)}
+        pairs = [(row, index[key]) for row, key in enumerate(left.labels) if key in index]
+        labels = [left.labels[row] for row, _ in pairs]
+        left_values = left.values[[row for row, _ in pairs]]
+        right_values = right.values[[row for _, row in pairs]]
+    elif isinstance(left, Vector):
+        labels, left_values, right_values = left.labels, left.values, right
+    else:
+        labels, left_values, right_values = right.labels, left, right.values
+
+    if node.operator in COMPARISONS:
+        # Filter: keep the vector side's value where the comparison holds
+        kept = left_values if isinstance(left, Vector) else right_values
+        values = np.where(_compare(node.operator, left_values, right_values), kept, np.nan)
+    else:
+        values = _apply(node.operator, left_values, right_values)
+    return Vector(labels, values)
+
+
+def evaluate(node, store):
+    """Value of an expression tree at every step: a :class:`Vector`, a per-step array or a number."""
+    if isinstance(node, str):
+        node = parse(node)
+    if isinstance(node, Number):
+        return node.value
+    if isinstance(node, Time):
+        return store.timestamps
+    if isinstance(node, Selector):
+        return store.select(node)
+    if isinstance(node, RangeFunction):
+        vector = store.select(node.selector)
+        window = _window_steps(node.seconds, store.step)
+        return Vector(vector.labels, _range_function(node.function, vector.values, window, store.step))
+    if isinstance(node, Aggregation):
+        vector = evaluate(node.expr, store)
+        if not isinstance(vector, Vector):
+            raise RuleError(f"{node.operator}() needs a vector")
+        return _aggregate(node, vector)
+    if isinstance(node, Binary):
+        return _binary(node, evaluate(node.left, store), evaluate(node.right, store))
+    raise RuleError(f"Cannot evaluate {node!r}")
+
+
+def _as_vector(value, length):
+    if isinstance(value, Vector):
+        return value
+    return Vector([()], np.broadcast_to(np.asarray(value, dtype=float), (1, length)).copy())
+
+
+def run_lengths(active):
+    """Per step, how many consecutive steps up to and including it are true (``(series, steps)``)."""
+    n, length = active.shape
+    steps = np.arange(1, length + 1)
+    last_inactive = np.maximum.accumulate(np.where(active, 0, steps), axis=1)
+    return steps - last_inactive
+
+
+class AlertRule:
+    def __init__(self, name, expr, for_seconds=0, labels=None, annotations=None, group=None):
+        self.name = name
+        self.expr = expr
+        self.for_seconds = for_seconds
+        self.labels = labels or {}
+        self.annotations = annotations or {}
+        self.group = group
+        self.node = parse(expr)
+
+    @property
+    def value_node(self):
+        """The compared expression of a threshold rule (the whole expression otherwise)."""
+        if isinstance(self.node, Binary) and self.node.operator in COMPARISONS:
+            return self.node.left
+        return self.node
+
+    @property
+    def threshold(self):
+        if isinstance(self.node, Binary) and isinstance(self.node.right, Number):
+            return self.node.right.value
+        return None
+
+
+class RuleEngine:
+    def __init__(self, rules, errors=None):
+        self.rules = list(rules)
+        # alert name -> why it could not be loaded
+        self.errors = dict(errors or {})
+
+    @classmethod
+    def load(cls, path=RULES_PATH):
+        import yaml
+        with open(path, 'r') as f:
+            document = yaml.safe_load(f) or {}
+        rules, errors = [], {}
+        for group in document.get('groups', []):
+            for rule in group.get('rules', []):
+                if 'alert' not in rule:
+                    continue
+                try:
+                    rules.append(AlertRule(
+                        rule['alert'], str(rule['expr']), parse_duration(str(rule.get('for', '0s'))),
+                        rule.get('labels'), rule.get('annotations'), group.get('name')
+                    ))
+                except RuleError as e:
+                    errors[rule['alert']] = str(e)
+        return cls(rules, errors)
+
+    def selectors(self):
+        """The distinct selectors all rules read, as PromQL text."""
+        return sorted({str(selector) for rule in self.rules for selector in selectors(rule.node)})
+
+    def rule(self, name):
+        for rule in self.rules:
+            if rule.name == name:
+                return rule
+        raise KeyError(name)
+
+    def evaluate(self, store, at=-1):
+        """Pending and firing alerts at step ``at``, with the series value and for how long it held."""
+        alerts = []
+        for rule in self.rules:
+            try:
+                result = _as_vector(evaluate(rule.node, store), store.length)
+            except RuleError as e:
+                self.errors[rule.name] = str(e)
+                continue
+            active = ~np.isnan(result.values)
+            held = run_lengths(active)[:, at] * store.step
+            for row in np.flatnonzero(active[:, at]):
+                # The first step of a run counts as held for 0 seconds, as in Prometheus
+                seconds = float(held[row] - store.step)
+                alerts.append({
+                    "alert": rule.name,
+                    "labels": {**dict(result.labels[row]), **rule.labels},
+                    "value": float(result.values[row, at]),
+                    "active_seconds": seconds,
+                    "state": "firing" if seconds >= rule.for_seconds else "pending",
+                    "summary": rule.annotations.get('summary')
+                })
+        return alerts
+
+    def baselines(self, store, exprs=None, alpha=DEFAULT_ALPHA, period_seconds=86400, seasons=DEFAULT_SEASONS):
+        """``{name: [deviation per series]}`` for ``exprs`` (default: every rule's compared value)."""
+        if exprs is None:
+            exprs = {rule.name: rule.value_node for rule in self.rules}
+        period_steps = max(1, int(round(period_seconds / store.step)))
+        baselines = {}
+        for name, expr in exprs.items():
+            try:
+                vector = _as_vector(evaluate(expr, store), store.length)
+            except RuleError as e:
+                self.errors[name] = str(e)
+                continue
+            stats = deviation(vector.values, alpha, period_steps, seasons)
+            baselines[name] = [
+                {"labels": dict(key), **{field: _number(values[row]) for field, values in stats.items()}}
+                for row, key in enumerate(vector.labels)
+            ]
+        return baselines
+
+
+def _number(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else round(value, 6)
+
+
+# Baselines
+
+def _forward_fill(values):
+    present = ~np.isnan(values)
+    index = np.where(present, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = values[np.arange(values.shape[0])[:, None], index]
+    return filled, present
+
+
+def ewma(values, alpha=DEFAULT_ALPHA):
+    """Exponentially weighted mean and variance of each row at its last step.
+
+    The recurrence ``m[t] = (1 - alpha) * m[t - 1] + alpha * x[t]`` starting
+    from the first sample unrolls into fixed weights, so both come out of a
+    matrix-vector product instead of a loop over the steps.  Gaps carry the
+    previous value forward; rows without samples are NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    filled, present = _forward_fill(values)
+    started = present.any(axis=1)
+    first = np.where(started, filled[np.arange(len(values)), present.argmax(axis=1)], 0.0)
+    # Before a row's first sample, holding the first value leaves the recurrence unchanged.
+    # Centring on it keeps the variance exact for flat series
+    centred = np.where(np.isnan(filled), 0.0, filled - first[:, None])
+
+    length = values.shape[1]
+    weights = alpha * (1.0 - alpha) ** np.arange(length - 1, -1, -1, dtype=float)
+    weights[0] = (1.0 - alpha) ** (length - 1)
+    mean = centred @ weights
+    variance = np.maximum((centred ** 2) @ weights - mean ** 2, 0.0)
+    mean = np.where(started, mean + first, np.nan)
+    return mean, np.where(started, variance, np.nan)
+
+
+def seasonal_baseline(values, period_steps, seasons=DEFAULT_SEASONS, at=-1):
+    """Median of each series at step ``at`` minus 1..``seasons`` periods; NaN without history."""
+    values = np.asarray(values, dtype=float)
+    at = at % values.shape[1]
+    earlier = [at - season * period_steps for season in range(1, seasons + 1) if at - season * period_steps >= 0]
+    if not earlier:
+        return np.full(values.shape[0], np.nan)
+    with _quiet_nan_warnings():
+        return np.nanmedian(values[:, earlier], axis=1)
+
+
+def deviation(values, alpha=DEFAULT_ALPHA, period_steps=None, seasons=DEFAULT_SEASONS, at=-1):
+    """How far each series' value at step ``at`` is from its baselines.
+
+    ``z_score`` compares it with the EWMA forecast made the step before
+    (mean and standard deviation); ``seasonal_ratio`` divides it by the
+    seasonal baseline.  ``samples`` is how much history the EWMA had.
+    """
+    values = np.asarray(values, dtype=float)
+    at = at % values.shape[1]
+    current = values[:, at]
+    if at == 0:
+        mean = variance = np.full(values.shape[0], np.nan)
+    else:
+        mean, variance = ewma(values[:, :at], alpha)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A flat history gives no spread to scale by: only "unchanged" is meaningful there
+        z_score = np.where(variance > 0, (current - mean) / np.sqrt(variance),
+                           np.where(current == mean, 0.0, np.nan))
+        seasonal = (seasonal_baseline(values, period_steps, seasons, at) if period_steps
+                    else np.full(values.shape[0], np.nan))
+        ratio = np.where(seasonal > 0, current / seasonal, np.nan)
+    samples = (~np.isnan(values[:, :at])).sum(axis=1)
+    return {"value": current, "samples": samples, "ewma": mean, "ewma_std": np.sqrt(variance), "z_score": z_score,
+            "seasonal_baseline": seasonal, "seasonal_ratio": ratio}
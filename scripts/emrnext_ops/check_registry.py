@@ -0,0 +1,264 @@
+"""Declarative registry and parallel scheduler for health checks.
+
+A check declares its dependencies, a timeout, a cost class, a cache TTL
+and the group the health daemon schedules it in:
+
+* ``io`` checks (network probes, cheap local reads) run on a thread pool;
+* ``cpu`` checks run on a process pool, so their function and the results
+  of their dependencies must be picklable.
+
+The scheduler starts every check whose dependencies have finished, so
+independent checks overlap and wall time follows the longest dependency
+chain rather than the number of checks.  A check whose result is younger
+than its TTL is served from the cache without running.  Checks whose
+dependencies failed are skipped.
+
+Scoring is driven by weighted criteria evaluated against the merged report.
+"""
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+COST_CLASSES = ('io', 'cpu')
+# Group of checks registered without one
+DEFAULT_GROUP = 'checks'
+
+
+class Check:
+    def __init__(self, name, func, depends_on=(), timeout=10, cost='io', ttl=0, group=DEFAULT_GROUP):
+        if cost not in COST_CLASSES:
+            raise ValueError(f"Unknown cost class {cost!r} for check {name!r}")
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.cost = cost
+        self.ttl = ttl
+        self.group = group
+
+
+class Criterion:
+    def __init__(self, name, predicate, weight=1.0):
+        self.name = name
+        self.predicate = predicate
+        self.weight = weight
+
+    def evaluate(self, report):
+        try:
+            return bool(self.predicate(report))
+        except (KeyError, TypeError):
+            # Data the criterion needs is missing, e.g. its check failed
+            return False
+
+
+class CheckOutcome:
+    def __init__(self, result=None, error=None, elapsed=0.0, cached=False, skipped=False):
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = cached
+        self.skipped = skipped
+
+    @property
+    def ok(self):
+        return self.error is None and not self.skipped
+
+    def summary(self):
+        return {
+            "status": "SKIPPED" if self.skipped else "OK" if self.ok else "FAILED",
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+            "cached": self.cached,
+            **({"error": self.error} if self.error else {})
+        }
+
+
+class CheckRegistry:
+    def __init__(self):
+        self.checks = {}
+        self.criteria = []
+
+    def register(self, name, func=None, depends_on=(), timeout=10, cost='io', ttl=0, group=DEFAULT_GROUP):
+        """Register ``func(dependency_results)``; usable directly or as a decorator."""
+        def add(func):
+            self.checks[name] = Check(name, func, depends_on, timeout, cost, ttl, group)
+            return func
+        return add(func) if func is not None else add
+
+    def groups(self):
+        """``{group: [check names]}`` in registration order."""
+        groups = {}
+        for check in self.checks.values():
+            groups.setdefault(check.group, []).append(check.name)
+        return groups
+
+    def criterion(self, name, predicate=None, weight=1.0):
+        def add(predicate):
+            self.criteria.append(Criterion(name, predicate, weight))
+            return predicate
+        return add(predicate) if predicate is not None else add
+
+    def validate(self):
+        # Unknown dependencies and cycles are configuration errors
+        for check in self.checks.values():
+            for dependency in check.depends_on:
+                if dependency not in self.checks:
+                    raise ValueError(f"Check {check.name!r} depends on unknown check {dependency!r}")
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through check {name!r}")
+            visiting.add(name)
+            for dependency in self.checks[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.checks:
+            visit(name)
+
+    def score(self, report):
+        """``(score between 0 and 1, {criterion: passed})`` for the weighted criteria."""
+        passed = {criterion.name: criterion.evaluate(report) for criterion in self.criteria}
+        total = sum(criterion.weight for criterion in self.criteria)
+        if not total:
+            return 1.0, passed
+        achieved = sum(criterion.weight for criterion in self.criteria if passed[criterion.name])
+        return achieved / total, passed
+
+
+class ResultCache:
+    """TTL cache of check results, optionally persisted as JSON between runs."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        if path:
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.entries = {}
+
+    def get(self, name, ttl, now):
+        entry = self.entries.get(name)
+        if ttl > 0 and entry and now - entry['stored_at'] < ttl:
+            return entry['result']
+        return None
+
+    def put(self, name, result, now):
+        self.entries[name] = {'stored_at': now, 'result': result}
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f)
+        except TypeError:
+            # Results that are not JSON serialisable are only cached in memory
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, self.path)
+
+
+class CheckScheduler:
+    def __init__(self, registry, io_workers=8, cpu_workers=None, cache=None):
+        self.registry = registry
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.cache = cache or ResultCache()
+
+    def run(self, names=None):
+        """Run the selected checks (default: all) and their dependencies; ``{name: CheckOutcome}``."""
+        self.registry.validate()
+        selected = self._with_dependencies(names or list(self.registry.checks))
+        outcomes = {}
+        now = time.time()
+
+        pending = {}
+        for name in selected:
+            check = self.registry.checks[name]
+            cached = self.cache.get(name, check.ttl, now)
+            if cached is not None:
+                outcomes[name] = CheckOutcome(result=cached, cached=True)
+            else:
+                pending[name] = check
+
+        io_pool = ThreadPoolExecutor(max_workers=self.io_workers)
+        cpu_pool = None
+        running = {}
+        try:
+            while pending or running:
+                for name, check in list(pending.items()):
+                    if not all(dependency in outcomes for dependency in check.depends_on):
+                        continue
+                    del pending[name]
+                    failed = [dependency for dependency in check.depends_on if not outcomes[dependency].ok]
+                    if failed:
+                        outcomes[name] = CheckOutcome(skipped=True, error=f"dependency failed: {', '.join(failed)}")
+                        continue
+                    dependency_results = {dependency: outcomes[dependency].result for dependency in check.depends_on}
+                    if check.cost == 'cpu':
+                        if cpu_pool is None:
+                            # Imported on demand: multiprocessing is costly to load
+                            from concurrent.futures import ProcessPoolExecutor
+                            cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+                        future = cpu_pool.submit(check.func, dependency_results)
+                    else:
+                        future = io_pool.submit(check.func, dependency_results)
+                    running[future] = (name, time.perf_counter())
+
+                if not running:
+                    continue
+
+                # Wake up for the first completion or the nearest timeout
+                now_perf = time.perf_counter()
+                nearest = min(
+                    started + self.registry.checks[name].timeout - now_perf
+                    for name, started in running.values()
+                )
+                done, _ = wait(running, timeout=max(nearest, 0), return_when=FIRST_COMPLETED)
+
+                now_perf = time.perf_counter()
+                for future in list(running):
+                    name, started = running[future]
+                    elapsed = now_perf - started
+                    if future in done:
+                        del running[future]
+                        if future.exception() is not None:
+                            error = future.exception()
+                            outcomes[name] = CheckOutcome(error=f"{type(error).__name__}: {error}", elapsed=elapsed)
+                        else:
+                            outcomes[name] = CheckOutcome(result=future.result(), elapsed=elapsed)
+                            self.cache.put(name, future.result(), time.time())
+                    elif elapsed >= self.registry.checks[name].timeout:
+                        del running[future]
+                        future.cancel()
+                        outcomes[name] = CheckOutcome(
+                            error=f"timed out after {self.registry.checks[name].timeout}s", elapsed=elapsed
+                        )
+        finally:
+            # Timed-out checks may still be running; do not block on them
+            io_pool.shutdown(wait=False, cancel_futures=True)
+            if cpu_pool is not None:
+                cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+        self.cache.save()
+        return outcomes
+
+    def _with_dependencies(self, names):
+        selected = []
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name in selected:
+                continue
+            selected.append(name)
+            stack.extend(self.registry.checks[name].depends_on)
+        return selected
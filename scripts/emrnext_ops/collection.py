@@ -0,0 +1,122 @@
+"""One-pass collection of the ``/var/log/emrnext`` sources shared by the reports.
+
+:func:`collect` reads every source once into a :class:`SourceSnapshot`:
+
+* ``deployment.log`` is mapped once; its stage and error events are
+  folded into a :class:`DeploymentLogAccumulator` as they are found, and
+  component versions and its error-line counts come from the same mapping;
+* ``performance_metrics.json`` and ``deployment_metrics.json`` are read
+  once; only the keys the reports use are parsed out of them, and their
+  error lines are counted from the same bytes;
+* the remaining logs go through the parallel error scanner.
+
+The report classes accept the snapshot in place of reading files
+themselves, and :func:`run_stages` runs them concurrently over it.
+"""
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from emrnext_ops.deploy_log import VERSION_PATTERNS, DeploymentLogAccumulator, scan_buffer
+from emrnext_ops.error_scan import BUCKET_MINUTE, count_buffer, format_cutoff, is_log_file, scan_error_logs
+from emrnext_ops.json_stream import METRICS_PATHS, read_selected
+from emrnext_ops.log_access import mapped
+from emrnext_ops.stage_history import stage_duration
+
+LOG_DIR = '/var/log/emrnext'
+DEPLOYMENT_LOG = 'deployment.log'
+METRICS_DOCUMENTS = ('performance_metrics.json', 'deployment_metrics.json')
+ERROR_WINDOW_HOURS = 24
+
+
+class SourceSnapshot:
+    """Shared in-memory model of the log directory at ``collected_at``."""
+
+    def __init__(self, log_dir, collected_at, error_window_start):
+        self.log_dir = log_dir
+        self.collected_at = collected_at
+        self.error_window_start = error_window_start
+        # DeploymentLogAccumulator holding deployment.log's stages and errors;
+        # None when there is no deployment.log
+        self.deployment = None
+        # component -> version string or None
+        self.versions = {}
+        # file name -> METRICS_PATHS values of the metrics documents that exist
+        self.documents = {}
+        # (minute bucket, level, source) -> error lines since error_window_start
+        self.error_counts = Counter()
+        # Size of every source read, for the pipeline's telemetry
+        self.bytes_read = 0
+
+
+def log_files(log_dir):
+    """Log files of ``log_dir`` (see :func:`~emrnext_ops.error_scan.is_log_file`) in name order."""
+    return [
+        path for path in sorted(os.path.join(log_dir, name) for name in os.listdir(log_dir))
+        if is_log_file(path)
+    ] if os.path.isdir(log_dir) else []
+
+
+def collect(log_dir=LOG_DIR, error_log_paths=None, error_window_hours=ERROR_WINDOW_HOURS,
+            bucket_width=BUCKET_MINUTE, max_workers=None, now=None, deployment=None):
+    """Read each source once and return the :class:`SourceSnapshot`.
+
+    ``error_log_paths`` limits the error count to those files (default:
+    the :func:`log_files` of ``log_dir``).  ``deployment`` is the (empty)
+    :class:`DeploymentLogAccumulator` to fold deployment.log into, e.g. one
+    feeding the analyzer's stage history; by default a plain one is used.
+    """
+    now = now or datetime.now()
+    snapshot = SourceSnapshot(log_dir, now, now - timedelta(hours=error_window_hours))
+    cutoff = format_cutoff(snapshot.error_window_start)
+    error_log_paths = log_files(log_dir) if error_log_paths is None else list(error_log_paths)
+    counted = set(error_log_paths)
+
+    shared = [os.path.join(log_dir, DEPLOYMENT_LOG)] + [os.path.join(log_dir, name) for name in METRICS_DOCUMENTS]
+    for path in shared:
+        name = os.path.basename(path)
+        try:
+            with mapped(path) as buffer:
+                snapshot.bytes_read += len(buffer)
+                if name == DEPLOYMENT_LOG:
+                    # Memory stays bounded by the stages and the capped error sample
+                    if deployment is None:
+                        deployment = DeploymentLogAccumulator(stage_duration)
+                    snapshot.deployment = deployment.consume(scan_buffer(buffer))
+                    for component, pattern in VERSION_PATTERNS.items():
+                        match = pattern.search(buffer)
+                        snapshot.versions[component] = match.group(1).decode('ascii') if match else None
+                        # A live match pins the mapping open
+                        del match
+                else:
+                    try:
+                        snapshot.documents[name] = read_selected(buffer, METRICS_PATHS)
+                    except ValueError as e:
+                        print(f"Invalid metrics file {path}: {e}")
+                if path in counted:
+                    count_buffer(buffer, name, cutoff, snapshot.error_counts, bucket_width)
+        except FileNotFoundError:
+            continue
+
+    remaining = [path for path in error_log_paths if path not in shared]
+    snapshot.bytes_read += sum(os.path.getsize(path) for path in remaining)
+    snapshot.error_counts.update(
+        scan_error_logs(remaining, cutoff=snapshot.error_window_start, max_workers=max_workers,
+                        bucket_width=bucket_width)
+    )
+    return snapshot
+
+
+def run_stages(stages, max_workers=None):
+    """Run ``{name: callable}`` concurrently; ``{name: result}`` with failures as ``{"error": ...}``."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as executor:
+        futures = {name: executor.submit(stage) for name, stage in stages.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                # One failing report must not lose the others
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
@@ -0,0 +1,158 @@
+"""Single-pass, streaming parser for ``deployment.log``.
+
+Lines flow through a generator pipeline (read -> parse -> accumulate) so
+memory stays bounded by the number of distinct stages plus a capped sample
+of error messages, regardless of how large the log grows.  Whole files can
+instead be scanned with :func:`scan_log`, which matches bytes patterns on a
+memory-mapped view and decodes only the captured fields.
+"""
+import heapq
+import re
+
+from emrnext_ops.log_access import iter_buffers, open_text
+
+# [DEPLOY] <stage> - Started at <timestamp> - Completed at <timestamp>
+STAGE_PATTERN = re.compile(
+    r'\[DEPLOY\] (?P<stage>.+?) - Started at (?P<start>.+?) - Completed at (?P<end>.+?)\s*$'
+)
+ERROR_PATTERN = re.compile(r'ERROR: (?P<message>.*?)\s*$')
+
+# Line-bounded bytes equivalents for scanning mapped files
+STAGE_PATTERN_BYTES = re.compile(
+    rb'\[DEPLOY\] ([^\n]+?) - Started at ([^\n]+?) - Completed at ([^\n]+?)[ \t\r]*$', re.MULTILINE
+)
+# As in parse_events, a line holding a stage is only a stage: the lookahead
+# skips an ERROR: that precedes a stage on its line (one after it is dropped
+# when the matches are merged)
+ERROR_PATTERN_BYTES = re.compile(
+    rb'ERROR: (?![^\n]*\[DEPLOY\] [^\n]+? - Started at [^\n]+? - Completed at [^\n])([^\n]*?)[ \t\r]*$',
+    re.MULTILINE
+)
+
+# Component versions announced in the log; the first match wins
+VERSION_PATTERNS = {
+    'backend': re.compile(rb'Backend Version: ([\d.]+)'),
+    'frontend': re.compile(rb'Frontend Version: ([\d.]+)'),
+    'database': re.compile(rb'Database Version: ([\d.]+)')
+}
+# All three in one pattern, for finding every component in a single scan
+VERSION_PATTERN_BYTES = re.compile(rb'(Backend|Frontend|Database) Version: ([\d.]+)')
+
+STAGE_MARKER = '[DEPLOY]'
+ERROR_MARKER = 'ERROR: '
+
+# Keep at most this many error messages; the total is always counted
+MAX_ERROR_SAMPLES = 100
+
+
+def read_lines(path, encoding='utf-8'):
+    with open_text(path, encoding) as log_file:
+        yield from log_file
+
+
+def scan_log(path, encoding='utf-8'):
+    """Yield the same events as :func:`parse_events`, in the same order, straight from the (mapped) file.
+
+    The file is read once: a ``.gz`` log is decompressed chunk by chunk and
+    each chunk scanned before the next is read.
+    """
+    for buffer in iter_buffers(path):
+        yield from scan_buffer(buffer, encoding)
+
+
+def scan_buffer(buffer, encoding='utf-8'):
+    """:func:`scan_log` over an in-memory or mapped ``buffer`` already at hand."""
+    # Both patterns run over the buffer and their matches are merged back into
+    # file order; a single alternation finds the same events, but loses the
+    # regex engine's literal prefix search and scans about four times slower
+    stage_end = -1
+    matches = heapq.merge(STAGE_PATTERN_BYTES.finditer(buffer), ERROR_PATTERN_BYTES.finditer(buffer),
+                          key=lambda match: match.start())
+    for match in matches:
+        if match.re is STAGE_PATTERN_BYTES:
+            stage_end = match.end()
+            stage, start, end = match.groups()
+            yield ('stage', stage.decode(encoding, 'replace'), start.decode(encoding, 'replace'),
+                   end.decode(encoding, 'replace'))
+        elif match.start() > stage_end:
+            yield ('error', match.group(1).decode(encoding, 'replace'))
+
+
+def parse_events(lines):
+    """Yield ``('stage', stage, start, end)`` and ``('error', message)`` tuples."""
+    stage_search = STAGE_PATTERN.search
+    error_search = ERROR_PATTERN.search
+    for line in lines:
+        # Cheap substring checks skip the regex engine for most lines
+        if STAGE_MARKER in line:
+            match = stage_search(line)
+            if match:
+                yield ('stage', match['stage'], match['start'], match['end'])
+                continue
+        if ERROR_MARKER in line:
+            match = error_search(line)
+            if match:
+                yield ('error', match['message'])
+
+
+class DeploymentLogAccumulator:
+    """Folds parsed events into stage timings and error statistics.
+
+    ``stages`` keeps the latest run of each stage; every run is also offered
+    to ``history`` (a :class:`~emrnext_ops.stage_history.StageHistory`) if given.
+    """
+
+    def __init__(self, duration_fn, max_error_samples=MAX_ERROR_SAMPLES, history=None):
+        self.duration_fn = duration_fn
+        self.max_error_samples = max_error_samples
+        self.history = history
+        self.stages = {}
+        self.errors = []
+        self.error_count = 0
+
+    @classmethod
+    def from_state(cls, duration_fn, state, max_error_samples=MAX_ERROR_SAMPLES, history=None):
+        """Rebuild an accumulator from :meth:`state` output (or ``None``)."""
+        accumulator = cls(duration_fn, max_error_samples, history)
+        if state:
+            accumulator.stages = state['stages']
+            accumulator.errors = state['errors']
+            accumulator.error_count = state['error_count']
+        return accumulator
+
+    def state(self):
+        return {
+            'stages': self.stages,
+            'errors': self.errors,
+            'error_count': self.error_count
+        }
+
+    def add_stage(self, stage, start, end):
+        duration = self.duration_fn(start, end)
+        self.stages[stage] = {
+            'start': start,
+            'end': end,
+            'duration': duration
+        }
+        if self.history is not None:
+            self.history.add(stage, start, end, duration)
+
+    def add_error(self, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_error_samples:
+            self.errors.append(message)
+
+    def merge(self, other):
+        """Fold in an accumulator of events that came after this one's."""
+        self.stages.update(other.stages)
+        self.errors.extend(other.errors[:max(0, self.max_error_samples - len(self.errors))])
+        self.error_count += other.error_count
+        return self
+
+    def consume(self, events):
+        for event in events:
+            if event[0] == 'stage':
+                self.add_stage(*event[1:])
+            else:
+                self.add_error(event[1])
+        return self
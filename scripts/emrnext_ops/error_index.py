@@ -0,0 +1,201 @@
+"""Persistent, columnar minute-bucket index of error counts.
+
+Each (source, severity) pair owns one ``array('I')`` column holding a
+counter per minute for the retention period, used as a ring buffer indexed
+by ``minute % retention``.  All columns share one head (the newest minute
+written); advancing the head clears the slots it passes over.  Windowed
+queries are slice sums over those arrays, so "errors in the last N minutes
+by source" never touches raw logs.
+
+Minutes are counted as ``date.toordinal() * 1440 + hour * 60 + minute`` in
+the logs' local time, which avoids any timezone handling.
+
+File layout: ``MAGIC``, a 4-byte big-endian header length, a JSON header
+(retention, head, column keys) and the raw column arrays in header order.
+"""
+import json
+import os
+import struct
+from array import array
+from collections import Counter
+from datetime import datetime
+
+MAGIC = b'EMRIDX1\n'
+DEFAULT_RETENTION_MINUTES = 7 * 24 * 60
+
+
+def minute_ordinal(moment):
+    return moment.toordinal() * 1440 + moment.hour * 60 + moment.minute
+
+
+def minute_from_bucket(bucket):
+    """Minute ordinal of a ``YYYY-MM-DD HH:MM`` bucket as produced by the error scanner."""
+    return minute_ordinal(datetime.strptime(bucket[:16], '%Y-%m-%d %H:%M'))
+
+
+def format_minute(minute):
+    day, minute_of_day = divmod(minute, 1440)
+    return datetime.fromordinal(day).replace(hour=minute_of_day // 60, minute=minute_of_day % 60)
+
+
+class ErrorIndex:
+    def __init__(self, retention_minutes=DEFAULT_RETENTION_MINUTES):
+        self.retention = retention_minutes
+        self.head = None
+        self.columns = {}
+
+    @classmethod
+    def load(cls, path, retention_minutes=DEFAULT_RETENTION_MINUTES):
+        index = cls(retention_minutes)
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return index
+                (header_length,) = struct.unpack('>I', f.read(4))
+                header = json.loads(f.read(header_length))
+                if header['retention'] != retention_minutes:
+                    # Ring positions depend on the retention; start over
+                    return index
+                index.head = header['head']
+                for source, severity in header['columns']:
+                    column = array('I')
+                    column.fromfile(f, retention_minutes)
+                    index.columns[(source, severity)] = column
+        except (FileNotFoundError, EOFError, ValueError, KeyError, struct.error):
+            index.head, index.columns = None, {}
+        return index
+
+    def save(self, path):
+        # Columns without a single error in the retention period are dropped
+        columns = {key: column for key, column in self.columns.items() if any(column)}
+        header = json.dumps({
+            'retention': self.retention,
+            'head': self.head,
+            'columns': list(columns)
+        }).encode('utf-8')
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('>I', len(header)))
+            f.write(header)
+            for column in columns.values():
+                column.tofile(f)
+        os.replace(tmp_path, path)
+
+    def _column(self, source, severity):
+        column = self.columns.get((source, severity))
+        if column is None:
+            column = self.columns[(source, severity)] = array('I', bytes(4 * self.retention))
+        return column
+
+    def _slots(self, first, last):
+        # Ring slot ranges covering minutes first..last inclusive
+        first = max(first, last - self.retention + 1)
+        start, stop = first % self.retention, last % self.retention + 1
+        if start < stop:
+            return [(start, stop)]
+        return [(start, self.retention), (0, stop)]
+
+    def advance(self, minute):
+        """Move the head forward to ``minute``, clearing the slots passed over."""
+        if self.head is None:
+            self.head = minute
+            return
+        if minute <= self.head:
+            return
+        for start, stop in self._slots(self.head + 1, minute):
+            zeros = array('I', bytes(4 * (stop - start)))
+            for column in self.columns.values():
+                column[start:stop] = zeros
+        self.head = minute
+
+    def add(self, counts):
+        """Add ``{(minute, severity, source): count}`` (minutes as ordinals)."""
+        if not counts:
+            return
+        self.advance(max(minute for minute, _, _ in counts))
+        for (minute, severity, source), count in counts.items():
+            if minute <= self.head - self.retention:
+                continue
+            self._column(source, severity)[minute % self.retention] += count
+
+    def replace_window(self, first, last, counts):
+        """Overwrite minutes ``first..last`` with ``counts`` (e.g. after a full rescan)."""
+        self.advance(last)
+        if first > min(last, self.head):
+            return
+        for start, stop in self._slots(first, min(last, self.head)):
+            zeros = array('I', bytes(4 * (stop - start)))
+            for column in self.columns.values():
+                column[start:stop] = zeros
+        self.add({key: count for key, count in counts.items() if first <= key[0] <= last})
+
+    def count(self, minutes, now=None, source=None, severity=None):
+        """Errors in the ``minutes`` minutes up to ``now``, grouped by source."""
+        now = minute_ordinal(datetime.now()) if now is None else now
+        if self.head is None:
+            return {}
+        last = min(now, self.head)
+        first = now - minutes + 1
+        if last < first:
+            return {}
+        slots = self._slots(first, last)
+
+        totals = Counter()
+        for (column_source, column_severity), column in self.columns.items():
+            if source is not None and column_source != source:
+                continue
+            if severity is not None and column_severity != severity:
+                continue
+            totals[column_source] += sum(sum(column[start:stop]) for start, stop in slots)
+        return {key: value for key, value in totals.items() if value}
+
+    def total(self, minutes, now=None, **filters):
+        return sum(self.count(minutes, now, **filters).values())
+
+    def rate(self, minutes, now=None, **filters):
+        """Average errors per minute over the window."""
+        return self.total(minutes, now, **filters) / minutes
+
+    def trend(self, minutes, baseline_minutes, now=None, **filters):
+        """Rate of the last ``minutes`` relative to the ``baseline_minutes`` before them."""
+        now = minute_ordinal(datetime.now()) if now is None else now
+        recent = self.rate(minutes, now, **filters)
+        baseline = self.rate(baseline_minutes, now - minutes, **filters)
+        if baseline == 0:
+            return None if recent == 0 else float('inf')
+        return recent / baseline
+
+    def summary(self, minutes, bucket_minutes=60, now=None):
+        """Report section with totals by level/source and a bucketed histogram."""
+        now = minute_ordinal(datetime.now()) if now is None else now
+        by_level = Counter()
+        by_source = Counter()
+        frequency = []
+        if self.head is not None:
+            first = now - minutes + 1
+            for (source, severity), column in sorted(self.columns.items()):
+                buckets = Counter()
+                for minute in range(max(first, self.head - self.retention + 1), min(now, self.head) + 1):
+                    value = column[minute % self.retention]
+                    if value:
+                        buckets[minute - minute % bucket_minutes] += value
+                for bucket, count in sorted(buckets.items()):
+                    frequency.append({
+                        "bucket": format_minute(bucket).strftime('%Y-%m-%d %H:%M'),
+                        "level": severity,
+                        "source": source,
+                        "count": count
+                    })
+                    by_level[severity] += count
+                    by_source[source] += count
+        frequency.sort(key=lambda entry: (entry['bucket'], entry['level'], entry['source']))
+        return {
+            "total": sum(by_level.values()),
+            "by_level": dict(by_level),
+            "by_source": dict(by_source),
+            "error_frequency": frequency
+        }
+
@@ -0,0 +1,409 @@
+"""Fan-out health probing of every backend replica in the fleet.
+
+The inventory is a YAML (or JSON) file listing the replicas to probe:
+
+    manifest: ../k8s/production/blue-green-deployment.yaml
+    targets:
+      - name: blue-0
+        address: 10.1.0.11          # probed on the deployment's readiness port and path
+        deployment: emrnext-blue
+      - name: railway
+        url: https://emrnext.railway.app/api/health
+        color: blue
+
+Targets that name a ``deployment`` take their colour (the ``deployment``
+pod label), health path and port from the Kubernetes manifest.  The
+manifest also gives each colour's expected replica count, and the
+Service selector tells which colour is live.
+
+:class:`FleetProber` probes all targets on one asyncio event loop:
+
+* at most ``concurrency`` requests are in flight;
+* each host gets a token bucket of ``per_host_rate`` requests per second;
+* start times are spread by a random ``jitter``, so replicas are not hit
+  in lockstep every scrape;
+* a per-host :class:`CircuitBreaker` stops probing a host after
+  ``failure_threshold`` connection failures in a row.  One trial probe is
+  let through after ``cooldown`` seconds;
+* everything still running at ``deadline`` is cancelled.  The default
+  keeps a run inside one 15 s scrape interval.
+
+:class:`FleetHealthCheck` turns the results into a fleet report.  The report
+has one entry per replica and a rollup per colour; the overall health is
+judged on the live colour.
+"""
+import asyncio
+import json
+import os
+import random
+import ssl
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from emrnext_ops.probes import ProbeResult
+from emrnext_ops.quantiles import DDSketch
+from emrnext_ops.report_store import ReportStore
+from emrnext_ops.telemetry import Telemetry
+
+DEFAULT_DEADLINE = 12           # seconds; inside the 15 s scrape interval
+DEFAULT_HEALTH_PATH = '/health'
+DEFAULT_PORT = 80
+MAX_RESPONSE_BYTES = 64 * 1024
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class Target:
+    def __init__(self, name, url, color=None, deployment=None):
+        self.name = name
+        self.url = url
+        self.color = color
+        self.deployment = deployment
+
+    @property
+    def host(self):
+        parts = urlsplit(self.url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        return with_port(parts.hostname, port)
+
+
+def read_manifest(path):
+    """Deployments (colour, replicas, probe path and port) and the live colour of a blue/green manifest."""
+    import yaml
+    with open(path, 'r') as f:
+        documents = [document for document in yaml.safe_load_all(f) if document]
+
+    deployments = {}
+    live_color = None
+    for document in documents:
+        spec = document.get('spec') or {}
+        if document.get('kind') == 'Deployment':
+            template = spec.get('template') or {}
+            labels = (template.get('metadata') or {}).get('labels') or {}
+            containers = (template.get('spec') or {}).get('containers') or [{}]
+            probe = (containers[0].get('readinessProbe') or {}).get('httpGet') or {}
+            deployments[document['metadata']['name']] = {
+                "color": labels.get('deployment'),
+                "replicas": spec.get('replicas', 1),
+                "path": probe.get('path', DEFAULT_HEALTH_PATH),
+                "port": probe.get('port', DEFAULT_PORT)
+            }
+        elif document.get('kind') == 'Service':
+            live_color = (spec.get('selector') or {}).get('deployment', live_color)
+    return {"deployments": deployments, "live_color": live_color}
+
+
+def with_port(address, port):
+    """``host:port`` for an inventory address given as host, host:port, IPv6, ``[IPv6]`` or ``[IPv6]:port``."""
+    if address.startswith('['):
+        return address if ']:' in address else f"{address}:{port}"
+    if address.count(':') > 1:
+        # A bare IPv6 address never carries a port
+        return f"[{address}]:{port}"
+    return address if ':' in address else f"{address}:{port}"
+
+
+def load_inventory(path, manifest_path=None):
+    """``(targets, layout)`` from an inventory file; ``layout`` is :func:`read_manifest` or ``None``."""
+    with open(path, 'r') as f:
+        if path.endswith('.json'):
+            inventory = json.load(f)
+        else:
+            import yaml
+            inventory = yaml.safe_load(f) or {}
+
+    manifest_path = manifest_path or inventory.get('manifest')
+    if manifest_path and not os.path.isabs(manifest_path):
+        # Relative to the inventory file, like an include
+        manifest_path = os.path.join(os.path.dirname(os.path.abspath(path)), manifest_path)
+    layout = read_manifest(manifest_path) if manifest_path else None
+    deployments = layout['deployments'] if layout else {}
+
+    targets = []
+    for entry in inventory.get('targets', []):
+        deployment = deployments.get(entry.get('deployment'), {})
+        url = entry.get('url')
+        if url is None:
+            address = with_port(entry['address'], deployment.get('port', DEFAULT_PORT))
+            url = f"http://{address}{deployment.get('path', DEFAULT_HEALTH_PATH)}"
+        targets.append(Target(entry.get('name', url), url, entry.get('color', deployment.get('color')),
+                              entry.get('deployment')))
+    return targets, layout
+
+
+class RateLimiter:
+    """Token bucket for one event loop: ``rate`` requests per second, bursts of ``burst``."""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    async def acquire(self):
+        while True:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """Closed, open after ``failure_threshold`` failures in a row, half open after ``cooldown``."""
+
+    def __init__(self, failure_threshold=3, cooldown=60, clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        if self.state == 'open' and self.clock() - self.opened_at >= self.cooldown:
+            # Let one trial probe through
+            self.state = 'half_open'
+            return True
+        return self.state == 'closed'
+
+    def record(self, ok):
+        if ok:
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            self.state = 'open'
+            self.opened_at = self.clock()
+
+    def to_dict(self):
+        return {"state": self.state, "failures": self.failures, "opened_at": self.opened_at}
+
+    def restore(self, data):
+        self.state = data.get('state', 'closed')
+        self.failures = data.get('failures', 0)
+        self.opened_at = data.get('opened_at')
+        if self.state == 'half_open':
+            # The trial probe never reported back; wait for the next one
+            self.state = 'open'
+
+
+class FleetProber:
+    def __init__(self, concurrency=64, per_host_rate=5.0, per_host_burst=2, jitter=1.0, timeout=5,
+                 deadline=DEFAULT_DEADLINE, failure_threshold=3, cooldown=60, ssl_context=None, seed=None):
+        self.concurrency = concurrency
+        self.per_host_rate = per_host_rate
+        self.per_host_burst = per_host_burst
+        # Never spend more than half the deadline waiting to start
+        self.jitter = min(jitter, deadline / 2)
+        self.timeout = timeout
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.random = random.Random(seed)
+        # Breakers outlive a run so dead hosts stay skipped across runs
+        self.breakers = {}
+
+    def breaker(self, host):
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return self.breakers[host]
+
+    def load_state(self, path):
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        for host, data in state.items():
+            self.breaker(host).restore(data)
+
+    def save_state(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({host: breaker.to_dict() for host, breaker in self.breakers.items()}, f)
+        os.replace(tmp_path, path)
+
+    def run(self, targets):
+        """``{target name: ProbeResult}``; ``CircuitOpenError``/``TimeoutError`` for probes not made."""
+        return asyncio.run(self._run(targets))
+
+    async def _run(self, targets):
+        slots = asyncio.Semaphore(self.concurrency)
+        limiters = {}
+        tasks = {}
+        for target in targets:
+            limiter = limiters.setdefault(target.host, RateLimiter(self.per_host_rate, self.per_host_burst))
+            delay = self.random.uniform(0, self.jitter)
+            tasks[asyncio.ensure_future(self._probe(target, slots, limiter, delay))] = target
+
+        results = {}
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            for task, target in tasks.items():
+                if task in done:
+                    results[target.name] = task.result()
+                else:
+                    # Not held against the host: the probe may never have started
+                    results[target.name] = TimeoutError(f"probe exceeded run deadline of {self.deadline}s")
+        return results
+
+    async def _probe(self, target, slots, limiter, delay):
+        await asyncio.sleep(delay)
+        await limiter.acquire()
+        async with slots:
+            # Checked last, so failures earlier in this run count
+            breaker = self.breaker(target.host)
+            if not breaker.allow():
+                return CircuitOpenError(f"circuit open for {target.host}")
+            result = await self.http_probe(target.url)
+        # A host that answers at all is alive, whatever the status
+        breaker.record(result.status_code is not None)
+        return result
+
+    async def http_probe(self, url):
+        parts = urlsplit(url)
+        https = parts.scheme == 'https'
+        port = parts.port or (443 if https else 80)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        timings = {}
+        started = time.perf_counter()
+        writer = None
+        try:
+            # One connection per probe: replicas are probed once per run
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(
+                parts.hostname, port, ssl=self.ssl_context if https else None,
+                server_hostname=parts.hostname if https else None
+            ), self.timeout)
+            # Includes DNS and, for https, the TLS handshake
+            timings['connect'] = time.perf_counter() - started
+            request_started = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n"
+                         f"User-Agent: emrnext-fleet-probe\r\n\r\n".encode('ascii'))
+            status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+            timings['ttfb'] = time.perf_counter() - request_started
+            status_code = int(status_line.split()[1])
+            await asyncio.wait_for(reader.read(MAX_RESPONSE_BYTES), self.timeout)
+        except (OSError, asyncio.TimeoutError, ssl.SSLError, ValueError, IndexError) as e:
+            timings['total'] = time.perf_counter() - started
+            return ProbeResult(error=f"{type(e).__name__}: {e}", timings=timings)
+        finally:
+            if writer is not None:
+                writer.close()
+        timings['total'] = time.perf_counter() - started
+        return ProbeResult(status_code=status_code, timings=timings)
+
+
+def _health(score):
+    # Same bands as the single-host report
+    return (
+        "EXCELLENT" if score >= 1 else
+        "GOOD" if score >= 4 / 6 else
+        "NEEDS_ATTENTION" if score >= 2 / 6 else
+        "CRITICAL"
+    )
+
+
+class FleetHealthCheck:
+    report_dir = '/var/log/emrnext'
+
+    def __init__(self, targets, layout=None, prober=None, state_path=None, telemetry=None):
+        self.targets = targets
+        self.layout = layout or {"deployments": {}, "live_color": None}
+        self.prober = prober or FleetProber()
+        # Circuit breaker states carried between cron runs
+        self.state_path = state_path
+        self.telemetry = telemetry or Telemetry('fleet_health')
+
+    def _target_status(self, target, result):
+        entry = {"color": target.color, "deployment": target.deployment, "host": target.host, "url": target.url}
+        if isinstance(result, CircuitOpenError):
+            return {**entry, "status": "CIRCUIT_OPEN", "response_code": None}
+        if isinstance(result, Exception):
+            return {**entry, "status": "TIMEOUT", "response_code": None}
+        if result.status_code is None:
+            return {**entry, "status": "UNREACHABLE", "response_code": None, "error": result.error,
+                    "latency": result.latency()}
+        return {**entry, "status": "HEALTHY" if result.status_code == 200 else "UNHEALTHY",
+                "response_code": result.status_code, "latency": result.latency()}
+
+    def _rollup(self, entries, expected=None):
+        counts = {}
+        latency = DDSketch()
+        for entry in entries:
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+            # Only answered probes: a refused connect or a timeout is not a response time
+            if entry['response_code'] is not None:
+                latency.add(entry['latency']['total'])
+        # Missing replicas count against the score like unhealthy ones
+        size = max(len(entries), expected or 0)
+        score = counts.get('HEALTHY', 0) / size if size else 0.0
+        rollup = {
+            "targets": len(entries),
+            "statuses": counts,
+            "health_score": round(score, 3),
+            "health": _health(score),
+            "latency_ms": None
+        }
+        if latency.count:
+            p50, p95 = latency.quantiles([0.5, 0.95])
+            rollup["latency_ms"] = {"p50": round(p50, 3), "p95": round(p95, 3), "max": round(latency.max, 3)}
+        if expected is not None:
+            rollup["expected_replicas"] = expected
+        return rollup
+
+    def generate_report(self):
+        with self.telemetry.run():
+            if self.state_path:
+                self.prober.load_state(self.state_path)
+            with self.telemetry.span('probe'):
+                results = self.prober.run(self.targets)
+            if self.state_path:
+                self.prober.save_state(self.state_path)
+
+            targets = {target.name: self._target_status(target, results[target.name]) for target in self.targets}
+            self.telemetry.count('targets', len(targets))
+            self.telemetry.count('circuit_open', sum(entry['status'] == 'CIRCUIT_OPEN' for entry in targets.values()))
+
+            expected = {}
+            for deployment in self.layout['deployments'].values():
+                if deployment['color']:
+                    expected[deployment['color']] = expected.get(deployment['color'], 0) + deployment['replicas']
+            colors = {}
+            for color in sorted({entry['color'] for entry in targets.values() if entry['color']} | set(expected)):
+                colors[color] = self._rollup([entry for entry in targets.values() if entry['color'] == color],
+                                             expected.get(color))
+                colors[color]["live"] = color == self.layout['live_color']
+
+            live = self.layout['live_color']
+            # Judge the fleet on the colour serving traffic; all targets without a known one
+            judged = colors[live] if live in colors else self._rollup(list(targets.values()))
+            report = {
+                "timestamp": datetime.now().isoformat(),
+                "targets": targets,
+                "colors": colors,
+                "fleet": {
+                    **self._rollup(list(targets.values())),
+                    "live_color": live,
+                    "overall_health": judged["health"],
+                    "hosts_circuit_open": sorted(host for host, breaker in self.prober.breakers.items()
+                                                 if breaker.state == 'open')
+                }
+            }
+        report['telemetry'] = self.telemetry.summary()
+
+        ReportStore(os.path.join(self.report_dir, 'reports')).append('fleet', report)
+        return report
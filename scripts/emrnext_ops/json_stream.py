@@ -0,0 +1,346 @@
+"""Streaming reader pulling selected keys out of large JSON and NDJSON files.
+
+:func:`read_selected` walks a document (or a sequence of documents, one
+per line or simply concatenated) and keeps only the values at the given
+dotted paths, e.g. ``response_time`` or ``stages.*``.  ``*`` matches any
+key or array index.  Everything else is skipped without being built.
+Numbers at a selected path are aggregated as they stream past: a number
+seen once is returned as it is.  Arrays of numbers, or a number repeated
+on every NDJSON line, become their mean, with count, min, max, p50 and
+p95 under ``<key>_samples``.  Memory is bounded by the read chunk plus
+the largest single selected value, however big the file grows.
+
+The stdlib scanner does the parsing: ``JSONDecoder.raw_decode`` for the
+values that are kept, and regexes to skip over the rest (text already
+skipped is dropped before the next read).  Runs of numbers in a selected
+array are matched by one regex and added to the sketch in batches.  When
+``orjson`` is installed it is the fast path for NDJSON lines and for
+documents up to ``WHOLE_DOCUMENT_LIMIT`` bytes, which are then parsed in
+one call and walked in memory with the same selection rules.
+"""
+import codecs
+import io
+import json
+import os
+import re
+
+from emrnext_ops.quantiles import DDSketch
+
+CHUNK_SIZE = 1024 * 1024
+# Documents up to this size are parsed in one call when orjson is available
+WHOLE_DOCUMENT_LIMIT = 8 * 1024 * 1024
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+# What the reports use from performance_metrics.json and deployment_metrics.json
+METRICS_PATHS = ('response_time', 'database_query_time', 'stages.*')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Anything up to and including the next complete string or bracket
+_TOKEN = re.compile(r'[^"\[\]{}]*("(?:[^"\\]|\\.)*"|[\[\]{}])', re.S)
+# Numbers, literals, commas and colons: what skip() passes over unread
+_SCALARS = re.compile(r'[^"\[\]{}]*')
+# Characters of a run of number elements; a flat class, so matching needs no backtracking state
+_NUMBER_CHARS = re.compile(r'[-+.eE0-9 \t\n\r,]*')
+# Characters of a selected array matched at once, bounding each batch of numbers
+NUMBER_RUN_CHARS = 64 * 1024
+# What may still follow a number split at the end of the buffer, e.g. ``12.`` or ``1e``
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+_decoder = json.JSONDecoder()
+
+
+def fast_loads():
+    """``orjson.loads`` when installed, else ``None``."""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson.loads
+
+
+class SampleStats:
+    """Count, sum, extremes and a quantile sketch of a stream of numbers."""
+
+    def __init__(self):
+        self.sketch = DDSketch()
+        self.from_array = False
+
+    def add(self, value):
+        self.sketch.add(value)
+
+    def extend(self, values):
+        self.sketch.add_many(values)
+
+    def summary(self):
+        p50, p95 = self.sketch.quantiles([0.5, 0.95])
+        return {"count": self.sketch.count, "mean": self.sketch.mean, "min": self.sketch.min,
+                "max": self.sketch.max, "p50": p50, "p95": p95}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class _Selection:
+    def __init__(self, paths):
+        self.patterns = [tuple(path.split('.')) for path in paths]
+        self.values = {}
+        self.samples = {}
+
+    def _matches(self, pattern, path):
+        return all(want == '*' or want == key for want, key in zip(pattern, path))
+
+    def selected(self, path):
+        return any(len(pattern) == len(path) and self._matches(pattern, path) for pattern in self.patterns)
+
+    def leads_to(self, path):
+        return any(len(pattern) > len(path) and self._matches(pattern, path) for pattern in self.patterns)
+
+    def _stats(self, path):
+        stats = self.samples.get(path)
+        if stats is None:
+            stats = self.samples[path] = SampleStats()
+        return stats
+
+    def add(self, path, value, from_array=False):
+        if _is_number(value):
+            stats = self._stats(path)
+            stats.add(value)
+            stats.from_array |= from_array
+        else:
+            self.values[path] = value
+
+    def add_numbers(self, path, numbers):
+        # A batch of elements of a selected array
+        stats = self._stats(path)
+        stats.extend(numbers)
+        stats.from_array = True
+
+    def walk(self, value, path=()):
+        # In-memory walk of an already parsed document, same rules as the stream
+        if self.selected(path):
+            if isinstance(value, list):
+                self.add_numbers(path, [element for element in value if _is_number(element)])
+                for element in value:
+                    if not _is_number(element):
+                        self.add(path, element, from_array=True)
+            else:
+                self.add(path, value)
+        elif isinstance(value, dict) and self.leads_to(path):
+            for key, child in value.items():
+                self.walk(child, path + (key,))
+        elif isinstance(value, list) and self.leads_to(path):
+            for index, child in enumerate(value):
+                self.walk(child, path + (str(index),))
+
+    def result(self):
+        result = {}
+        items = list(self.values.items())
+        for path, stats in self.samples.items():
+            if stats.sketch.count == 1 and not stats.from_array:
+                items.append((path, stats.sketch.sum))
+            else:
+                items.append((path, stats.sketch.mean))
+                items.append((path[:-1] + (f"{path[-1]}_samples",), stats.summary()))
+        for path, value in items:
+            node = result
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = value
+        return result
+
+
+class JSONStream:
+    """Incremental tokenizer over a binary file object (anything with ``read``)."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        # A multi-byte character may be split across two chunks
+        self.decoder = codecs.getincrementaldecoder('utf-8')('strict')
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self):
+        if self.eof:
+            return False
+        # Grow geometrically so one large value is not re-scanned once per chunk
+        data = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        self.bytes_read += len(data)
+        self.eof = not data
+        self.buf = self.buf[self.pos:] + self.decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character without consuming it; ``''`` at the end."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars):
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise ValueError(f"Expected {chars!r} at offset {self.bytes_read}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode and consume the next complete value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number ending the buffer may continue in the next chunk
+                if self.eof or not (isinstance(value, (int, float)) and _NUMBER_TAIL.match(self.buf, end)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def skip(self):
+        """Consume the next value without building it."""
+        if self.peek() not in ('[', '{'):
+            self.value()
+            return
+        depth = 0
+        while True:
+            match = _TOKEN.match(self.buf, self.pos)
+            if match is None:
+                # No string or bracket ends in the buffer: drop the scalars so
+                # that at most an unfinished string is carried into the next read
+                self.pos = _SCALARS.match(self.buf, self.pos).end()
+                if not self._fill():
+                    raise ValueError("Truncated JSON document")
+                continue
+            self.pos = match.end()
+            token = match.group(1)
+            if token in ('[', '{'):
+                depth += 1
+            elif token in (']', '}'):
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def numbers(self):
+        """Consume the run of ``number,`` elements that follows, if any; their values.
+
+        The element after the run's last comma is left for :meth:`value`,
+        since it may continue past the buffer.  Elements are read by
+        ``float``, which raises ``ValueError`` on anything but a number.
+        """
+        end = _NUMBER_CHARS.match(self.buf, self.pos, min(len(self.buf), self.pos + NUMBER_RUN_CHARS)).end()
+        comma = self.buf.rfind(',', self.pos, end)
+        if comma < 0:
+            return ()
+        values = list(map(float, self.buf[self.pos:comma].split(',')))
+        self.pos = comma + 1
+        return values
+
+    def members(self):
+        """Yield the keys of the object that follows; consume each value before the next key."""
+        self._expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def elements(self):
+        """Yield once per element of the array that follows; consume each before the next."""
+        self._expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self._expect(',]') == ']':
+                return
+
+
+def _walk_stream(stream, selection, path=()):
+    char = stream.peek()
+    if selection.selected(path):
+        if char == '[':
+            for _ in stream.elements():
+                numbers = stream.numbers()
+                if numbers:
+                    selection.add_numbers(path, numbers)
+                # The element after a run of numbers (or any other element)
+                selection.add(path, stream.value(), from_array=True)
+        else:
+            selection.add(path, stream.value())
+    elif char == '{' and selection.leads_to(path):
+        for key in stream.members():
+            _walk_stream(stream, selection, path + (key,))
+    elif char == '[' and selection.leads_to(path):
+        for index in stream.elements():
+            _walk_stream(stream, selection, path + (str(index),))
+    else:
+        stream.skip()
+
+
+def read_stream(f, paths, chunk_size=CHUNK_SIZE):
+    """:func:`read_selected` over an open binary file (or mmap), always streaming."""
+    selection = _Selection(paths)
+    stream = JSONStream(f, chunk_size)
+    if stream.peek() == '':
+        raise ValueError("Empty JSON document")
+    # Several top-level values (NDJSON or concatenated documents) are all read
+    while stream.peek() != '':
+        _walk_stream(stream, selection)
+    return selection.result()
+
+
+def read_selected(source, paths, accelerated=None, chunk_size=CHUNK_SIZE):
+    """Values at the dotted ``paths`` in a JSON/NDJSON file path or buffer, as a nested dict.
+
+    ``accelerated`` forces (True) or disables (False) the orjson fast path;
+    by default it is used when installed.
+    """
+    loads = fast_loads() if accelerated is not False else None
+    if accelerated and loads is None:
+        raise RuntimeError("orjson is not installed")
+
+    if isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+        if loads is not None and str(source).endswith(NDJSON_EXTENSIONS):
+            selection = _Selection(paths)
+            with open(source, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        selection.walk(loads(line))
+            return selection.result()
+        if loads is not None and size <= WHOLE_DOCUMENT_LIMIT:
+            with open(source, 'rb') as f:
+                data = f.read()
+            return _read_whole(data, paths, loads, chunk_size)
+        with open(source, 'rb') as f:
+            return read_stream(f, paths, chunk_size)
+
+    # A buffer, e.g. a mapping already open for another scan; mmap reads like a file
+    if loads is not None and len(source) <= WHOLE_DOCUMENT_LIMIT:
+        return _read_whole(bytes(source), paths, loads, chunk_size)
+    return read_stream(source if hasattr(source, 'read') else io.BytesIO(source), paths, chunk_size)
+
+
+def _read_whole(data, paths, loads, chunk_size):
+    try:
+        document = loads(data)
+    except ValueError:
+        # Several documents in one file: only the stream reads past the first
+        return read_stream(io.BytesIO(data), paths, chunk_size)
+    selection = _Selection(paths)
+    selection.walk(document)
+    return selection.result()
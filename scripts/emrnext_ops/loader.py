@@ -0,0 +1,18 @@
+"""Import the hyphenated report scripts under ``scripts/`` as modules."""
+import importlib.util
+import os
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_script(filename):
+    # The report scripts have hyphenated names and cannot be imported normally
+    name = filename[:-3].replace('-', '_')
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
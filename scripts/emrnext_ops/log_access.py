@@ -0,0 +1,98 @@
+"""Zero-copy access to log files for bytes-level regex scanning.
+
+Plain files are ``mmap``-ed and compiled ``bytes`` patterns run directly
+over the mapping, so the file is never copied into a Python ``str``; only
+the groups of a match are materialised.  Gzip-rotated files (``*.gz``)
+cannot be mapped and are decompressed as a stream of line-aligned chunks
+instead.  Patterns must not span lines for the streaming fallback to find
+the same matches.
+"""
+import mmap
+import os
+from contextlib import contextmanager
+
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def is_compressed(path):
+    return path.endswith('.gz')
+
+
+def open_text(path, encoding='utf-8'):
+    """Open a plain or gzip-compressed log for line-by-line text reading."""
+    if is_compressed(path):
+        import gzip
+        return gzip.open(path, 'rt', encoding=encoding, errors='replace')
+    return open(path, 'r', encoding=encoding, errors='replace')
+
+
+@contextmanager
+def mapped(path):
+    """Read-only ``mmap`` of ``path``; empty files yield ``b''`` (they cannot be mapped)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if hasattr(buffer, 'madvise'):
+                buffer.madvise(mmap.MADV_SEQUENTIAL)
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def _stream_chunks(path):
+    # Decompressed chunks cut at line boundaries; gzip only loads for rotated logs
+    import gzip
+    with gzip.open(path, 'rb') as f:
+        carry = b''
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer = carry + chunk
+            cut = buffer.rfind(b'\n') + 1
+            carry = buffer[cut:]
+            if cut:
+                yield buffer[:cut]
+        if carry:
+            yield carry
+
+
+def iter_buffers(path):
+    """Yield the mapping of ``path``, or the decompressed chunks of a ``.gz`` log.
+
+    Matches found in a buffer must be dropped before the next one is
+    requested, or the mapping cannot be closed.
+    """
+    if is_compressed(path):
+        yield from _stream_chunks(path)
+        return
+    with mapped(path) as buffer:
+        yield buffer
+
+
+def iter_matches(path, pattern):
+    """Yield ``match.groups()`` (as ``bytes``) for every match of ``pattern`` in ``path``."""
+    if is_compressed(path):
+        for chunk in _stream_chunks(path):
+            for match in pattern.finditer(chunk):
+                yield match.groups()
+        return
+
+    with mapped(path) as buffer:
+        for match in pattern.finditer(buffer):
+            groups = match.groups()
+            # Drop the match before yielding so the mapping can always be closed
+            del match
+            yield groups
+
+
+def search_first(path, pattern):
+    """Groups of the first match of ``pattern`` in ``path`` or ``None``; stops reading there."""
+    matches = iter_matches(path, pattern)
+    try:
+        return next(matches, None)
+    finally:
+        matches.close()
@@ -0,0 +1,285 @@
+"""Prometheus text exposition and a long-running health check daemon.
+
+:class:`HealthDaemon` runs every check group registered on a
+``SystemHealthChecker`` on its own interval, keeps the latest results and
+re-renders the exposition text after each update.  Scrapes of ``/metrics`` only return that cached
+payload, so they never trigger probes and cost microseconds.
+"""
+import logging
+import math
+import threading
+import time
+
+from emrnext_ops.check_registry import DEFAULT_GROUP
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds between runs of each check group; other groups use DEFAULT_GROUP's
+DEFAULT_INTERVALS = {
+    'resources': 15,
+    'services': 30,
+    'network': 60,
+    'security': 3600,
+    DEFAULT_GROUP: 60
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricFamily:
+    def __init__(self, name, metric_type, help_text):
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.samples = []
+
+    def add(self, value, labels=None, suffix=''):
+        self.samples.append((suffix, labels or {}, value))
+        return self
+
+
+class Histogram:
+    """Cumulative histogram per label set, rendered as ``_bucket``/``_sum``/``_count``."""
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        counts, total = self._series.get(key, ([0] * len(self.buckets), [0, 0.0]))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        total[0] += 1
+        total[1] += value
+        self._series[key] = (counts, total)
+
+    def family(self):
+        family = MetricFamily(self.name, 'histogram', self.help_text)
+        for key, (counts, (count, value_sum)) in sorted(self._series.items()):
+            labels = dict(key)
+            for bound, bucket_count in zip(self.buckets, counts):
+                family.add(bucket_count, {**labels, 'le': format_value(float(bound))}, '_bucket')
+            family.add(count, {**labels, 'le': '+Inf'}, '_bucket')
+            family.add(value_sum, labels, '_sum')
+            family.add(count, labels, '_count')
+        return family
+
+
+def render(families):
+    lines = []
+    for family in families:
+        if not family.samples:
+            continue
+        lines.append(f"# HELP {family.name} {family.help_text}")
+        lines.append(f"# TYPE {family.name} {family.metric_type}")
+        for suffix, labels, value in family.samples:
+            lines.append(f"{family.name}{suffix}{format_labels(labels)} {format_value(value)}")
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class MetricsServer:
+    """HTTP server answering ``/metrics`` from a pre-rendered payload."""
+
+    def __init__(self, bind='0.0.0.0', port=9105):
+        # Deferred so that rendering metrics (e.g. for a textfile) does not load the server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.payload = b''
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] == '/metrics':
+                    body, content_type = server.payload, CONTENT_TYPE
+                elif self.path == '/-/healthy':
+                    body, content_type = b'OK\n', 'text/plain'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((bind, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def update(self, payload):
+        # Replacing the reference is atomic; handlers see old or new payload
+        self.payload = payload
+
+    def start(self):
+        thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-server', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class HealthDaemon:
+    """Schedules a SystemHealthChecker's check groups and exports their results."""
+
+    def __init__(self, checker, intervals=None, bind='0.0.0.0', port=9105):
+        self.checker = checker
+        self.intervals = {**DEFAULT_INTERVALS, **(intervals or {})}
+        self.server = MetricsServer(bind, port)
+        self.latency = Histogram(
+            'emrnext_health_probe_duration_seconds', 'Duration of health probes by probe and phase'
+        )
+        # Per group: wall time and completion of its last run, and run count
+        self.last_duration = {}
+        self.last_run = {}
+        self.runs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        checker.probe_observers.append(self._observe_probes)
+
+    def interval(self, group):
+        return self.intervals.get(group, self.intervals[DEFAULT_GROUP])
+
+    def run_group(self, group):
+        with self.checker.telemetry.span(f'group.{group}'):
+            started = time.perf_counter()
+            self._run_group(group)
+
+        with self._lock:
+            self.last_duration[group] = time.perf_counter() - started
+            self.last_run[group] = time.time()
+            self.runs[group] = self.runs.get(group, 0) + 1
+            self.checker.determine_overall_health()
+            self.server.update(render(self.families()))
+
+    def _run_group(self, group):
+        # The group's registered checks run without holding the lock; only
+        # merging their results into the report is serialised
+        outcomes = self.checker.scheduler.run(self.checker.registry.groups().get(group, []))
+        with self._lock:
+            self.checker.merge_outcomes(outcomes)
+
+    def _observe_probes(self, results):
+        with self._lock:
+            for (_, name), result in results.items():
+                for phase, seconds in getattr(result, 'timings', {}).items():
+                    self.latency.observe(seconds, probe=name, phase=phase)
+
+    def families(self):
+        report = self.checker.health_report
+        resources = MetricFamily('emrnext_health_resource_usage_percent', 'gauge', 'Host resource usage')
+        for resource, value in report['system_resources'].items():
+            if isinstance(value, (int, float)):
+                resources.add(value, {'resource': resource.replace('_usage', '')})
+
+        p95 = MetricFamily('emrnext_health_resource_usage_p95_percent', 'gauge',
+                           'Host resource usage, 95th percentile over the sampling window')
+        for resource in ('cpu', 'memory', 'disk'):
+            if resource in report.get('resource_stats', {}):
+                p95.add(report['resource_stats'][resource]['p95'], {'resource': resource})
+
+        services = MetricFamily('emrnext_health_service_up', 'gauge', 'Service answered with HTTP 200')
+        codes = MetricFamily('emrnext_health_service_response_code', 'gauge', 'Last HTTP status per service')
+        for name, status in report['service_status'].items():
+            services.add(status['status'] == 'HEALTHY', {'service': name})
+            codes.add(status['response_code'], {'service': name})
+
+        network = MetricFamily('emrnext_health_network_up', 'gauge', 'External site reachable with HTTP 200')
+        for site, status in report['network_connectivity'].items():
+            network.add(status['status'] == 'CONNECTED', {'site': site})
+
+        security = MetricFamily('emrnext_health_security_check_ok', 'gauge', 'Security check passed')
+        expiry = MetricFamily('emrnext_health_tls_certificate_days_remaining', 'gauge',
+                              'Days until the TLS certificate expires')
+        for name, check in report['security_checks'].items():
+            security.add(check['status'] == 'VALID', {'check': name})
+            for host, result in check.get('hosts', {}).items():
+                if 'days_remaining' in result:
+                    expiry.add(result['days_remaining'], {'host': host})
+
+        overall = MetricFamily('emrnext_health_overall', 'gauge', 'Overall health state (1 for the current state)')
+        for state in ('EXCELLENT', 'GOOD', 'NEEDS_ATTENTION', 'CRITICAL', 'UNKNOWN'):
+            overall.add(report['overall_health'] == state, {'state': state})
+
+        last_run = MetricFamily('emrnext_health_check_last_run_timestamp_seconds', 'gauge',
+                                'Unix time a check group last completed')
+        duration = MetricFamily('emrnext_health_check_run_duration_seconds', 'gauge',
+                                'Wall time of the last run of a check group')
+        runs = MetricFamily('emrnext_health_check_runs_total', 'counter', 'Completed runs per check group')
+        for group, timestamp in sorted(self.last_run.items()):
+            last_run.add(timestamp, {'group': group})
+            duration.add(self.last_duration[group], {'group': group})
+            runs.add(self.runs[group], {'group': group})
+
+        # The checker's spans and counters add up over every group run
+        return [resources, p95, services, codes, network, security, expiry, overall, self.latency.family(), last_run,
+                duration, runs, *self.checker.telemetry.families(cumulative=True)]
+
+    def _loop(self, group):
+        interval = self.interval(group)
+        while not self._stop.wait(interval):
+            try:
+                self.run_group(group)
+            except Exception:
+                # A failing group must not stop the others or the exporter
+                logger.exception("Health check group %s failed", group)
+
+    def start(self):
+        # Resources first: overall health needs them
+        self.checker.sampler.start()
+        self.run_group('resources')
+        self.server.start()
+        for group in self.checker.registry.groups():
+            if group != 'resources':
+                threading.Thread(target=self.run_group, args=(group,), daemon=True).start()
+            thread = threading.Thread(target=self._loop, args=(group,), name=f'health-{group}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.server.stop()
+        self.checker.sampler.stop()
+        self.checker.probe_engine.close()
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._stop.wait(3600):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
@@ -0,0 +1,223 @@
+"""Concurrent HTTP probing over a pooled set of keep-alive connections.
+
+Every probe records how long each phase took (DNS, connect, TLS, time to
+first byte) so slow checks can be attributed to the network layer that
+caused them.  Redirects are followed (up to ``MAX_REDIRECTS`` hops), so a
+probe reports the status of the page a browser would end up on.  All
+probes of a run share one deadline.
+"""
+import http.client
+import queue
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+USER_AGENT = 'emrnext-health-probe'
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class ProbeResult:
+    def __init__(self, status_code=None, error=None, timings=None, reused=False, location=None):
+        self.status_code = status_code
+        self.error = error
+        self.timings = timings or {}
+        self.reused = reused
+        # Target of a redirect response, and how many redirects led here
+        self.location = location
+        self.redirects = 0
+
+    def latency(self):
+        latency = {phase: _ms(value) for phase, value in self.timings.items()}
+        latency['reused_connection'] = self.reused
+        if self.redirects:
+            latency['redirects'] = self.redirects
+        return latency
+
+
+class ConnectionPool:
+    """Idle keep-alive connections keyed by (scheme, host, port)."""
+
+    def __init__(self, max_idle_per_host=4, ssl_context=None):
+        self.max_idle_per_host = max_idle_per_host
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        return None
+
+    def release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def open(self, scheme, host, port, timeout, timings):
+        # Resolve, connect and handshake by hand so each phase can be timed
+        started = time.perf_counter()
+        addrinfo = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        timings['dns'] = time.perf_counter() - started
+
+        # Try every address in turn, as socket.create_connection does, so a
+        # host whose first (e.g. IPv6) address is unreachable still connects
+        started = time.perf_counter()
+        error = None
+        for family, socktype, proto, _, sockaddr in addrinfo:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(sockaddr)
+                break
+            except OSError as e:
+                sock.close()
+                error = e
+        else:
+            raise error or OSError(f"getaddrinfo returned no addresses for {host}")
+        timings['connect'] = time.perf_counter() - started
+
+        if scheme == 'https':
+            started = time.perf_counter()
+            try:
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=host)
+            except (OSError, ssl.SSLError):
+                sock.close()
+                raise
+            timings['tls'] = time.perf_counter() - started
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.sock = sock
+        return conn
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+
+class ProbeEngine:
+    """Runs HTTP probes and arbitrary check callables on a bounded thread pool."""
+
+    def __init__(self, max_workers=8, pool=None):
+        self.max_workers = max_workers
+        self.pool = pool or ConnectionPool()
+
+    def http_probe(self, url, timeout=10, method='GET'):
+        started = time.perf_counter()
+        result = self._probe(url, timeout, method)
+        redirects = 0
+        while result.status_code in REDIRECT_STATUSES and result.location and redirects < MAX_REDIRECTS:
+            redirects += 1
+            url = urljoin(url, result.location)
+            result = self._probe(url, timeout, 'GET' if result.status_code == 303 else method)
+        result.redirects = redirects
+        if redirects:
+            # Phases are the final request's; the total covers the whole chain
+            result.timings['total'] = time.perf_counter() - started
+        return result
+
+    def _probe(self, url, timeout, method):
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        key = (scheme, parts.hostname, port)
+
+        conn = self.pool.acquire(key)
+        if conn is not None:
+            result = self._request(conn, key, method, path, timeout, {}, reused=True)
+            # A pooled connection may have been closed by the server meanwhile
+            if result.error is None:
+                return result
+
+        timings = {}
+        started = time.perf_counter()
+        try:
+            conn = self.pool.open(scheme, parts.hostname, port, timeout, timings)
+        except (OSError, ssl.SSLError) as e:
+            timings['total'] = time.perf_counter() - started
+            return ProbeResult(error=f"{type(e).__name__}: {e}", timings=timings)
+        result = self._request(conn, key, method, path, timeout, timings, reused=False)
+        result.timings['total'] = time.perf_counter() - started
+        return result
+
+    def _request(self, conn, key, method, path, timeout, timings, reused):
+        started = time.perf_counter()
+        try:
+            conn.sock.settimeout(timeout)
+            conn.request(method, path, headers={'Connection': 'keep-alive', 'User-Agent': USER_AGENT})
+            response = conn.getresponse()
+            timings['ttfb'] = time.perf_counter() - started
+            response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            timings.setdefault('total', time.perf_counter() - started)
+            return ProbeResult(error=f"{type(e).__name__}: {e}", timings=timings, reused=reused)
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.release(key, conn)
+        timings.setdefault('total', time.perf_counter() - started)
+        return ProbeResult(status_code=response.status, timings=timings, reused=reused,
+                           location=response.getheader('Location'))
+
+    def run(self, tasks, deadline):
+        """Run ``{name: callable}`` concurrently; unfinished tasks map to ``TimeoutError``.
+
+        Workers are daemon threads: a probe still hanging at the deadline is
+        abandoned and cannot hold up interpreter exit, as ThreadPoolExecutor
+        workers (joined at exit) would.
+        """
+        pending = queue.SimpleQueue()
+        for item in tasks.items():
+            pending.put(item)
+        results = {}
+        finished = threading.Condition()
+        expired = threading.Event()
+
+        def work():
+            # Tasks not started by the deadline are dropped
+            while not expired.is_set():
+                try:
+                    name, task = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = task()
+                except Exception as e:
+                    result = e
+                with finished:
+                    results[name] = result
+                    finished.notify()
+
+        for _ in range(min(self.max_workers, len(tasks))):
+            threading.Thread(target=work, name='probe-worker', daemon=True).start()
+        with finished:
+            finished.wait_for(lambda: len(results) == len(tasks), timeout=deadline)
+            expired.set()
+            return {
+                name: results[name] if name in results else
+                TimeoutError(f"probe exceeded run deadline of {deadline}s")
+                for name in tasks
+            }
+
+    def close(self):
+        self.pool.close()
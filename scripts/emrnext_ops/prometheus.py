@@ -0,0 +1,177 @@
+"""Batched, pooled client for the Prometheus HTTP API.
+
+All requests share one ``requests.Session`` whose connection pool is sized
+for the worker threads, so a batch of queries reuses keep-alive connections
+instead of opening one per metric.
+
+Batches are reduced before they are sent: plain selectors that differ only
+in the metric name (``foo``, ``bar{job="x"}``, ``baz{job="x"}``) are merged
+into a single ``{__name__=~"foo|bar|baz", ...}`` query per label set and the
+result is split back by ``__name__``.  The remaining expressions run
+concurrently.  Results are kept in a short TTL cache, so several reports
+asking for the same data within a few seconds send one query.
+"""
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CACHE_TTL = 15  # one scrape interval
+
+# ``metric_name`` or ``metric_name{label matchers}`` and nothing else
+SELECTOR_PATTERN = re.compile(r'^\s*([a-zA-Z_:][a-zA-Z0-9_:]*)\s*(?:\{([^{}]*)\})?\s*$')
+
+
+class PrometheusError(Exception):
+    pass
+
+
+def parse_selector(expr):
+    """``(metric name, label matchers)`` for a plain selector, else ``None``."""
+    match = SELECTOR_PATTERN.match(expr)
+    if not match:
+        return None
+    matchers = (match.group(2) or '').strip().rstrip(',').strip()
+    if '__name__' in matchers:
+        return None
+    return match.group(1), matchers
+
+
+def merge_selectors(exprs):
+    """Split ``exprs`` into merged selector queries and expressions sent as they are.
+
+    Returns ``(merged, single)``: ``merged`` maps each merged query to
+    ``{metric name: original expression}``.
+    """
+    groups = {}
+    single = []
+    for expr in exprs:
+        selector = parse_selector(expr)
+        if selector is None:
+            single.append(expr)
+        else:
+            name, matchers = selector
+            groups.setdefault(matchers, {}).setdefault(name, expr)
+
+    merged = {}
+    for matchers, names in groups.items():
+        if len(names) == 1:
+            single.extend(names.values())
+            continue
+        pattern = '|'.join(re.escape(name) for name in sorted(names))
+        query = f'{{__name__=~"{pattern}"' + (f',{matchers}' if matchers else '') + '}'
+        merged[query] = names
+    return merged, single
+
+
+def sample_value(sample):
+    """Float value of an instant vector sample, ``None`` for NaN."""
+    value = float(sample['value'][1])
+    return None if math.isnan(value) else value
+
+
+class PrometheusClient:
+    def __init__(self, base_url='http://localhost:9090', timeout=10, max_workers=8,
+                 cache_ttl=DEFAULT_CACHE_TTL, session=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache_ttl = cache_ttl
+        # requests is imported by the first client, not by every script importing this module
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = session or requests.Session()
+        if session is None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, params=None):
+        """Raw GET against the server, e.g. ``/-/healthy`` or ``/api/v1/rules``."""
+        return self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+
+    def api(self, path, params=None):
+        """``data`` of a successful API response; raises :class:`PrometheusError` otherwise."""
+        import requests
+        try:
+            response = self.get(path, params)
+            payload = response.json()
+        except requests.RequestException as e:
+            raise PrometheusError(f"{path}: {e}") from e
+        except ValueError:
+            raise PrometheusError(f"{path}: HTTP {response.status_code} with a non-JSON body")
+        if response.status_code != 200 or payload.get('status') != 'success':
+            raise PrometheusError(f"{path}: {payload.get('errorType', response.status_code)}: {payload.get('error', '')}")
+        return payload['data']
+
+    def _cached(self, key, fetch):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and now - entry[0] < self.cache_ttl:
+            return entry[1]
+        result = fetch()
+        with self._lock:
+            self._cache[key] = (time.monotonic(), result)
+        return result
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def query(self, expr, at=None):
+        """Result list of an instant query (``at`` defaults to the server's now)."""
+        params = {'query': expr}
+        if at is not None:
+            params['time'] = at
+        return self._cached(('query', expr, at), lambda: self.api('/api/v1/query', params)['result'])
+
+    def query_range(self, expr, start, end, step):
+        """Result list (series with ``values``) of a range query."""
+        params = {'query': expr, 'start': start, 'end': end, 'step': step}
+        return self._cached(
+            ('query_range', expr, start, end, step), lambda: self.api('/api/v1/query_range', params)['result']
+        )
+
+    def query_many(self, exprs, at=None):
+        """``{expr: result list}`` for a batch of instant queries."""
+        return self._batch(exprs, lambda expr: self.query(expr, at))
+
+    def query_range_many(self, exprs, start, end, step):
+        """``{expr: result list}`` for a batch of range queries over the same window."""
+        return self._batch(exprs, lambda expr: self.query_range(expr, start, end, step))
+
+    def scalar(self, expr, at=None):
+        """Value of the first sample of an instant query, ``None`` if there is none."""
+        result = self.query(expr, at)
+        return sample_value(result[0]) if result else None
+
+    def _batch(self, exprs, run):
+        exprs = list(dict.fromkeys(exprs))
+        merged, single = merge_selectors(exprs)
+        queries = list(merged) + single
+        results = {}
+        if len(queries) == 1:
+            outcomes = [(queries[0], run(queries[0]))]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(queries))) as executor:
+                outcomes = list(zip(queries, executor.map(run, queries)))
+
+        for query, result in outcomes:
+            if query not in merged:
+                results[query] = result
+                continue
+            names = merged[query]
+            for expr in names.values():
+                results[expr] = []
+            for series in result:
+                expr = names.get(series['metric'].get('__name__'))
+                if expr is not None:
+                    results[expr].append(series)
+        return {expr: results[expr] for expr in exprs}
+
+    def close(self):
+        self.session.close()
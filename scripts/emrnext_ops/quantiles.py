@@ -0,0 +1,151 @@
+"""Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+Values are counted in logarithmic buckets: bucket ``k`` covers
+``(gamma**(k-1), gamma**k]`` with ``gamma = (1 + a) / (1 - a)``, so every
+quantile is answered within relative accuracy ``a`` of the exact value.
+Merging two sketches adds their bucket counts, which makes the result
+independent of how the data was partitioned.  At most ``max_bins`` buckets
+are kept; beyond that the lowest buckets are folded together, giving up
+accuracy only at the bottom of the distribution.
+"""
+import math
+from collections import Counter
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 2048
+# Batches at least this long are bucketed with numpy when it is installed
+NUMPY_BATCH = 4096
+
+
+class DDSketch:
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, max_bins=DEFAULT_MAX_BINS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        # Values <= 0 (e.g. stages finishing within the same second)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key):
+        # Midpoint of the bucket in relative terms
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        if value is None:
+            return
+        if value > 0:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + count
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        else:
+            self.zero_count += count
+        self.count += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def add_many(self, values):
+        """Add a list of numbers; much cheaper than one :meth:`add` per value."""
+        if not values:
+            return
+        positive = [value for value in values if value > 0]
+        for key, count in self._key_counts(positive):
+            self.bins[key] = self.bins.get(key, 0) + count
+        while len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += len(values) - len(positive)
+        self.count += len(values)
+        self.sum += math.fsum(values)
+        low, high = min(values), max(values)
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def _key_counts(self, values):
+        # numpy, when installed, computes the keys of a large batch several times faster
+        if len(values) >= NUMPY_BATCH:
+            try:
+                import numpy as np
+            except ImportError:
+                pass
+            else:
+                keys = np.ceil(np.log(np.array(values, dtype=float)) / self._log_gamma).astype(np.int64)
+                keys, counts = np.unique(keys, return_counts=True)
+                return zip(keys.tolist(), counts.tolist())
+        return Counter(map(self._key, values)).items()
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        excess = keys[:len(keys) - self.max_bins + 1]
+        target = keys[len(excess)]
+        self.bins[target] += sum(self.bins.pop(key) for key in excess)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        while len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        for bound in (other.min, other.max):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+        return self
+
+    def quantile(self, q):
+        """Approximate ``q``-quantile (0 <= q <= 1), ``None`` when empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return min(max(0.0, self.min), self.max)
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs):
+        return [self.quantile(q) for q in qs]
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'bins': sorted(self.bins.items())
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'], data['max_bins'])
+        sketch.bins = {key: count for key, count in data['bins']}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        return sketch
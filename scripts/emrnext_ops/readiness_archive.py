@@ -0,0 +1,298 @@
+"""Readiness analysis of every deployment kept in an archive directory.
+
+An archive holds one ``deployment.log`` (optionally gzip-rotated) and
+``deployment_metrics.json`` pair per deployment, either one directory per
+deployment or flat files named by the deployment id:
+
+    archive/2024-03-01_1200/deployment.log.gz
+    archive/2024-03-01_1200/deployment_metrics.json
+    archive/deployment_2024-03-02_0900.log
+    archive/deployment_metrics_2024-03-02_0900.json
+
+Each file is read once, in a worker process: the same mapping is hashed
+and scanned.  Results are cached by content hash (SHA-256), and a file
+whose size and modification time are unchanged since the last run is not
+read at all.  Deployments are ordered by when they ran: the first stage
+start in their metrics, else the modification time of their files, with
+the id breaking ties (``deploy-10`` sorts after ``deploy-9`` only this
+way).  :func:`summarize` folds the per-deployment results, in that order,
+into cross-deployment figures: version drift per component, failure rate
+per stage and deployment times.
+"""
+import hashlib
+import json
+import os
+import re
+
+from emrnext_ops.deploy_log import VERSION_PATTERN_BYTES
+from emrnext_ops.json_stream import read_selected
+from emrnext_ops.log_access import is_compressed, iter_matches, mapped
+from emrnext_ops.timestamps import parse_iso
+
+LOG_NAMES = ('deployment.log', 'deployment.log.gz')
+METRICS_NAME = 'deployment_metrics.json'
+FLAT_LOG_PATTERN = re.compile(r'^deployment_(?!metrics_)(?P<id>.+?)\.log(?:\.gz)?$')
+FLAT_METRICS_PATTERN = re.compile(r'^deployment_metrics_(?P<id>.+)\.json$')
+
+# Stages failing in more deployments than this get a recommendation
+STAGE_FAILURE_RATE_THRESHOLD = 0.2
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def summarize_metrics(metrics):
+    """Total time and success/failure counts of one ``deployment_metrics.json``, in one pass over the stages."""
+    stages = metrics['stages']
+    first_start = last_end = None
+    successful = 0
+    statuses = {}
+    for name, stage in stages.items():
+        if first_start is None or stage['start'] < first_start:
+            first_start = stage['start']
+        if last_end is None or stage['end'] > last_end:
+            last_end = stage['end']
+        ok = stage.get('status') == 'Success'
+        successful += ok
+        statuses[name] = ok
+    return {
+        "started": first_start,
+        "total_deployment_time": (parse_iso(last_end) - parse_iso(first_start)).total_seconds(),
+        "successful_stages": successful,
+        "failed_stages": len(stages) - successful,
+        "stages": statuses
+    }
+
+
+def first_versions(matches):
+    """``{component: version}`` from the first announcement of each component in ``matches``."""
+    versions = {}
+    for component, version in matches:
+        component = component.decode('ascii').lower()
+        if component not in versions:
+            versions[component] = version.decode('ascii')
+            if len(versions) == 3:
+                break
+    return versions
+
+
+def _hash_stream(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def analyze_file(kind, path):
+    """Worker: ``(sha256, result)`` for a deployment log or metrics file."""
+    if kind == 'log' and is_compressed(path):
+        # The compressed bytes are hashed; the versions come from the stream
+        digest = _hash_stream(path)
+        matches = iter_matches(path, VERSION_PATTERN_BYTES)
+        try:
+            return digest, {"versions": first_versions(matches)}
+        finally:
+            matches.close()
+
+    with mapped(path) as buffer:
+        digest = hashlib.sha256(buffer).hexdigest()
+        if kind == 'log':
+            matches = VERSION_PATTERN_BYTES.finditer(buffer)
+            versions = first_versions(match.groups() for match in matches)
+            # The scanner pins the mapping open
+            del matches
+            return digest, {"versions": versions}
+        try:
+            return digest, summarize_metrics(read_selected(buffer, ('stages.*',)))
+        except (ValueError, KeyError, TypeError) as e:
+            return digest, {"error": f"{type(e).__name__}: {e}"}
+
+
+def find_deployments(archive_dir):
+    """``{deployment id: {'log': path, 'metrics': path}}`` (either may be missing), by id."""
+    deployments = {}
+    for name in sorted(os.listdir(archive_dir)):
+        path = os.path.join(archive_dir, name)
+        if os.path.isdir(path):
+            files = {}
+            for log_name in LOG_NAMES:
+                if os.path.isfile(os.path.join(path, log_name)):
+                    files['log'] = os.path.join(path, log_name)
+                    break
+            if os.path.isfile(os.path.join(path, METRICS_NAME)):
+                files['metrics'] = os.path.join(path, METRICS_NAME)
+            if files:
+                deployments[name] = files
+            continue
+        for kind, pattern in (('metrics', FLAT_METRICS_PATTERN), ('log', FLAT_LOG_PATTERN)):
+            match = pattern.match(name)
+            if match:
+                deployments.setdefault(match['id'], {}).setdefault(kind, path)
+                break
+    return dict(sorted(deployments.items()))
+
+
+class AnalysisCache:
+    """Per-file results keyed by content hash, plus the last seen size/mtime/hash of each path."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.files = {}
+        self.results = {}
+        if path:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                self.files, self.results = data['files'], data['results']
+            except (FileNotFoundError, ValueError, KeyError):
+                pass
+
+    def lookup(self, path):
+        """Cached result of ``path`` when its size and mtime are unchanged, else ``None``."""
+        stat = os.stat(path)
+        seen = self.files.get(path)
+        if seen and seen['size'] == stat.st_size and seen['mtime_ns'] == stat.st_mtime_ns:
+            return self.results.get(seen['sha256'])
+        return None
+
+    def store(self, path, digest, result):
+        stat = os.stat(path)
+        self.files[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        self.results[digest] = result
+
+    def prune(self, paths):
+        # Forget files that left the archive and results no file refers to
+        self.files = {path: seen for path, seen in self.files.items() if path in paths}
+        referenced = {seen['sha256'] for seen in self.files.values()}
+        self.results = {digest: result for digest, result in self.results.items() if digest in referenced}
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"files": self.files, "results": self.results}, f)
+        os.replace(tmp_path, self.path)
+
+
+def analyze_archive(archive_dir, cache=None, max_workers=None, telemetry=None):
+    """``{deployment id: {'versions': ..., 'metrics': ...}}`` for every deployment in ``archive_dir``, oldest first."""
+    cache = cache or AnalysisCache()
+    deployments = find_deployments(archive_dir)
+    files = [(kind, path) for entry in deployments.values() for kind, path in sorted(entry.items())]
+
+    results = {}
+    pending = []
+    for kind, path in files:
+        cached = cache.lookup(path)
+        if cached is None:
+            pending.append((kind, path))
+        else:
+            results[path] = cached
+    if telemetry is not None:
+        telemetry.count('files_cached', len(results))
+        telemetry.count('files_read', len(pending))
+        telemetry.count('bytes_read', sum(os.path.getsize(path) for _, path in pending))
+
+    if max_workers == 1 or len(pending) <= 1:
+        outcomes = [analyze_file(kind, path) for kind, path in pending]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(
+                analyze_file, [kind for kind, _ in pending], [path for _, path in pending],
+                chunksize=max(1, len(pending) // 64)
+            ))
+    for (kind, path), (digest, result) in zip(pending, outcomes):
+        cache.store(path, digest, result)
+        results[path] = result
+
+    cache.prune({path for _, path in files})
+    cache.save()
+    analyses = {
+        deployment_id: {
+            "versions": results[entry['log']]['versions'] if 'log' in entry else {},
+            "metrics": results[entry['metrics']] if 'metrics' in entry else None
+        }
+        for deployment_id, entry in deployments.items()
+    }
+    # In the order the deployments ran, which the ids need not sort in
+    return dict(sorted(analyses.items(), key=lambda item: (_deployed_at(deployments[item[0]], item[1]), item[0])))
+
+
+def _deployed_at(entry, analysis):
+    # Unix time of the first stage start, else of the newest file's modification
+    started = (analysis['metrics'] or {}).get('started')
+    if started:
+        try:
+            return parse_iso(started).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return max(os.path.getmtime(path) for path in entry.values())
+
+
+def _version_key(version):
+    return tuple(int(part) for part in version.split('.') if part.isdigit())
+
+
+def summarize(analyses):
+    """Cross-deployment readiness summary of :func:`analyze_archive` output (oldest deployment first)."""
+    drift = {}
+    stages = {}
+    times = []
+    clean = 0
+    for deployment_id, analysis in analyses.items():
+        for component, version in analysis['versions'].items():
+            entry = drift.setdefault(component, {"versions": {}, "changes": 0, "previous": None})
+            entry["versions"][version] = entry["versions"].get(version, 0) + 1
+            if entry["previous"] is not None and version != entry["previous"]:
+                entry["changes"] += 1
+            entry["previous"] = version
+
+        metrics = analysis['metrics']
+        if not metrics or 'error' in metrics:
+            continue
+        times.append(metrics['total_deployment_time'])
+        clean += metrics['failed_stages'] == 0
+        for stage, ok in metrics['stages'].items():
+            entry = stages.setdefault(stage, {"runs": 0, "failures": 0})
+            entry["runs"] += 1
+            entry["failures"] += not ok
+
+    version_drift = {}
+    for component, entry in sorted(drift.items()):
+        latest = max(entry["versions"], key=_version_key)
+        version_drift[component] = {
+            "latest": latest,
+            "current": entry["previous"],
+            "distinct_versions": len(entry["versions"]),
+            "version_changes": entry["changes"],
+            "deployments_behind_latest": sum(count for version, count in entry["versions"].items()
+                                             if version != latest),
+            "versions": dict(sorted(entry["versions"].items(), key=lambda item: _version_key(item[0])))
+        }
+
+    failure_rates = {
+        stage: {**entry, "failure_rate": round(entry["failures"] / entry["runs"], 3)}
+        for stage, entry in sorted(stages.items(), key=lambda item: (-item[1]["failures"] / item[1]["runs"], item[0]))
+    }
+    recommendations = [
+        f"Stabilize stage '{stage}': it failed in {entry['failure_rate']:.0%} of {entry['runs']} deployments"
+        for stage, entry in failure_rates.items() if entry['failure_rate'] > STAGE_FAILURE_RATE_THRESHOLD
+    ]
+    recommendations += [
+        f"{component.capitalize()} was last deployed at {entry['current']}, behind {entry['latest']}"
+        for component, entry in version_drift.items() if entry['current'] != entry['latest']
+    ]
+    return {
+        "deployments": len(analyses),
+        "analyzed_metrics": len(times),
+        "successful_deployments": clean,
+        "success_rate": round(clean / len(times), 3) if times else None,
+        "deployment_time": {
+            "mean": round(sum(times) / len(times), 3), "max": max(times)
+        } if times else None,
+        "version_drift": version_drift,
+        "stage_failure_rates": failure_rates,
+        "recommendations": recommendations
+    }
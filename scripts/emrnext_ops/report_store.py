@@ -0,0 +1,325 @@
+"""Append-only, segmented store for generated reports.
+
+Reports of one kind (``health``, ``improvement``, ``readiness``) live in
+``<root>/<kind>/`` as a few NDJSON segment files instead of one pretty-printed
+file per run.  Next to every segment, ``<segment>.idx`` holds one fixed-size
+``(timestamp, byte offset)`` entry per report, and ``manifest.json`` lists the
+segments with their time range, count and size.  Queries read the manifest,
+binary-search the index and seek straight to the reports they need; the
+directory is never listed.
+
+Appends go to the newest segment until it exceeds ``segment_max_bytes`` or
+``segment_max_age``; rolling to a new segment triggers :meth:`compact`,
+which drops segments older than ``retention_days``, drops the oldest
+segments beyond ``max_total_bytes`` and merges runs of small sealed
+segments (up to ``segment_max_bytes`` and ``merge_max_span`` seconds).
+Writers of the same kind are serialised with ``flock``; bytes a crashed
+writer left beyond what the manifest records are cut off before appending.
+
+Timestamps only move forward: :meth:`append` indexes a report older than
+the newest one under the newest timestamp.  :meth:`import_files` keeps the
+real timestamps of backfilled reports, which must all be older (or newer)
+than everything already stored; an import overlapping the stored range is
+refused.
+"""
+import fcntl
+import json
+import os
+import re
+import struct
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+INDEX_ENTRY = struct.Struct('<dQ')  # timestamp, offset of the report's line
+
+DEFAULT_SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_SEGMENT_MAX_AGE = 86400
+DEFAULT_RETENTION_DAYS = 90
+# Merged segments span at most this long, so retention stays fine-grained
+DEFAULT_MERGE_MAX_SPAN = 7 * 86400
+
+# system_health_20240101_120000.json and friends, as written before the store
+LEGACY_NAME_PATTERN = re.compile(r'_(\d{8}_\d{6})\.json$')
+
+
+def legacy_timestamp(path):
+    """Unix time encoded in the name of a pre-store timestamped report file."""
+    match = LEGACY_NAME_PATTERN.search(path)
+    if not match:
+        raise ValueError(f"No timestamp in report file name {path!r}")
+    return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').timestamp()
+
+
+class ReportStore:
+    def __init__(self, root, segment_max_bytes=DEFAULT_SEGMENT_MAX_BYTES, segment_max_age=DEFAULT_SEGMENT_MAX_AGE,
+                 retention_days=DEFAULT_RETENTION_DAYS, max_total_bytes=None, merge_max_span=DEFAULT_MERGE_MAX_SPAN):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self.merge_max_span = merge_max_span
+        self.retention = retention_days * 86400 if retention_days else None
+        self.max_total_bytes = max_total_bytes
+
+    # Layout
+
+    def _dir(self, kind):
+        return os.path.join(self.root, kind)
+
+    def _manifest_path(self, kind):
+        return os.path.join(self._dir(kind), 'manifest.json')
+
+    def _segment_path(self, kind, segment):
+        return os.path.join(self._dir(kind), segment['name'])
+
+    def _read_manifest(self, kind):
+        try:
+            with open(self._manifest_path(kind), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'segments': []}
+
+    def _write_manifest(self, kind, manifest):
+        path = self._manifest_path(kind)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _locked(self, kind):
+        os.makedirs(self._dir(kind), exist_ok=True)
+        with open(os.path.join(self._dir(kind), '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # Writing
+
+    def append(self, kind, report, timestamp=None):
+        """Store ``report`` (JSON serialisable) and return the timestamp it was indexed under."""
+        with self._locked(kind):
+            manifest = self._read_manifest(kind)
+            timestamp = self._append(kind, manifest, self._line(report), timestamp)
+            self._write_manifest(kind, manifest)
+        return timestamp
+
+    def _line(self, report):
+        return json.dumps(report, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+
+    def _append(self, kind, manifest, line, timestamp):
+        segments = manifest['segments']
+        # Queries bisect on time, so timestamps never go backwards
+        timestamp = max(time.time() if timestamp is None else timestamp,
+                        segments[-1]['last'] if segments else 0.0)
+
+        rolled = not segments or segments[-1]['bytes'] >= self.segment_max_bytes or (
+            timestamp - segments[-1]['first'] >= self.segment_max_age
+        )
+        if rolled:
+            segments.append(self._new_segment(segments, timestamp))
+        segment = segments[-1]
+        offset = segment['bytes']
+        self._append_files(self._segment_path(kind, segment), segment, line, INDEX_ENTRY.pack(timestamp, offset))
+        segment.update(last=timestamp, count=segment['count'] + 1, bytes=offset + len(line))
+
+        if rolled and len(segments) > 1:
+            self._compact(kind, manifest, timestamp)
+        return timestamp
+
+    def _new_segment(self, segments, timestamp):
+        name = f"segment-{int(timestamp * 1000):015d}"
+        taken = {segment['name'] for segment in segments}
+        if f"{name}.ndjson" in taken:
+            name = f"{name}-{len(segments)}"
+        return {'name': f"{name}.ndjson", 'first': timestamp, 'last': timestamp, 'count': 0, 'bytes': 0}
+
+    def _append_files(self, path, segment, data, entries):
+        with open(path, 'ab') as out:
+            if out.tell() != segment['bytes']:
+                out.truncate(segment['bytes'])
+            out.write(data)
+        with open(f"{path}.idx", 'ab') as out:
+            if out.tell() != segment['count'] * INDEX_ENTRY.size:
+                out.truncate(segment['count'] * INDEX_ENTRY.size)
+            out.write(entries)
+
+    def compact(self, kind, now=None):
+        with self._locked(kind):
+            manifest = self._read_manifest(kind)
+            self._compact(kind, manifest, time.time() if now is None else now)
+            self._write_manifest(kind, manifest)
+
+    def _compact(self, kind, manifest, now):
+        segments = manifest['segments']
+        sealed, active = segments[:-1], segments[-1:]
+
+        # Age, then size based retention; the active segment is always kept
+        expired = [segment for segment in sealed if self.retention and segment['last'] < now - self.retention]
+        sealed = [segment for segment in sealed if segment not in expired]
+        if self.max_total_bytes is not None:
+            total = sum(segment['bytes'] for segment in sealed + active)
+            while sealed and total > self.max_total_bytes:
+                total -= sealed[0]['bytes']
+                expired.append(sealed.pop(0))
+
+        # Merge runs of small sealed segments so their number stays low
+        merged = []
+        for segment in sealed:
+            previous = merged[-1] if merged else None
+            if (previous is not None and previous['bytes'] + segment['bytes'] <= self.segment_max_bytes
+                    and segment['last'] - previous['first'] <= self.merge_max_span):
+                self._merge_into(kind, previous, segment)
+                expired.append(segment)
+            else:
+                merged.append(segment)
+
+        manifest['segments'] = merged + active
+        # Rewrite the manifest before deleting files it used to reference
+        self._write_manifest(kind, manifest)
+        for segment in expired:
+            for path in (self._segment_path(kind, segment), self._segment_path(kind, segment) + '.idx'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _merge_into(self, kind, target, segment):
+        path = self._segment_path(kind, target)
+        with open(self._segment_path(kind, segment), 'rb') as source:
+            data = source.read(segment['bytes'])
+        with open(self._segment_path(kind, segment) + '.idx', 'rb') as source:
+            entries = [
+                INDEX_ENTRY.pack(timestamp, offset + target['bytes'])
+                for timestamp, offset in INDEX_ENTRY.iter_unpack(source.read(segment['count'] * INDEX_ENTRY.size))
+            ]
+        self._append_files(path, target, data, b''.join(entries))
+        target.update(last=segment['last'], count=target['count'] + segment['count'],
+                      bytes=target['bytes'] + segment['bytes'])
+
+    def import_files(self, kind, paths, timestamp_fn):
+        """Store existing one-report-per-file JSON reports under their own timestamps; returns how many.
+
+        Reports older than everything in the store are written to sealed
+        segments of their own in front of the existing ones, and reports
+        newer than the store's last are appended.  Segments never overlap
+        in time, so a report falling inside the stored range cannot be
+        placed: such an import raises ``ValueError`` and writes nothing.
+        """
+        dated = sorted((timestamp_fn(path), path) for path in paths)
+        with self._locked(kind):
+            manifest = self._read_manifest(kind)
+            segments = manifest['segments']
+            first = segments[0]['first'] if segments else float('inf')
+            last = segments[-1]['last'] if segments else float('inf')
+            inside = [path for timestamp, path in dated if first < timestamp < last]
+            if inside:
+                raise ValueError(
+                    f"{len(inside)} {kind} report(s), e.g. {inside[0]!r}, fall within the stored range; "
+                    f"only reports older or newer than everything in the store can be imported"
+                )
+
+            backfill = []
+            for timestamp, path in dated:
+                line = self._read_report_line(path)
+                if timestamp > first:
+                    self._append(kind, manifest, line, timestamp)
+                    continue
+                segment = backfill[-1] if backfill else None
+                if segment is None or segment['bytes'] >= self.segment_max_bytes or (
+                        timestamp - segment['first'] >= self.segment_max_age):
+                    segment = self._new_segment(backfill + segments, timestamp)
+                    backfill.append(segment)
+                offset = segment['bytes']
+                self._append_files(self._segment_path(kind, segment), segment, line,
+                                   INDEX_ENTRY.pack(timestamp, offset))
+                segment.update(last=timestamp, count=segment['count'] + 1, bytes=offset + len(line))
+
+            manifest['segments'] = backfill + manifest['segments']
+            if len(manifest['segments']) > 1:
+                # Retention counts back from the newest report, as on append
+                self._compact(kind, manifest, manifest['segments'][-1]['last'])
+            self._write_manifest(kind, manifest)
+        return len(dated)
+
+    def _read_report_line(self, path):
+        with open(path, 'r') as f:
+            return self._line(json.load(f))
+
+    # Queries
+
+    def _entry(self, index, position):
+        index.seek(position * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+
+    def _bisect(self, index, count, timestamp):
+        # First position whose timestamp is >= ``timestamp``
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(index, middle)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _read_segment(self, kind, segment, first, last):
+        # (timestamp, report) for index positions first..last-1 of a segment
+        if first >= last:
+            return []
+        path = self._segment_path(kind, segment)
+        with open(f"{path}.idx", 'rb') as index:
+            index.seek(first * INDEX_ENTRY.size)
+            entries = list(INDEX_ENTRY.iter_unpack(index.read((last - first) * INDEX_ENTRY.size)))
+        end = segment['bytes'] if last == segment['count'] else None
+        with open(path, 'rb') as data:
+            if end is None:
+                with open(f"{path}.idx", 'rb') as index:
+                    end = self._entry(index, last)[1]
+            data.seek(entries[0][1])
+            lines = data.read(end - entries[0][1]).splitlines()
+        return [(timestamp, json.loads(line)) for (timestamp, _), line in zip(entries, lines)]
+
+    def last(self, kind, n):
+        """The ``n`` newest reports, newest first, as ``(timestamp, report)``."""
+        results = []
+        for segment in reversed(self._read_manifest(kind)['segments']):
+            wanted = n - len(results)
+            if wanted <= 0:
+                break
+            first = max(0, segment['count'] - wanted)
+            results.extend(reversed(self._read_segment(kind, segment, first, segment['count'])))
+        return results
+
+    def between(self, kind, start, end=None):
+        """Reports with ``start <= timestamp < end``, oldest first, as ``(timestamp, report)``."""
+        end = float('inf') if end is None else end
+        results = []
+        for segment in self._read_manifest(kind)['segments']:
+            if segment['last'] < start or segment['first'] >= end:
+                continue
+            with open(self._segment_path(kind, segment) + '.idx', 'rb') as index:
+                first = self._bisect(index, segment['count'], start)
+                last = self._bisect(index, segment['count'], end)
+            results.extend(self._read_segment(kind, segment, first, last))
+        return results
+
+    def series(self, kind, field, days=7, now=None):
+        """``[(timestamp, report[field])]`` over the last ``days``, e.g. a health score trend."""
+        now = time.time() if now is None else now
+        return [
+            (timestamp, report.get(field))
+            for timestamp, report in self.between(kind, now - days * 86400, now + 1)
+        ]
+
+    def stats(self, kind):
+        segments = self._read_manifest(kind)['segments']
+        return {
+            "segments": len(segments),
+            "reports": sum(segment['count'] for segment in segments),
+            "bytes": sum(segment['bytes'] for segment in segments),
+            "first": segments[0]['first'] if segments else None,
+            "last": segments[-1]['last'] if segments else None
+        }
@@ -0,0 +1,217 @@
+"""Background sampling of host resources into a fixed-size ring buffer.
+
+``psutil.cpu_percent(interval=None)`` reports usage since its previous call,
+so the first call of a process is meaningless and a single call measures an
+arbitrary span.  The collector primes it once and never reads it again
+before ``min_span`` seconds have passed, sleeping out the rest when sampled
+too early.  The sampler samples CPU (overall and per core), memory, disk
+usage and disk I/O rates at a fixed cadence on a daemon thread.  Health
+decisions read min/avg/p95 over a window from the buffer, so only the
+first decision of a process waits, for one sampling interval.
+"""
+import math
+import threading
+import time
+from array import array
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_CAPACITY = 900  # 15 minutes at one sample per second
+
+
+class PsutilCollector:
+    """Reads one sample of host metrics; disk I/O is reported as bytes/second.
+
+    CPU usage is measured over at least ``min_span`` seconds: a sample taken
+    sooner after the previous one (or after priming) waits out the rest.
+    """
+
+    def __init__(self, disk_path='/', min_span=DEFAULT_INTERVAL):
+        import psutil
+        self.psutil = psutil
+        self.disk_path = disk_path
+        self.min_span = min_span
+        self.cores = psutil.cpu_count() or 1
+        # Prime the CPU counters so the next call measures a real interval
+        psutil.cpu_percent(interval=None, percpu=True)
+        self._last_cpu = time.monotonic()
+        self._last_io = self._io_counters()
+
+    def _io_counters(self):
+        counters = self.psutil.disk_io_counters()
+        if counters is None:
+            return None
+        return time.monotonic(), counters.read_bytes, counters.write_bytes
+
+    def fields(self):
+        return ['cpu', 'memory', 'disk', 'disk_read_bytes_per_s', 'disk_write_bytes_per_s'] + [
+            f'cpu_core_{core}' for core in range(self.cores)
+        ]
+
+    def __call__(self):
+        # A reading microseconds after the previous one is 0 or 100 at random
+        remaining = self._last_cpu + self.min_span - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        per_core = self.psutil.cpu_percent(interval=None, percpu=True)
+        self._last_cpu = time.monotonic()
+        sample = {
+            'cpu': sum(per_core) / len(per_core) if per_core else 0.0,
+            'memory': self.psutil.virtual_memory().percent,
+            'disk': self.psutil.disk_usage(self.disk_path).percent,
+            'disk_read_bytes_per_s': 0.0,
+            'disk_write_bytes_per_s': 0.0
+        }
+        for core, value in enumerate(per_core[:self.cores]):
+            sample[f'cpu_core_{core}'] = value
+
+        io = self._io_counters()
+        if io and self._last_io:
+            elapsed = io[0] - self._last_io[0]
+            if elapsed > 0:
+                sample['disk_read_bytes_per_s'] = (io[1] - self._last_io[1]) / elapsed
+                sample['disk_write_bytes_per_s'] = (io[2] - self._last_io[2]) / elapsed
+        self._last_io = io
+        return sample
+
+
+class RingBuffer:
+    """Column-per-field float arrays of fixed capacity plus sample timestamps."""
+
+    def __init__(self, fields, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.columns = {field: array('d', bytes(8 * capacity)) for field in fields}
+        self.size = 0
+        self.next = 0
+
+    def append(self, timestamp, sample):
+        slot = self.next
+        self.times[slot] = timestamp
+        for field, column in self.columns.items():
+            column[slot] = sample.get(field, 0.0)
+        self.next = (slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def window(self, since):
+        """Slots of samples taken at or after ``since``, oldest first."""
+        slots = []
+        for offset in range(1, self.size + 1):
+            slot = (self.next - offset) % self.capacity
+            if self.times[slot] < since:
+                break
+            slots.append(slot)
+        slots.reverse()
+        return slots
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class ResourceSampler:
+    def __init__(self, interval=DEFAULT_INTERVAL, capacity=DEFAULT_CAPACITY, collector=None):
+        self.interval = interval
+        self.capacity = capacity
+        self._collector = collector
+        self.buffer = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._busy_seconds = 0.0
+        self._started_at = None
+        self._sampled = threading.Event()
+
+    @property
+    def collector(self):
+        if self._collector is None:
+            self._collector = PsutilCollector(min_span=self.interval)
+        return self._collector
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _ensure_buffer(self):
+        if self.buffer is None:
+            fields = self.collector.fields() if hasattr(self.collector, 'fields') else None
+            self.buffer = RingBuffer(fields or [], self.capacity)
+
+    def sample_once(self):
+        """Take one sample now and store it; returns the sample."""
+        started = time.thread_time()
+        self._ensure_buffer()
+        sample = self.collector()
+        with self._lock:
+            if not self.buffer.columns:
+                self.buffer = RingBuffer(list(sample), self.capacity)
+            self.buffer.append(time.time(), sample)
+        self._busy_seconds += time.thread_time() - started
+        self._sampled.set()
+        return sample
+
+    def wait_for_sample(self, timeout=None):
+        """Block until at least one sample is buffered (sampling now if not running).
+
+        A running sampler's first tick comes one interval after :meth:`start`,
+        so its CPU reading covers a real interval; returns False on timeout.
+        """
+        if self.buffer is not None and self.buffer.size:
+            return True
+        if not self.running:
+            self.sample_once()
+            return True
+        return self._sampled.wait(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample_once()
+
+    def start(self):
+        if self.running:
+            return self
+        self._ensure_buffer()
+        self._stop.clear()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self, window_seconds, fields=None):
+        """``{field: {min, avg, p95, samples}}`` over the last ``window_seconds``."""
+        if self.buffer is None:
+            return {}
+        with self._lock:
+            slots = self.buffer.window(time.time() - window_seconds)
+            columns = {
+                field: [column[slot] for slot in slots]
+                for field, column in self.buffer.columns.items()
+                if fields is None or field in fields
+            }
+        if not slots:
+            return {}
+
+        stats = {}
+        for field, values in columns.items():
+            ordered = sorted(values)
+            stats[field] = {
+                'min': ordered[0],
+                'avg': sum(ordered) / len(ordered),
+                'p95': percentile(ordered, 0.95),
+                'samples': len(ordered)
+            }
+        return stats
+
+    def overhead_percent(self):
+        """CPU time spent sampling as a share of the time the sampler has been running."""
+        if self._started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started_at
+        return 100 * self._busy_seconds / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,152 @@
+"""Persistent per-stage duration history across deployments.
+
+Every stage keeps a :class:`~emrnext_ops.quantiles.DDSketch` of all its
+historical durations, the ``(start, end)`` of its ``RECENT_RUNS`` newest
+runs and a watermark, the newest start of the runs that fell out of that
+window; memory and file size per stage stay constant however many
+deployments are recorded.  A run is counted once: re-analysing the same
+(or a growing) log is idempotent, and logs may arrive in any order as long
+as their runs are newer than the watermark.  Backfill archives older than
+that into a fresh history file with :meth:`StageHistory.ingest_logs`.
+"""
+import bisect
+import json
+import os
+
+from emrnext_ops.deploy_log import STAGE_PATTERN_BYTES
+from emrnext_ops.log_access import iter_matches
+from emrnext_ops.quantiles import DEFAULT_RELATIVE_ACCURACY, DDSketch
+from emrnext_ops.timestamps import duration_seconds, durations
+
+REPORT_QUANTILES = {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+
+# A stage regressed when its latest run is slower than the historical p95
+# and the history holds at least this many runs
+MIN_HISTORY_RUNS = 10
+
+# Runs per stage told apart by (start, end); older ones only by the watermark
+RECENT_RUNS = 256
+
+
+def stage_duration(start, end):
+    """Seconds between two ``YYYY-MM-DD HH:MM:SS`` timestamps, ``None`` if unparseable."""
+    try:
+        return duration_seconds(start, end)
+    except ValueError:
+        return None
+
+
+def _stage_runs(path):
+    # Worker: (stage, start, end, duration) of every run in the log
+    try:
+        matches = list(iter_matches(path, STAGE_PATTERN_BYTES))
+    except OSError:
+        return []
+    runs = [tuple(field.decode('utf-8', 'replace') for field in match) for match in matches]
+    # All durations of the log in one vectorized conversion
+    seconds = durations([run[1] for run in runs], [run[2] for run in runs])
+    return [run + (duration,) for run, duration in zip(runs, seconds)]
+
+
+class StageHistory:
+    def __init__(self, path=None, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.path = path
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {}
+        # stage -> sorted [(start, end)] of its newest counted runs
+        self.recent = {}
+        # stage -> newest start of the runs dropped from recent; nothing
+        # starting up to it is counted again
+        self.watermarks = {}
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for stage, entry in data.get('stages', {}).items():
+            self.sketches[stage] = DDSketch.from_dict(entry['sketch'])
+            self.recent[stage] = [tuple(run) for run in entry['recent']]
+            self.watermarks[stage] = entry['watermark']
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        data = {'stages': {
+            stage: {'sketch': sketch.to_dict(), 'recent': self.recent.get(stage, []),
+                    'watermark': self.watermarks.get(stage, '')}
+            for stage, sketch in sorted(self.sketches.items())
+        }}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def _sketch(self, stage):
+        if stage not in self.sketches:
+            self.sketches[stage] = DDSketch(self.relative_accuracy)
+        return self.sketches[stage]
+
+    def add(self, stage, start, end, duration):
+        """Count one run of ``stage``; returns False if it was already counted."""
+        if duration is None or start <= self.watermarks.get(stage, ''):
+            return False
+        recent = self.recent.setdefault(stage, [])
+        run = (start, end)
+        index = bisect.bisect_left(recent, run)
+        if index < len(recent) and recent[index] == run:
+            return False
+        self._sketch(stage).add(duration)
+        recent.insert(index, run)
+        if len(recent) > RECENT_RUNS:
+            self.watermarks[stage] = recent.pop(0)[0]
+        return True
+
+    def ingest_logs(self, paths, max_workers=None):
+        """Fold stage runs of many logs, in any order, into the history in one parallel pass.
+
+        Each log is parsed in a worker process and the runs are added oldest
+        first; a run found in several logs, or already in the history, is
+        counted once.  Returns the number of runs added.
+        """
+        paths = list(paths)
+        if max_workers == 1 or len(paths) <= 1:
+            results = map(_stage_runs, paths)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_stage_runs, paths, chunksize=max(1, len(paths) // 64)))
+        runs = sorted((run for log_runs in results for run in log_runs), key=lambda run: (run[1], run[2]))
+        return sum(self.add(*run) for run in runs)
+
+    def percentiles(self):
+        """``{stage: {p50, p95, p99, runs}}`` in seconds."""
+        return {
+            stage: {
+                **{name: round(sketch.quantile(q), 3) for name, q in REPORT_QUANTILES.items()},
+                'runs': sketch.count
+            }
+            for stage, sketch in sorted(self.sketches.items()) if sketch.count
+        }
+
+    def regressions(self, stages, baseline=None):
+        """Stages whose latest duration exceeds the historical p95.
+
+        ``stages`` is ``{stage: {'duration': seconds, ...}}``; ``baseline``
+        defaults to the current :meth:`percentiles` and should be taken
+        before the runs being judged were added.
+        """
+        baseline = self.percentiles() if baseline is None else baseline
+        flagged = {}
+        for stage, run in sorted(stages.items()):
+            history = baseline.get(stage)
+            duration = run.get('duration')
+            if history is None or duration is None or history['runs'] < MIN_HISTORY_RUNS:
+                continue
+            if duration > history['p95']:
+                flagged[stage] = {'duration': duration, 'p95': history['p95'], 'runs': history['runs']}
+        return flagged
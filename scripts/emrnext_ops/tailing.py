@@ -0,0 +1,156 @@
+"""Incremental log tailing with persisted read positions.
+
+Works like fluentd's ``in_tail`` ``pos_file`` (see
+``monitoring/logging/fluentd.conf``): for every source the position store
+remembers the file identity (device and inode), the byte offset already
+consumed and any trailing partial line.  A later run resumes from there, so
+the cost of a run is proportional to the bytes appended since the previous
+one.  The store also keeps each consumer's aggregates next to the position
+so new data can be merged into them.
+
+Rotation (a new inode at the same path) and truncation (the file shrank
+below the stored offset) both restart reading from the beginning of the
+current file while keeping the stored aggregates.  A rotated file that
+reappears under a new name is recognised by its inode and resumed.
+"""
+import base64
+import json
+import os
+
+READ_CHUNK_SIZE = 1024 * 1024
+# Positions of rotated-away files remembered so a renamed file can resume
+MAX_ROTATED_ENTRIES = 32
+
+
+class PositionStore:
+    """JSON file mapping source path -> position entry, saved atomically."""
+
+    def __init__(self, pos_file):
+        self.pos_file = pos_file
+        self.entries = {}
+        self.rotated = []
+        try:
+            with open(pos_file, 'r') as f:
+                state = json.load(f)
+            self.entries = state['sources']
+            self.rotated = state['rotated']
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, KeyError, TypeError):
+            # A corrupt position file means re-reading from scratch, not failing
+            self.entries, self.rotated = {}, []
+
+    def tailer(self, path):
+        return LogTailer(path, self)
+
+    def find_rotated(self, dev, inode):
+        """Pop the remembered position of a rotated-away file with this identity."""
+        for index, entry in enumerate(self.rotated):
+            if (entry['dev'], entry['inode']) == (dev, inode):
+                return self.rotated.pop(index)
+        return None
+
+    def update(self, path, entry):
+        previous = self.entries.get(path)
+        if previous and (previous['dev'], previous['inode']) != (entry['dev'], entry['inode']):
+            self.rotated = (self.rotated + [previous])[-MAX_ROTATED_ENTRIES:]
+        self.entries[path] = entry
+
+    def aggregates(self, path):
+        return self.entries.get(path, {}).get('aggregates')
+
+    def save(self):
+        directory = os.path.dirname(self.pos_file) or '.'
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.pos_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'sources': self.entries, 'rotated': self.rotated}, f)
+        os.replace(tmp_path, self.pos_file)
+
+
+class LogTailer:
+    """Yields the complete lines appended to ``path`` since the stored position."""
+
+    def __init__(self, path, store):
+        self.path = path
+        self.store = store
+        self.rotated = False
+        self.truncated = False
+        self._stat = None
+        self._offset = 0
+        self._carry = b''
+        # Bytes read by read_lines, for the caller's telemetry
+        self.bytes_read = 0
+
+    def _resume_point(self, stat):
+        entry = self.store.entries.get(self.path)
+        if not entry:
+            # A file renamed by rotation (app.log -> app.log.1) keeps its
+            # inode; continue from where the old path left off
+            moved = self.store.find_rotated(stat.st_dev, stat.st_ino)
+            if moved and moved['offset'] <= stat.st_size:
+                return moved['offset'], base64.b64decode(moved['carry'])
+            return 0, b''
+        if (entry['dev'], entry['inode']) != (stat.st_dev, stat.st_ino):
+            self.rotated = True
+            return 0, b''
+        if stat.st_size < entry['offset']:
+            self.truncated = True
+            return 0, b''
+        return entry['offset'], base64.b64decode(entry['carry'])
+
+    def unchanged(self):
+        """True when nothing was appended since the last commit (a single ``stat``)."""
+        entry = self.store.entries.get(self.path)
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return bool(entry) and (
+            (entry['dev'], entry['inode'], entry['offset']) == (stat.st_dev, stat.st_ino, stat.st_size)
+        )
+
+    def read_lines(self, encoding='utf-8'):
+        """Generate decoded lines; call :meth:`commit` once they have been consumed.
+
+        With ``encoding=None`` the raw ``bytes`` of each line are yielded,
+        without the trailing newline.
+        """
+        try:
+            self._stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        self._offset, self._carry = self._resume_point(self._stat)
+        if self._offset == self._stat.st_size:
+            return
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._offset += len(chunk)
+                self.bytes_read += len(chunk)
+                lines = (self._carry + chunk).split(b'\n')
+                self._carry = lines.pop()
+                if encoding is None:
+                    yield from lines
+                    continue
+                for line in lines:
+                    yield line.decode(encoding, errors='replace') + '\n'
+
+    def commit(self, aggregates=None):
+        """Record the consumed position (and merged aggregates) in the store."""
+        if self._stat is None:
+            return
+        entry = self.store.entries.get(self.path, {})
+        if aggregates is None:
+            aggregates = entry.get('aggregates')
+        self.store.update(self.path, {
+            'dev': self._stat.st_dev,
+            'inode': self._stat.st_ino,
+            'offset': self._offset,
+            'carry': base64.b64encode(self._carry).decode('ascii'),
+            'aggregates': aggregates
+        })
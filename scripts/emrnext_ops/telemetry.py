@@ -0,0 +1,214 @@
+"""Self-telemetry of the analyzer runs.
+
+A :class:`Telemetry` is owned by one analyzer.  The analyzer wraps each
+phase in :meth:`Telemetry.span`, counts what it processed (bytes, lines,
+events) with :meth:`Telemetry.count`, and puts the whole run in
+:meth:`Telemetry.run`.  That call also starts the opt-in profiler:
+``cpu`` runs cProfile, ``memory`` runs tracemalloc.  Spans, counters and
+the profile summary go into the report as ``telemetry`` and can be
+exported as Prometheus metrics.  Cron runs write them to a node_exporter
+textfile or push them to a Pushgateway; the health daemon, which never
+finishes a run, serves them on ``/metrics`` as running totals.  Recording
+is thread safe, because report stages and health checks run on worker
+threads.  cProfile only sees the thread that entered :meth:`Telemetry.run`;
+tracemalloc sees every thread.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from emrnext_ops.metrics_exporter import MetricFamily, render
+
+PROFILE_MODES = ('cpu', 'memory')
+PROFILE_TOP = 15
+
+
+class Telemetry:
+    def __init__(self, job, profile=None, profile_path=None):
+        if profile not in (None,) + PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {profile!r}")
+        self.job = job
+        self.profile = profile
+        # cProfile stats are dumped here for snakeviz/pstats when set
+        self.profile_path = profile_path
+        self.spans = {}
+        self.counters = {}
+        self.run_seconds = None
+        self.finished_at = None
+        self.profile_summary = None
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        """Add a span measured elsewhere, e.g. by the check scheduler."""
+        with self._lock:
+            span = self.spans.setdefault(name, {"seconds": 0.0, "calls": 0})
+            span["seconds"] += seconds
+            span["calls"] += 1
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def run(self):
+        """The analyzer's whole run, profiled when a profile mode is set."""
+        profiler = self._start_profiler()
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.run_seconds = time.perf_counter() - started
+            self.finished_at = time.time()
+            if profiler is not None:
+                self.profile_summary = self._stop_profiler(profiler)
+
+    def _start_profiler(self):
+        if self.profile == 'cpu':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profile == 'memory':
+            import tracemalloc
+            tracemalloc.start()
+            return tracemalloc
+        return None
+
+    def _stop_profiler(self, profiler):
+        if self.profile == 'cpu':
+            import pstats
+            profiler.disable()
+            if self.profile_path:
+                profiler.dump_stats(self.profile_path)
+            stats = pstats.Stats(profiler)
+            # (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+            top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+            return {
+                "mode": "cpu",
+                "output": self.profile_path,
+                "top_cumulative": [
+                    {"function": f"{path}:{line}({function})", "calls": calls,
+                     "own_s": round(own, 6), "cumulative_s": round(cumulative, 6)}
+                    for (path, line, function), (_, calls, own, cumulative, _) in top
+                ]
+            }
+
+        snapshot = profiler.take_snapshot()
+        _, peak = profiler.get_traced_memory()
+        profiler.stop()
+        return {
+            "mode": "memory",
+            "peak_bytes": peak,
+            "top_allocations": [
+                {"location": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                for stat in snapshot.statistics('lineno')[:PROFILE_TOP]
+            ]
+        }
+
+    def summary(self):
+        with self._lock:
+            summary = {
+                "run_seconds": None if self.run_seconds is None else round(self.run_seconds, 6),
+                "spans": {
+                    name: {"seconds": round(span["seconds"], 6), "calls": span["calls"]}
+                    for name, span in self.spans.items()
+                },
+                "counters": dict(self.counters)
+            }
+        if self.profile_summary is not None:
+            summary["profile"] = self.profile_summary
+        return summary
+
+    def families(self, cumulative=False):
+        """Metric families of the last run.
+
+        ``cumulative`` is for a long-running process that never completes a
+        run (the health daemon): spans and counters, summed since it started,
+        are exported as ``_total`` counters and the run gauges are left out.
+        """
+        labels = {'job': self.job}
+        if cumulative:
+            spans = MetricFamily('emrnext_analyzer_span_seconds_total', 'counter',
+                                 'Time spent per phase since the process started')
+            calls = MetricFamily('emrnext_analyzer_span_calls_total', 'counter',
+                                 'Times a phase ran since the process started')
+            processed = MetricFamily('emrnext_analyzer_processed_total', 'counter',
+                                     'Bytes, lines or events processed since the process started')
+            self._add_samples(spans, calls, processed, labels)
+            return [spans, calls, processed]
+
+        run = MetricFamily('emrnext_analyzer_run_duration_seconds', 'gauge', 'Wall time of the last analyzer run')
+        finished = MetricFamily('emrnext_analyzer_last_run_timestamp_seconds', 'gauge',
+                                'Unix time the last analyzer run finished')
+        if self.run_seconds is not None:
+            run.add(self.run_seconds, labels)
+            finished.add(self.finished_at, labels)
+
+        spans = MetricFamily('emrnext_analyzer_span_duration_seconds', 'gauge',
+                             'Time spent per phase in the last analyzer run')
+        calls = MetricFamily('emrnext_analyzer_span_calls', 'gauge', 'Times a phase ran in the last analyzer run')
+        processed = MetricFamily('emrnext_analyzer_processed', 'gauge',
+                                 'Bytes, lines or events processed in the last analyzer run')
+        self._add_samples(spans, calls, processed, labels)
+
+        memory = MetricFamily('emrnext_analyzer_profile_peak_memory_bytes', 'gauge',
+                              'Peak traced memory of the last profiled run')
+        if self.profile_summary and self.profile_summary["mode"] == "memory":
+            memory.add(self.profile_summary["peak_bytes"], labels)
+        return [run, finished, spans, calls, processed, memory]
+
+    def _add_samples(self, spans, calls, processed, labels):
+        with self._lock:
+            for name, span in sorted(self.spans.items()):
+                spans.add(span["seconds"], {**labels, 'span': name})
+                calls.add(span["calls"], {**labels, 'span': name})
+            for name, value in sorted(self.counters.items()):
+                processed.add(value, {**labels, 'counter': name})
+
+    def write_textfile(self, path):
+        """Write the metrics for node_exporter's textfile collector (atomically)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as out:
+            out.write(render(self.families()))
+        os.replace(tmp_path, path)
+
+    def push(self, gateway_url, timeout=5):
+        """Replace this job's metrics on a Prometheus Pushgateway."""
+        import requests
+        response = requests.put(f"{gateway_url.rstrip('/')}/metrics/job/{self.job}",
+                                data=render(self.families()), timeout=timeout)
+        response.raise_for_status()
+
+    def export(self, metrics_file=None, pushgateway=None):
+        # Telemetry must never fail the run it describes
+        try:
+            if metrics_file:
+                self.write_textfile(metrics_file)
+            if pushgateway:
+                self.push(pushgateway)
+        except Exception as e:
+            print(f"Exporting telemetry failed: {e}")
+
+
+def add_arguments(parser):
+    """The instrumentation options shared by every analyzer's command line."""
+    parser.add_argument('--profile', choices=PROFILE_MODES, default=None,
+                        help="profile the run with cProfile (cpu) or tracemalloc (memory)")
+    parser.add_argument('--profile-output', default=None, help="where to dump the cProfile stats")
+    parser.add_argument('--metrics-file', default=os.getenv('EMRNEXT_METRICS_FILE'),
+                        help="write run telemetry here for node_exporter's textfile collector")
+    parser.add_argument('--pushgateway', default=os.getenv('PUSHGATEWAY_URL'),
+                        help="push run telemetry to this Prometheus Pushgateway")
+
+
+def from_arguments(job, args):
+    return Telemetry(job, profile=args.profile, profile_path=args.profile_output)
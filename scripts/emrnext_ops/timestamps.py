@@ -0,0 +1,169 @@
+"""Fast parsing of the fixed ``YYYY-MM-DD HH:MM:SS`` timestamps in EMRNext logs.
+
+Every function agrees exactly with the ``datetime`` call it replaces:
+
+* :func:`parse_timestamp` with ``datetime.strptime(text, TIMESTAMP_FORMAT)``;
+* :func:`parse_iso` with ``datetime.fromisoformat(text)``.
+
+Canonical input (ASCII digits at fixed positions, in-range fields) is
+parsed with string slicing; the ``YYYY-MM-DD`` prefix is validated once and
+memoized, since a log holds few distinct dates and many lines per date.
+Anything else, including the leniencies of ``strptime`` (unpadded fields,
+runs of whitespace, non-ASCII digits), goes to the standard library, which
+also produces the errors.
+
+:func:`to_datetime64` and :func:`durations` convert whole batches with
+NumPy when it is installed.
+"""
+from datetime import date, datetime
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Distinct date prefixes are few; the bound only guards against hostile input
+_MAX_CACHED_DATES = 4096
+_dates = {}
+
+
+def _date_fields(prefix):
+    # (year, month, day, seconds from 0001-01-01 to midnight) for a canonical date
+    fields = _dates.get(prefix)
+    if fields is None:
+        digits = prefix[:4] + prefix[5:7] + prefix[8:10]
+        if not (digits.isascii() and digits.isdigit()):
+            return None
+        year, month, day = int(prefix[:4]), int(prefix[5:7]), int(prefix[8:10])
+        try:
+            midnight = date(year, month, day).toordinal() * 86400
+        except ValueError:
+            return None
+        if len(_dates) >= _MAX_CACHED_DATES:
+            _dates.clear()
+        fields = _dates[prefix] = (year, month, day, midnight)
+    return fields
+
+
+def _fields(text, separators):
+    # (date fields, hour, minute, second) for canonical text, None otherwise
+    if (len(text) != 19 or text[4] != '-' or text[7] != '-' or text[10] not in separators
+            or text[13] != ':' or text[16] != ':'):
+        return None
+    day = _date_fields(text[:10])
+    if day is None:
+        return None
+    clock = text[11:13] + text[14:16] + text[17:19]
+    if not (clock.isascii() and clock.isdigit()):
+        return None
+    hour, minute, second = int(clock[:2]), int(clock[2:4]), int(clock[4:])
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return day, hour, minute, second
+
+
+def parse_timestamp(text):
+    """``datetime.strptime(text, TIMESTAMP_FORMAT)``."""
+    fields = _fields(text, ' ') if isinstance(text, str) else None
+    if fields is None:
+        return datetime.strptime(text, TIMESTAMP_FORMAT)
+    (year, month, day, _), hour, minute, second = fields
+    return datetime(year, month, day, hour, minute, second)
+
+
+def parse_iso(text):
+    """``datetime.fromisoformat(text)``."""
+    fields = _fields(text, ' T') if isinstance(text, str) else None
+    if fields is None:
+        return datetime.fromisoformat(text)
+    (year, month, day, _), hour, minute, second = fields
+    return datetime(year, month, day, hour, minute, second)
+
+
+def _seconds(text):
+    # Seconds since 0001-01-01 00:00:00 as strptime would read ``text``
+    fields = _fields(text, ' ') if isinstance(text, str) else None
+    if fields is None:
+        moment = datetime.strptime(text, TIMESTAMP_FORMAT)
+        return moment.toordinal() * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second
+    (_, _, _, midnight), hour, minute, second = fields
+    return midnight + hour * 3600 + minute * 60 + second
+
+
+def duration_seconds(start, end):
+    """``(strptime(end) - strptime(start)).total_seconds()`` without building datetimes."""
+    return float(_seconds(end) - _seconds(start))
+
+
+def _scalar_duration(start, end):
+    try:
+        return duration_seconds(start, end)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_datetime64(texts):
+    """``datetime64[s]`` array of ``texts`` parsed like :func:`parse_timestamp`; NaT where that fails.
+
+    Canonical rows are decoded with array arithmetic on their code points;
+    the rest go through :func:`parse_timestamp` one by one.
+    """
+    import numpy as np
+
+    texts = list(texts)
+    result = np.full(len(texts), np.datetime64('NaT'), dtype='datetime64[s]')
+    if not texts:
+        return result
+    strings = np.array([text if isinstance(text, str) else '' for text in texts], dtype=str)
+    width = max(strings.dtype.itemsize // 4, 19)
+    codes = np.zeros((len(texts), width), dtype=np.uint32)
+    codes[:, :strings.dtype.itemsize // 4] = strings.view(np.uint32).reshape(len(texts), -1)
+
+    valid = (np.char.str_len(strings) == 19) & (codes[:, 4] == ord('-')) & (codes[:, 7] == ord('-')) \
+        & (codes[:, 10] == ord(' ')) & (codes[:, 13] == ord(':')) & (codes[:, 16] == ord(':'))
+    positions = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+    digits = codes[:, positions].astype(np.int64) - ord('0')
+    valid &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+
+    def number(first, count):
+        value = np.zeros(len(texts), dtype=np.int64)
+        for column in range(first, first + count):
+            value = value * 10 + digits[:, column]
+        return value
+
+    year, month, day = number(0, 4), number(4, 2), number(6, 2)
+    hour, minute, second = number(8, 2), number(10, 2), number(12, 2)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[np.clip(month, 0, 12)] \
+        + (leap & (month == 2))
+    valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days) \
+        & (hour <= 23) & (minute <= 59) & (second <= 59)
+
+    # Days since 1970-01-01 (days_from_civil), valid for the proleptic Gregorian calendar
+    shifted = year - (month <= 2)
+    era = np.floor_divide(shifted, 400)
+    year_of_era = shifted - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+    seconds = days * 86400 + hour * 3600 + minute * 60 + second
+    result[valid] = seconds[valid].astype('datetime64[s]')
+
+    for index in np.flatnonzero(~valid):
+        try:
+            result[index] = np.datetime64(parse_timestamp(texts[index]), 's')
+        except (TypeError, ValueError):
+            pass
+    return result
+
+
+def durations(starts, ends, min_batch=64):
+    """``[duration_seconds(start, end) or None]`` for paired lists, vectorized for large batches."""
+    starts, ends = list(starts), list(ends)
+    if len(starts) < min_batch:
+        return [_scalar_duration(start, end) for start, end in zip(starts, ends)]
+    try:
+        import numpy as np
+    except ImportError:
+        return [_scalar_duration(start, end) for start, end in zip(starts, ends)]
+    delta = (to_datetime64(ends) - to_datetime64(starts)).astype('timedelta64[s]')
+    missing = np.isnat(delta)
+    values = delta.astype(np.int64).astype(float).tolist()
+    return [None if gap else value for gap, value in zip(missing.tolist(), values)]
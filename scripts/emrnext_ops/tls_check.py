@@ -0,0 +1,146 @@
+"""In-process TLS certificate checks.
+
+Handshakes run concurrently with the ``ssl`` module against a list of
+``host:port`` targets, reusing each host's resolved addresses.  A result
+reports whether the chain verified, the verification error otherwise, the
+days until ``notAfter`` and the handshake latency.
+
+Valid results are cached in a small JSON file and served without a
+handshake until ``refresh_margin_days`` before the certificate expires (or
+``max_age_hours`` after the check, whichever comes first), so frequent runs
+only pay for a handshake occasionally.
+"""
+import json
+import os
+import socket
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_REFRESH_MARGIN_DAYS = 14
+DEFAULT_MAX_AGE_HOURS = 24
+
+
+def split_target(target, default_port=443):
+    """``(host, port)`` of ``host``, ``host:port``, an IPv6 address, ``[IPv6]`` or ``[IPv6]:port``."""
+    if target.startswith('['):
+        host, _, port = target[1:].partition(']')
+        return host, int(port[1:]) if port else default_port
+    if target.count(':') != 1:
+        # A bare IPv6 address never carries a port
+        return target, default_port
+    host, _, port = target.partition(':')
+    return host, int(port)
+
+
+class TLSChecker:
+    def __init__(self, targets, ssl_context=None, timeout=10, cache_path=None,
+                 refresh_margin_days=DEFAULT_REFRESH_MARGIN_DAYS, max_age_hours=DEFAULT_MAX_AGE_HOURS,
+                 max_workers=8):
+        self.targets = list(targets)
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin_days * 86400
+        self.max_age = max_age_hours * 3600
+        self.max_workers = max_workers
+        self._addresses = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, host, port):
+        with self._lock:
+            cached = self._addresses.get((host, port))
+        if cached is None:
+            cached = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            with self._lock:
+                self._addresses[(host, port)] = cached
+        return cached
+
+    def _connect(self, host, port):
+        # Try every address in turn, as the probe engine does, so a host whose
+        # first (e.g. IPv6) address is unreachable is still checked
+        error = None
+        for family, socktype, proto, _, address in self._resolve(host, port):
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(address)
+                return sock
+            except OSError as e:
+                sock.close()
+                error = e
+        raise error or OSError(f"getaddrinfo returned no addresses for {host}")
+
+    def check(self, target):
+        """Handshake with ``target`` and describe its certificate."""
+        host, port = split_target(target)
+        result = {"status": "CHECK_FAILED", "checked_at": time.time()}
+        try:
+            with self._connect(host, port) as sock:
+                started = time.perf_counter()
+                with self.ssl_context.wrap_socket(sock, server_hostname=host) as tls:
+                    result['handshake_ms'] = round((time.perf_counter() - started) * 1000, 3)
+                    certificate = tls.getpeercert()
+                    result['protocol'] = tls.version()
+        except ssl.SSLCertVerificationError as e:
+            result.update(status="INVALID", verification=e.verify_message or str(e))
+            return result
+        except (OSError, ssl.SSLError) as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+            return result
+
+        expires_at = ssl.cert_time_to_seconds(certificate['notAfter'])
+        result.update(
+            status="VALID",
+            verification="ok",
+            expires_at=expires_at,
+            days_remaining=round((expires_at - time.time()) / 86400, 1)
+        )
+        return result
+
+    def _load_cache(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_cache(self, cache):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _fresh(self, result, now):
+        if result.get('status') != 'VALID':
+            return False
+        recheck_at = min(result['expires_at'] - self.refresh_margin, result['checked_at'] + self.max_age)
+        return now < recheck_at
+
+    def check_all(self):
+        """``{target: result}`` for every target, handshaking only where the cache is stale."""
+        now = time.time()
+        cache = self._load_cache()
+        results = {}
+        stale = []
+        for target in self.targets:
+            cached = cache.get(target)
+            if cached and self._fresh(cached, now):
+                cached['days_remaining'] = round((cached['expires_at'] - now) / 86400, 1)
+                results[target] = {**cached, "cached": True}
+            else:
+                stale.append(target)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stale))) as executor:
+                for target, result in zip(stale, executor.map(self.check, stale)):
+                    results[target] = {**result, "cached": False}
+                    cache[target] = result
+            self._save_cache(cache)
+        return results
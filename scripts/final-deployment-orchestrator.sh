@@ -52,8 +52,8 @@ main_deployment() {
 
     # Stage 5: Generate Deployment Report
     log_stage "Deployment Report Generation" "Starting"
-    python3 ./scripts/deployment-readiness-report.py
-    python3 ./scripts/deployment-log-analyzer.py
+    # Both reports in one interpreter
+    python3 ./scripts/emrnext-cli.py readiness then deployment
     log_stage "Deployment Report Generation" "Completed"
 
     # Final Success
@@ -0,0 +1,136 @@
+import os
+import glob
+import json
+import argparse
+from emrnext_ops.collection import LOG_DIR, collect, run_stages
+from emrnext_ops.loader import load_script
+from emrnext_ops.report_store import ReportStore, legacy_timestamp
+from emrnext_ops.telemetry import Telemetry, add_arguments, from_arguments
+
+STAGES = ['deployment_analysis', 'deployment_readiness', 'continuous_improvement', 'system_health']
+SCRIPTS = [
+    'deployment-log-analyzer.py',
+    'deployment-readiness-report.py',
+    'continuous-improvement.py',
+    'system-health-checker.py'
+]
+
+# Timestamped report files written before the report store, by kind
+LEGACY_REPORTS = {
+    'health': 'system_health_*.json',
+    'improvement': 'continuous_improvement_*.json',
+    'readiness': 'deployment_report_*.json'
+}
+
+class ReportPipeline:
+    """Reads /var/log/emrnext once and runs every report as a concurrent stage."""
+
+    def __init__(self, log_dir=LOG_DIR, stages=None, max_workers=None, prometheus=None, telemetry=None):
+        self.log_dir = log_dir
+        self.stages = stages or STAGES
+        self.max_workers = max_workers
+        self.prometheus = prometheus
+        # Collection and per-stage timings; each report carries its own as well
+        self.telemetry = telemetry or Telemetry('generate_reports')
+
+    def _timed(self, name, stage, sources):
+        with self.telemetry.span(f'stage.{name}'):
+            return stage(sources)
+
+    def _deployment_analysis(self, sources):
+        analyzer = self.deployment_analyzer
+        with analyzer.telemetry.run():
+            # Collection folded the log into analyzer.accumulator(); without a
+            # deployment.log the analyzer reports the missing file itself
+            metrics = analyzer.parse_deployment_log(sources.deployment)
+            analyzer.generate_deployment_report(os.path.join(self.log_dir, 'deployment_report.md'))
+        return metrics
+
+    def _deployment_readiness(self, sources):
+        report = self.modules['deployment-readiness-report.py'].DeploymentReadinessReport(self.log_dir)
+        return report.create_report(sources)
+
+    def _continuous_improvement(self, sources):
+        return self.improvement_analyzer.generate_improvement_report(sources)
+
+    def _system_health(self, sources):
+        # Probes the live services; reads nothing from the log directory
+        checker = self.modules['system-health-checker.py'].SystemHealthChecker()
+        checker.report_dir = self.log_dir
+        return checker.generate_health_report()
+
+    def run(self):
+        with self.telemetry.run():
+            # Load the report scripts before any stage thread starts
+            with self.telemetry.span('load_scripts'):
+                self.modules = {filename: load_script(filename) for filename in SCRIPTS}
+            self.improvement_analyzer = self.modules['continuous-improvement.py'].ContinuousImprovementAnalyzer(
+                log_dir=self.log_dir, prometheus=self.prometheus
+            )
+            self.deployment_analyzer = self.modules['deployment-log-analyzer.py'].DeploymentAnalyzer(
+                os.path.join(self.log_dir, 'deployment.log'),
+                history_path=os.path.join(self.log_dir, 'stage_history.json')
+            )
+            # Error counts cover the same files the analyzer would scan itself
+            with self.telemetry.span('collect'):
+                sources = collect(self.log_dir, error_log_paths=self.improvement_analyzer._error_log_paths(),
+                                  max_workers=self.max_workers,
+                                  deployment=(self.deployment_analyzer.accumulator()
+                                              if 'deployment_analysis' in self.stages else None))
+            self.telemetry.count('source_bytes', sources.bytes_read)
+            self.telemetry.count('error_lines', sum(sources.error_counts.values()))
+            stages = {
+                name: (lambda name=name: self._timed(name, getattr(self, f'_{name}'), sources))
+                for name in self.stages
+            }
+            return run_stages(stages)
+
+def import_legacy_reports(log_dir, remove=False):
+    # Move one-file-per-run reports into the store, oldest first
+    store = ReportStore(os.path.join(log_dir, 'reports'))
+    imported = {}
+    for kind, pattern in LEGACY_REPORTS.items():
+        paths = glob.glob(os.path.join(log_dir, pattern))
+        imported[kind] = store.import_files(kind, paths, legacy_timestamp)
+        if remove:
+            for path in paths:
+                os.remove(path)
+    return imported
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate all EMRNext reports from one pass over the logs")
+    parser.add_argument('--log-dir', default=LOG_DIR)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--workers', type=int, default=None, help="processes for the error log scan")
+    parser.add_argument('--prometheus-url', default=os.getenv('PROMETHEUS_URL', ''),
+                        help="Prometheus to read live performance metrics and baselines from "
+                             "(default: $PROMETHEUS_URL; without either, only the log files are used)")
+    parser.add_argument('--import-legacy', action='store_true',
+                        help="import timestamped JSON reports into the report store and exit; they must "
+                             "all predate (or postdate) the reports already stored")
+    parser.add_argument('--remove-imported', action='store_true',
+                        help="with --import-legacy, delete the files once imported")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.import_legacy:
+        try:
+            imported = import_legacy_reports(args.log_dir, args.remove_imported)
+        except ValueError as e:
+            parser.error(str(e))
+        print(json.dumps(imported, indent=2))
+        return
+
+    prometheus = None
+    if args.prometheus_url:
+        from emrnext_ops.prometheus import PrometheusClient
+        prometheus = PrometheusClient(args.prometheus_url, timeout=5)
+
+    pipeline = ReportPipeline(args.log_dir, args.stages, args.workers, prometheus,
+                              telemetry=from_arguments('generate_reports', args))
+    results = pipeline.run()
+    pipeline.telemetry.export(args.metrics_file, args.pushgateway)
+    print(json.dumps({**results, "telemetry": pipeline.telemetry.summary()}, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
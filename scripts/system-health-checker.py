@@ -1,127 +1,342 @@
 import os
-import sys
-import subprocess
+import argparse
 import json
+import threading
 from datetime import datetime
-import psutil
-import requests
+from functools import partial
+from emrnext_ops.check_registry import CheckRegistry, CheckScheduler, ResultCache
+from emrnext_ops.report_store import ReportStore
+from emrnext_ops.resource_sampler import ResourceSampler
+from emrnext_ops.telemetry import Telemetry, add_arguments, from_arguments
+
+# Seconds a probe check may run past the run deadline, so the probe engine's
+# deadline fires first and every unfinished probe is recorded as unreachable
+PROBE_DEADLINE_MARGIN = 2
+
+def all_with_status(section, status):
+    # An empty section means no probe answered, not that all of them passed
+    return bool(section) and all(entry['status'] == status for entry in section.values())
 
 class SystemHealthChecker:
-    def __init__(self):
+    # Critical services and external sites probed on every run
+    services = [
+        {"name": "backend", "url": "https://emrnext.railway.app/api/health"},
+        {"name": "frontend", "url": "https://emrnext.railway.app"},
+        {"name": "database", "url": "https://emrnext.railway.app/api/db-health"}
+    ]
+    external_sites = [
+        "https://www.google.com",
+        "https://railway.app",
+        "https://github.com"
+    ]
+    # Hosts whose TLS certificates are verified
+    ssl_targets = ["emrnext.railway.app:443"]
+    # Registered probe checks and the probe group each one runs
+    probe_checks = {
+        'service_status': 'services',
+        'network_connectivity': 'network',
+        'security_checks': 'security'
+    }
+    tls_cache_path = '/var/log/emrnext/tls_check_cache.json'
+    report_dir = '/var/log/emrnext'
+
+    def __init__(self, probe_engine=None, run_deadline=15, sampler=None, resource_window=60, tls_checker=None,
+                 check_cache_path=None, telemetry=None):
+        # The probe engine (http.client, ssl) and TLS checker are only built,
+        # and their modules only imported, when a check first needs them
+        self._probe_engine = probe_engine
+        self._tls_checker = tls_checker
+        self._lazy_lock = threading.Lock()
+        # Upper bound on wall time for all network checks of one run
+        self.run_deadline = run_deadline
+        # Resource decisions use samples smoothed over resource_window seconds
+        self.sampler = sampler or ResourceSampler()
+        self.resource_window = resource_window
+        # Per-check timings of this run (or of each daemon group run)
+        self.telemetry = telemetry or Telemetry('system_health')
         self.health_report = {
             "timestamp": datetime.now().isoformat(),
             "system_resources": {},
             "service_status": {},
             "network_connectivity": {},
             "security_checks": {},
+            "probe_latency": {},
             "overall_health": "UNKNOWN"
         }
+        # Called with the raw results of every probe group run, e.g. by the
+        # daemon's latency histogram
+        self.probe_observers = []
+        self.registry = self._build_registry()
+        self.scheduler = CheckScheduler(self.registry, cache=ResultCache(check_cache_path))
+
+    @property
+    def probe_engine(self):
+        with self._lazy_lock:
+            if self._probe_engine is None:
+                from emrnext_ops.probes import ProbeEngine
+                self._probe_engine = ProbeEngine()
+            return self._probe_engine
+
+    @property
+    def tls_checker(self):
+        with self._lazy_lock:
+            if self._tls_checker is None:
+                from emrnext_ops.tls_check import TLSChecker
+                self._tls_checker = TLSChecker(self.ssl_targets, cache_path=self.tls_cache_path)
+            return self._tls_checker
+
+    def _build_registry(self):
+        # Each check returns the report sections it fills; more checks (e.g.
+        # database or queue depth) can be registered on checker.registry
+        registry = CheckRegistry()
+        registry.register('system_resources', lambda deps: self._collect_resources(), group='resources')
+        for check, group in self.probe_checks.items():
+            registry.register(check, lambda deps, group=group: self._probe_sections(group),
+                              timeout=self.run_deadline + PROBE_DEADLINE_MARGIN, group=group)
+
+        registry.criterion('services_healthy',
+                           lambda report: all_with_status(report['service_status'], 'HEALTHY'))
+        registry.criterion('network_connected',
+                           lambda report: all_with_status(report['network_connectivity'], 'CONNECTED'))
+        registry.criterion('cpu_below_80', lambda report: report['system_resources']['cpu_usage'] < 80)
+        registry.criterion('memory_below_85', lambda report: report['system_resources']['memory_usage'] < 85)
+        registry.criterion('disk_below_90', lambda report: report['system_resources']['disk_usage'] < 90)
+        registry.criterion('certificates_valid',
+                           lambda report: all_with_status(report['security_checks'], 'VALID'))
+        return registry
+
+    def _merge_sections(self, sections):
+        for section, values in sections.items():
+            if section == 'probe_latency':
+                self.health_report[section].update(values)
+            else:
+                self.health_report[section] = values
 
     def check_system_resources(self):
-        # CPU, Memory, Disk Usage
-        self.health_report['system_resources'] = {
-            "cpu_usage": psutil.cpu_percent(),
-            "memory_usage": psutil.virtual_memory().percent,
-            "disk_usage": psutil.disk_usage('/').percent
+        self._merge_sections(self._collect_resources())
+
+    def _collect_resources(self):
+        # CPU, Memory, Disk Usage averaged over the sampler window; waits for
+        # the first tick of a freshly started sampler.  Samples older than the
+        # window are replaced by one reading taken now (the collector waits
+        # until its CPU reading spans a full interval)
+        self.sampler.wait_for_sample(timeout=self.sampler.interval * 2)
+        stats = self.sampler.stats(self.resource_window)
+        if not stats:
+            self.sampler.sample_once()
+            stats = self.sampler.stats(self.resource_window)
+
+        return {
+            'system_resources': {
+                "cpu_usage": round(stats['cpu']['avg'], 1),
+                "memory_usage": round(stats['memory']['avg'], 1),
+                "disk_usage": round(stats['disk']['avg'], 1)
+            },
+            'resource_stats': {
+                "window_seconds": self.resource_window,
+                **{field: {key: round(value, 2) for key, value in values.items()} for field, values in stats.items()}
+            }
         }
 
+    def _service_probes(self):
+        return {
+            ('service_status', service['name']): partial(self.probe_engine.http_probe, service['url'], 10)
+            for service in self.services
+        }
+
+    def _network_probes(self):
+        return {
+            ('network_connectivity', site): partial(self.probe_engine.http_probe, site, 5)
+            for site in self.external_sites
+        }
+
+    def _security_probes(self):
+        return {('security_checks', 'ssl_certificate'): self._check_ssl_certificate}
+
+    def probe_groups(self):
+        # Network checks by group, so they can be scheduled independently
+        return {
+            'services': self._service_probes(),
+            'network': self._network_probes(),
+            'security': self._security_probes()
+        }
+
+    def run_probes(self, probes):
+        # Run the given probes concurrently and record their outcome and latency
+        self.record_probe_results(self.probe_engine.run(probes, self.run_deadline))
+
+    def _empty_sections(self, probes):
+        sections = {section: {} for section, _ in probes}
+        sections['probe_latency'] = {}
+        return sections
+
+    def _probe_sections(self, group):
+        # Report sections filled by one probe group, without touching health_report
+        probes = self.probe_groups()[group]
+        sections = self._empty_sections(probes)
+        self.telemetry.count('probes', len(probes))
+        results = self.probe_engine.run(probes, self.run_deadline)
+        for observer in self.probe_observers:
+            observer(results)
+        self.record_probe_results(results, sections)
+        return sections
+
+    def _failed_probe_sections(self, group, error):
+        # A probe check that failed as a whole still lists each of its probes
+        probes = self.probe_groups()[group]
+        sections = self._empty_sections(probes)
+        self.record_probe_results({key: RuntimeError(error) for key in probes}, sections)
+        return sections
+
+    def record_probe_results(self, results, report=None):
+        report = self.health_report if report is None else report
+        for (section, name), result in results.items():
+            if section == 'security_checks':
+                self._record_security_result(name, result, report)
+            else:
+                self._record_probe_result(section, name, result, report)
+
+    def _record_probe_result(self, section, name, result, report):
+        ok_status = "HEALTHY" if section == 'service_status' else "CONNECTED"
+        bad_status = "UNHEALTHY" if section == 'service_status' else "DISCONNECTED"
+
+        if isinstance(result, Exception) or result.status_code is None:
+            report[section][name] = {
+                "status": "UNREACHABLE",
+                "response_code": None
+            }
+        else:
+            report[section][name] = {
+                "status": ok_status if result.status_code == 200 else bad_status,
+                "response_code": result.status_code
+            }
+
+        if not isinstance(result, Exception):
+            report['probe_latency'][name] = result.latency()
+
+    def _record_security_result(self, name, result, report):
+        if isinstance(result, Exception):
+            result = {"status": "CHECK_FAILED"}
+        report['security_checks'][name] = result
+
     def check_service_status(self):
-        # Check critical services
-        services = [
-            {"name": "backend", "url": "https://emrnext.railway.app/api/health"},
-            {"name": "frontend", "url": "https://emrnext.railway.app"},
-            {"name": "database", "url": "https://emrnext.railway.app/api/db-health"}
-        ]
-
-        for service in services:
-            try:
-                response = requests.get(service['url'], timeout=10)
-                self.health_report['service_status'][service['name']] = {
-                    "status": "HEALTHY" if response.status_code == 200 else "UNHEALTHY",
-                    "response_code": response.status_code
-                }
-            except requests.RequestException:
-                self.health_report['service_status'][service['name']] = {
-                    "status": "UNREACHABLE",
-                    "response_code": None
-                }
+        self.run_probes(self._service_probes())
 
     def check_network_connectivity(self):
-        # Test external connectivity
-        external_sites = [
-            "https://www.google.com",
-            "https://railway.app",
-            "https://github.com"
-        ]
-
-        for site in external_sites:
-            try:
-                response = requests.get(site, timeout=5)
-                self.health_report['network_connectivity'][site] = {
-                    "status": "CONNECTED" if response.status_code == 200 else "DISCONNECTED",
-                    "response_code": response.status_code
-                }
-            except requests.RequestException:
-                self.health_report['network_connectivity'][site] = {
-                    "status": "UNREACHABLE",
-                    "response_code": None
-                }
+        self.run_probes(self._network_probes())
+
+    def _check_ssl_certificate(self):
+        # Handshake with every target (or reuse cached results); the check
+        # is VALID only when all certificates verify
+        hosts = self.tls_checker.check_all()
+        statuses = {result['status'] for result in hosts.values()}
+        return {
+            "status": (
+                "VALID" if statuses == {"VALID"} else
+                "INVALID" if "INVALID" in statuses else
+                "CHECK_FAILED"
+            ),
+            "hosts": hosts
+        }
 
     def perform_security_checks(self):
-        # Basic security checks
-        try:
-            # Check SSL certificate
-            ssl_check = subprocess.run(
-                ['openssl', 's_client', '-connect', 'emrnext.railway.app:443'], 
-                capture_output=True, 
-                text=True, 
-                timeout=10
-            )
-            
-            self.health_report['security_checks']['ssl_certificate'] = {
-                "status": "VALID" if "Verification return code: 0" in ssl_check.stderr else "INVALID"
-            }
-        except subprocess.TimeoutExpired:
-            self.health_report['security_checks']['ssl_certificate'] = {
-                "status": "CHECK_FAILED"
-            }
+        self.run_probes(self._security_probes())
 
     def determine_overall_health(self):
-        # Calculate overall system health
-        health_criteria = [
-            all(status['status'] == 'HEALTHY' for status in self.health_report['service_status'].values()),
-            all(status['status'] == 'CONNECTED' for status in self.health_report['network_connectivity'].values()),
-            self.health_report['system_resources']['cpu_usage'] < 80,
-            self.health_report['system_resources']['memory_usage'] < 85,
-            self.health_report['system_resources']['disk_usage'] < 90,
-            all(check['status'] == 'VALID' for check in self.health_report['security_checks'].values())
-        ]
+        # Calculate overall system health from the weighted criteria
+        score, passed = self.registry.score(self.health_report)
+        self.health_report['health_score'] = round(score, 3)
+        self.health_report['health_criteria'] = passed
 
         self.health_report['overall_health'] = (
-            "EXCELLENT" if all(health_criteria) else
-            "GOOD" if sum(health_criteria) >= 4 else
-            "NEEDS_ATTENTION" if sum(health_criteria) >= 2 else
+            "EXCELLENT" if score >= 1 else
+            "GOOD" if score >= 4 / 6 else
+            "NEEDS_ATTENTION" if score >= 2 / 6 else
             "CRITICAL"
         )
 
+    def merge_outcomes(self, outcomes):
+        """Merge the results of a scheduler run into the report."""
+        for name, outcome in outcomes.items():
+            if outcome.ok:
+                self._merge_sections(outcome.result)
+            elif name in self.probe_checks:
+                self._merge_sections(self._failed_probe_sections(self.probe_checks[name], outcome.error))
+            if outcome.cached:
+                self.telemetry.count('checks_cached')
+            elif not outcome.skipped:
+                # Checks run concurrently; each one's own wall time is its span
+                self.telemetry.record(f'check.{name}', outcome.elapsed)
+        self.health_report.setdefault('checks', {}).update(
+            {name: outcome.summary() for name, outcome in outcomes.items()}
+        )
+
     def generate_health_report(self):
-        # Perform all health checks
-        self.check_system_resources()
-        self.check_service_status()
-        self.check_network_connectivity()
-        self.perform_security_checks()
-        self.determine_overall_health()
-
-        # Save report
-        report_path = f'/var/log/emrnext/system_health_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        with open(report_path, 'w') as report_file:
-            json.dump(self.health_report, report_file, indent=2)
+        # Sample resources in the background while the checks run
+        with self.telemetry.run():
+            started_sampler = not self.sampler.running
+            self.sampler.start()
+            try:
+                # Independent checks run in parallel; fresh cached results are reused
+                outcomes = self.scheduler.run()
+            finally:
+                if started_sampler:
+                    self.sampler.stop()
+
+            self.merge_outcomes(outcomes)
+            with self.telemetry.span('determine_overall_health'):
+                self.determine_overall_health()
+        self.health_report['telemetry'] = self.telemetry.summary()
+
+        # Append to the report store (queried with ReportStore.last/series)
+        ReportStore(os.path.join(self.report_dir, 'reports')).append('health', self.health_report)
 
         return self.health_report
 
-def main():
-    health_checker = SystemHealthChecker()
+def run_fleet(args):
+    # Fan-out mode: one probe per replica instead of this host's checks
+    from emrnext_ops.fleet import FleetHealthCheck, FleetProber, load_inventory
+    targets, layout = load_inventory(args.inventory, args.manifest)
+    prober = FleetProber(concurrency=args.concurrency, per_host_rate=args.per_host_rate, deadline=args.deadline)
+    check = FleetHealthCheck(targets, layout, prober,
+                             state_path=os.path.join(SystemHealthChecker.report_dir, 'fleet_breakers.json'),
+                             telemetry=from_arguments('fleet_health', args))
+    check.report_dir = SystemHealthChecker.report_dir
+    report = check.generate_report()
+    check.telemetry.export(args.metrics_file, args.pushgateway)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EMRNext system health checker")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running and serve the latest results on /metrics (not with --inventory)")
+    parser.add_argument('--bind', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=9105)
+    fleet = parser.add_argument_group('fleet fan-out', "probe every replica listed in an inventory instead")
+    fleet.add_argument('--inventory', help="YAML/JSON inventory of replicas to probe")
+    fleet.add_argument('--manifest', help="blue/green Kubernetes manifest (overrides the inventory's)")
+    fleet.add_argument('--concurrency', type=int, default=64, help="probes in flight at once")
+    fleet.add_argument('--per-host-rate', type=float, default=5.0, help="requests per second per host")
+    fleet.add_argument('--deadline', type=float, default=12, help="seconds for the whole fan-out")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.inventory and args.daemon:
+        # The daemon exports this host's checks; fleet fan-out is a one-shot run
+        parser.error("--inventory cannot be combined with --daemon")
+
+    if args.inventory:
+        report = run_fleet(args)
+        print(json.dumps(report, indent=2))
+        return
+
+    health_checker = SystemHealthChecker(telemetry=from_arguments('system_health', args))
+    if args.daemon:
+        from emrnext_ops.metrics_exporter import HealthDaemon
+        HealthDaemon(health_checker, bind=args.bind, port=args.port).serve_forever()
+        return
+
     report = health_checker.generate_health_report()
+    health_checker.telemetry.export(args.metrics_file, args.pushgateway)
     print(json.dumps(report, indent=2))
 
 if __name__ == "__main__":
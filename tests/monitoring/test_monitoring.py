@@ -1,19 +1,33 @@
 import unittest
 import requests
 import os
+import sys
 import time
 from datetime import datetime
 
+# Shared Prometheus client lives with the ops scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from emrnext_ops.prometheus import PrometheusClient
+
 class TestMonitoringInfrastructure(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # One pooled client for the whole suite
+        cls.prometheus = PrometheusClient(os.getenv("PROMETHEUS_URL", "http://localhost:9090"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.prometheus.close()
+
     def setUp(self):
-        self.prometheus_url = "http://localhost:9090"
+        self.prometheus_url = self.prometheus.base_url
         self.grafana_url = "http://localhost:3000"
         self.alertmanager_url = "http://localhost:9093"
         self.grafana_api_key = os.getenv("GRAFANA_API_KEY")
         
     def test_prometheus_health(self):
         """Test Prometheus health endpoint"""
-        response = requests.get(f"{self.prometheus_url}/-/healthy")
+        response = self.prometheus.get("/-/healthy")
         self.assertEqual(response.status_code, 200)
         
     def test_grafana_health(self):
@@ -34,15 +48,10 @@ class TestMonitoringInfrastructure(unittest.TestCase):
             "http_request_duration_milliseconds"
         ]
         
+        # Merged into one query; raises PrometheusError unless it succeeds
+        results = self.prometheus.query_many(metrics)
         for metric in metrics:
-            response = requests.get(
-                f"{self.prometheus_url}/api/v1/query",
-                params={"query": metric}
-            )
-            self.assertEqual(response.status_code, 200)
-            data = response.json()
-            self.assertIn("data", data)
-            self.assertIn("result", data["data"])
+            self.assertIsInstance(results[metric], list)
             
     def test_business_metrics_collection(self):
         """Test business metrics are being collected"""
@@ -52,22 +61,14 @@ class TestMonitoringInfrastructure(unittest.TestCase):
             "security_violation_total"
         ]
         
+        results = self.prometheus.query_many(metrics)
         for metric in metrics:
-            response = requests.get(
-                f"{self.prometheus_url}/api/v1/query",
-                params={"query": metric}
-            )
-            self.assertEqual(response.status_code, 200)
-            data = response.json()
-            self.assertIn("data", data)
+            self.assertIn(metric, results)
             
     def test_alert_rules(self):
         """Test alert rules are loaded"""
-        response = requests.get(f"{self.prometheus_url}/api/v1/rules")
-        self.assertEqual(response.status_code, 200)
-        data = response.json()
-        self.assertIn("data", data)
-        self.assertIn("groups", data["data"])
+        data = self.prometheus.api("/api/v1/rules")
+        self.assertIn("groups", data)
         
     def test_grafana_dashboards(self):
         """Test Grafana dashboards are accessible"""
@@ -97,7 +98,7 @@ class TestMonitoringInfrastructure(unittest.TestCase):
         
     def test_data_retention(self):
         """Test data retention configuration"""
-        response = requests.get(f"{self.prometheus_url}/api/v1/status/config")
+        response = self.prometheus.get("/api/v1/status/config")
         self.assertEqual(response.status_code, 200)
         config = response.json()
         self.assertIn("data", config)
@@ -105,16 +106,10 @@ class TestMonitoringInfrastructure(unittest.TestCase):
         
     def test_metric_timestamps(self):
         """Test metrics are being updated"""
-        query = 'process_cpu_seconds_total'
-        response = requests.get(
-            f"{self.prometheus_url}/api/v1/query",
-            params={"query": query}
-        )
-        self.assertEqual(response.status_code, 200)
-        data = response.json()
+        result = self.prometheus.query('process_cpu_seconds_total')
         
-        if "data" in data and "result" in data["data"] and len(data["data"]["result"]) > 0:
-            timestamp = float(data["data"]["result"][0]["value"][0])
+        if len(result) > 0:
+            timestamp = float(result[0]["value"][0])
             current_time = time.time()
             # Check if metric is not older than 5 minutes
             self.assertLess(current_time - timestamp, 300)
@@ -0,0 +1,222 @@
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from script_loader import load_script, timing_test
+from emrnext_ops.alert_rules import (
+    AlertRule, RuleEngine, RuleError, SeriesStore, deviation, evaluate, ewma, parse, seasonal_baseline
+)
+
+continuous_improvement = load_script('continuous-improvement.py')
+
+STEP = 60
+DAY_STEPS = 1440
+
+
+def reference_rate(counter, window, step):
+    # Prometheus' increase without extrapolation, one series at a time
+    rates = [np.nan] * len(counter)
+    for end in range(window, len(counter)):
+        increase = 0.0
+        for index in range(end - window + 1, end + 1):
+            delta = counter[index] - counter[index - 1]
+            increase += counter[index] if delta < 0 else delta
+        rates[end] = increase / (window * step)
+    return np.array(rates)
+
+
+class RangeClient:
+    """Answers range queries for plain selectors from ``{metric name: [(labels, values)]}``."""
+
+    def __init__(self, series):
+        self.series = series
+        self.queries = []
+
+    def query_range_many(self, exprs, start, end, step):
+        self.queries.extend(exprs)
+        results = {}
+        for expr in exprs:
+            name = parse(expr).name
+            results[expr] = [
+                {'metric': {'__name__': name, **labels},
+                 'values': [[start + index * step, str(value)] for index, value in enumerate(values)]}
+                for labels, values in self.series.get(name, [])
+            ]
+        return results
+
+
+class TestExpressions(unittest.TestCase):
+    def test_repository_rules_load(self):
+        engine = RuleEngine.load()
+        self.assertEqual(engine.errors, {})
+        self.assertIn('HighCPUUsage', [rule.name for rule in engine.rules])
+        self.assertIn('process_cpu_seconds_total', engine.selectors())
+        self.assertEqual(engine.rule('HighCPUUsage').for_seconds, 300)
+
+    def test_unsupported_syntax_is_rejected(self):
+        for expr in ('histogram_quantile(0.9, x)', 'x offset 5m', 'rate(x[5m]'):
+            with self.assertRaises(RuleError):
+                parse(expr)
+
+    def test_rate_matches_per_series_reference(self):
+        rng = np.random.default_rng(7)
+        counters = np.cumsum(rng.integers(0, 20, size=(3, 200)), axis=1).astype(float)
+        counters[1, 120:] -= counters[1, 119]  # counter reset
+        store = SeriesStore(0, STEP, 200)
+        for row, counter in enumerate(counters):
+            store.add({'__name__': 'requests_total', 'instance': str(row)}, counter)
+
+        result = evaluate('rate(requests_total[5m])', store)
+        for row in range(3):
+            np.testing.assert_allclose(result.values[row], reference_rate(counters[row], 5, STEP), equal_nan=True)
+
+    def test_aggregation_and_vector_matching(self):
+        store = SeriesStore(0, STEP, 4)
+        for instance, job, resident, virtual in (('a', 'api', 50, 100), ('b', 'api', 90, 100), ('c', 'db', 10, 40)):
+            labels = {'instance': instance, 'job': job}
+            store.add({'__name__': 'resident', **labels}, [resident] * 4)
+            store.add({'__name__': 'virtual', **labels}, [virtual] * 4)
+
+        ratio = evaluate('resident / virtual * 100 > 60', store)
+        self.assertEqual([dict(key)['instance'] for key, row in zip(ratio.labels, ratio.values)
+                          if not np.isnan(row[-1])], ['b'])
+        by_job = evaluate('sum by (job) (resident)', store)
+        self.assertEqual({dict(key)['job']: row[0] for key, row in zip(by_job.labels, by_job.values)},
+                         {'api': 140, 'db': 10})
+        self.assertEqual(evaluate('max(virtual{job=~"a.*"})', store).values[0][0], 100)
+
+    def test_for_duration_separates_pending_and_firing(self):
+        store = SeriesStore(0, STEP, 30)
+        store.add({'__name__': 'queue', 'host': 'long'}, [0] * 20 + [80] * 10)
+        store.add({'__name__': 'queue', 'host': 'short'}, [0] * 27 + [80] * 3)
+        engine = RuleEngine([AlertRule('QueueDeep', 'queue > 50', for_seconds=300)])
+
+        states = {alert['labels']['host']: (alert['state'], alert['active_seconds']) for alert in engine.evaluate(store)}
+        self.assertEqual(states, {'long': ('firing', 540.0), 'short': ('pending', 120.0)})
+
+
+class TestBaselines(unittest.TestCase):
+    def test_ewma_matches_recurrence(self):
+        values = np.random.default_rng(3).normal(100, 5, size=(2, 500))
+        values[1, :40] = np.nan
+        values[1, 300:310] = np.nan
+        mean, variance = ewma(values, alpha=0.1)
+
+        for row in range(2):
+            series = values[row][~np.isnan(values[row])] if row == 0 else values[row, 40:]
+            m = s = None
+            previous = None
+            for value in series:
+                value = previous if np.isnan(value) else value
+                previous = value
+                m = value if m is None else 0.9 * m + 0.1 * value
+                s = value ** 2 if s is None else 0.9 * s + 0.1 * value ** 2
+            self.assertAlmostEqual(mean[row], m, places=9)
+            self.assertAlmostEqual(variance[row], s - m ** 2, places=6)
+
+    def test_flat_history_has_zero_spread(self):
+        stats = deviation(np.full((1, 100), 250.0))
+        self.assertEqual(stats['ewma_std'][0], 0)
+        self.assertEqual(stats['z_score'][0], 0)
+
+    def test_spike_and_seasonal_deviation(self):
+        days = 4
+        minutes = np.arange(days * DAY_STEPS)
+        # A busy period every day; series 1 has one unusually slow minute inside it
+        daily = 200 + 150 * (np.sin(2 * np.pi * minutes / DAY_STEPS) > 0.5)
+        noise = np.random.default_rng(5).normal(0, 5, size=len(minutes))
+        values = np.vstack([daily + noise, daily + noise])
+        at = 3 * DAY_STEPS + 300  # inside the busy period
+        values[1, at] = 900
+
+        self.assertAlmostEqual(seasonal_baseline(values, DAY_STEPS, at=at)[0], 350, delta=15)
+        stats = deviation(values, period_steps=DAY_STEPS, at=at)
+        self.assertLess(abs(stats['seasonal_ratio'][0] - 1), 0.1)
+        self.assertGreater(stats['seasonal_ratio'][1], 2)
+        self.assertGreater(stats['z_score'][1], 10)
+
+    @timing_test
+    def test_throughput_thousands_of_series(self):
+        series, steps = 2000, DAY_STEPS
+        counters = np.cumsum(np.random.default_rng(9).random((series, steps)), axis=1)
+        store = SeriesStore(0, STEP, steps)
+        for row in range(series):
+            store.add({'__name__': 'process_cpu_seconds_total', 'instance': f'host-{row}'}, counters[row])
+        engine = RuleEngine.load()
+
+        started = time.perf_counter()
+        engine.evaluate(store)
+        engine.baselines(store)
+        elapsed = time.perf_counter() - started
+        # All rules and baselines over a day of minute samples; well over a thousand series per second
+        self.assertLess(elapsed, series / 1000)
+
+
+class TestAnalyzerIntegration(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def analyze(self, series):
+        client = RangeClient(series)
+        analyzer = continuous_improvement.ContinuousImprovementAnalyzer(log_dir=self.workdir.name, prometheus=client)
+        analyzer.analyze_anomalies(now=1700000000)
+        analyzer.generate_optimization_recommendations()
+        return analyzer, client
+
+    def latency_series(self, latency):
+        # Request counters of a service answering 10 requests per step with these latencies
+        count = np.cumsum(np.full(len(latency), 10.0))
+        return {
+            'http_request_duration_milliseconds_sum': [({'job': 'api'}, np.cumsum(10.0 * latency))],
+            'http_request_duration_milliseconds_count': [({'job': 'api'}, count)]
+        }
+
+    def test_deviation_drives_recommendation(self):
+        steps = continuous_improvement.BASELINE_DAYS * DAY_STEPS + 1
+        latency = np.random.default_rng(2).normal(120, 4, size=steps)
+        normal, _ = self.analyze(self.latency_series(latency))
+        latency[-5:] = 400  # below the static 500 ms, far above this service's baseline
+        spiking, client = self.analyze(self.latency_series(latency))
+
+        recommendation = "Optimize backend response times by implementing caching"
+        self.assertNotIn(recommendation, normal.improvement_report['optimization_recommendations'])
+        self.assertIn(recommendation, spiking.improvement_report['optimization_recommendations'])
+        (response_time,) = spiking.improvement_report['anomalies']['response_time']
+        self.assertAlmostEqual(response_time['value'], 400)
+        self.assertIn('process_cpu_seconds_total', client.queries)
+
+    def test_static_threshold_without_history(self):
+        analyzer = continuous_improvement.ContinuousImprovementAnalyzer(log_dir=self.workdir.name)
+        analyzer.improvement_report['performance_metrics'] = {'database_query_time': 350}
+        analyzer.generate_optimization_recommendations()
+        self.assertIn("Review and optimize database query performance",
+                      analyzer.improvement_report['optimization_recommendations'])
+
+    def test_static_thresholds_without_numpy_or_yaml(self):
+        # A missing optional dependency makes the alert rules module fail to import
+        with mock.patch.dict(sys.modules, {'emrnext_ops.alert_rules': None}), mock.patch('builtins.print'):
+            analyzer, client = self.analyze({})
+        self.assertEqual(client.queries, [])
+        self.assertNotIn('alerts', analyzer.improvement_report)
+
+        analyzer.improvement_report['performance_metrics'] = {'response_time': 650}
+        analyzer.generate_optimization_recommendations()
+        self.assertIn("Optimize backend response times by implementing caching",
+                      analyzer.improvement_report['optimization_recommendations'])
+
+    def test_firing_rule_becomes_recommendation(self):
+        steps = continuous_improvement.BASELINE_DAYS * DAY_STEPS + 1
+        analyzer, _ = self.analyze({'appointment_queue_depth': [({'job': 'api'}, np.full(steps, 75.0))]})
+        (alert,) = [alert for alert in analyzer.improvement_report['alerts'] if alert['alert'] == 'HighAppointmentQueue']
+        self.assertEqual(alert['state'], 'firing')
+        self.assertIn("Resolve HighAppointmentQueue (High appointment queue depth), firing for 1 series",
+                      analyzer.improvement_report['optimization_recommendations'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from benchmarks.bench_entry_points import run_benchmarks
+from benchmarks.synthetic import build_log_tree, deploy_log_lines
+
+MEASUREMENTS = ('wall_s', 'user_s', 'sys_s', 'peak_rss_kb', 'read_syscalls', 'write_syscalls')
+
+
+class TestEntryPointBenchmark(unittest.TestCase):
+    def test_synthetic_tree(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            written = build_log_tree(log_dir, deploy_bytes=20000, error_logs=2, error_log_bytes=10000)
+            self.assertEqual(sorted(os.listdir(log_dir)), [
+                'deployment.log', 'deployment_metrics.json', 'performance_metrics.json',
+                'service-0.log', 'service-1.log'
+            ])
+            self.assertGreaterEqual(written, 40000)
+            with open(os.path.join(log_dir, 'deployment.log')) as log:
+                self.assertIn('Backend Version: 2.0.0', log.readline())
+
+        lines = deploy_log_lines()
+        self.assertTrue(any('[DEPLOY]' in next(lines) for _ in range(2000)))
+
+    def test_measures_entry_points_in_children(self):
+        results = run_benchmarks(['small'], ['deployment-readiness-report', 'system-health-checker'])
+
+        self.assertEqual([result['entry_point'] for result in results],
+                         ['deployment-readiness-report', 'system-health-checker'])
+        for result in results:
+            for measurement in MEASUREMENTS:
+                self.assertIsNotNone(result[measurement], measurement)
+            self.assertGreater(result['peak_rss_kb'], 0)
+            self.assertGreater(result['read_syscalls'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import time
+import unittest
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from emrnext_ops.check_registry import CheckRegistry, CheckScheduler
+
+
+def cpu_check(deps):
+    return sum(range(1000))
+
+
+class TestCheckScheduler(unittest.TestCase):
+    def test_independent_checks_run_in_parallel(self):
+        registry = CheckRegistry()
+        for name in ('database', 'queue', 'cache'):
+            registry.register(name, lambda deps: time.sleep(0.3) or 'ok')
+
+        started = time.perf_counter()
+        outcomes = CheckScheduler(registry).run()
+        self.assertLess(time.perf_counter() - started, 0.8)
+        self.assertTrue(all(outcome.ok for outcome in outcomes.values()))
+
+    def test_dependencies_receive_results_and_failures_propagate(self):
+        registry = CheckRegistry()
+        registry.register('dns', lambda deps: '10.0.0.1')
+        registry.register('database', lambda deps: f"connected to {deps['dns']}", depends_on=['dns'])
+        registry.register('broken', lambda deps: 1 / 0)
+        registry.register('replica', lambda deps: 'ok', depends_on=['broken'])
+
+        outcomes = CheckScheduler(registry).run()
+        self.assertEqual(outcomes['database'].result, 'connected to 10.0.0.1')
+        self.assertIn('ZeroDivisionError', outcomes['broken'].error)
+        self.assertTrue(outcomes['replica'].skipped)
+
+    def test_results_within_ttl_are_served_from_cache(self):
+        calls = []
+        registry = CheckRegistry()
+        registry.register('queue', lambda deps: calls.append(1) or len(calls), ttl=60)
+        scheduler = CheckScheduler(registry)
+
+        scheduler.run()
+        outcome = scheduler.run()['queue']
+        self.assertTrue(outcome.cached)
+        self.assertEqual((outcome.result, len(calls)), (1, 1))
+
+    def test_timeout(self):
+        registry = CheckRegistry()
+        registry.register('slow', lambda deps: time.sleep(2), timeout=0.2)
+        started = time.perf_counter()
+        outcome = CheckScheduler(registry).run()['slow']
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertIn('timed out', outcome.error)
+
+    def test_cpu_checks_run_in_process_pool(self):
+        registry = CheckRegistry()
+        registry.register('crunch', cpu_check, cost='cpu')
+        self.assertEqual(CheckScheduler(registry, cpu_workers=1).run()['crunch'].result, 499500)
+
+    def test_cycles_are_rejected(self):
+        registry = CheckRegistry()
+        registry.register('a', lambda deps: None, depends_on=['b'])
+        registry.register('b', lambda deps: None, depends_on=['a'])
+        with self.assertRaises(ValueError):
+            CheckScheduler(registry).run()
+
+
+class TestCriteria(unittest.TestCase):
+    def test_weighted_score(self):
+        registry = CheckRegistry()
+        registry.criterion('database_up', lambda report: report['database'] == 'up', weight=3)
+        registry.criterion('queue_short', lambda report: report['queue_depth'] < 50)
+        registry.criterion('missing_data', lambda report: report['absent'])
+
+        score, passed = registry.score({'database': 'up', 'queue_depth': 80})
+        self.assertEqual(score, 0.6)
+        self.assertEqual(passed, {'database_up': True, 'queue_short': False, 'missing_data': False})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from script_loader import load_script
+from emrnext_ops.error_index import ErrorIndex
+from emrnext_ops.error_scan import scan_error_logs, summarize
+
+continuous_improvement = load_script('continuous-improvement.py')
+
+
+def stamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class TestErrorScan(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.now = datetime.now().replace(microsecond=0)
+
+    def write(self, name, lines):
+        path = os.path.join(self.workdir.name, name)
+        with open(path, 'w') as f:
+            f.writelines(line + '\n' for line in lines)
+        return path
+
+    def test_window_levels_and_sources(self):
+        recent = stamp(self.now - timedelta(hours=1))
+        stale = stamp(self.now - timedelta(hours=30))
+        api = self.write('api.log', [
+            f"{recent} ERROR request failed",
+            f"{recent} CRITICAL database unavailable",
+            f"{recent} INFO request ok",
+            f"{stale} ERROR old failure",
+            "ERROR line without timestamp"
+        ])
+        worker = self.write('worker.log', [f"{recent} ERROR job crashed"])
+
+        summary = summarize(scan_error_logs([api, worker], cutoff=self.now - timedelta(hours=24)))
+
+        self.assertEqual(summary['total'], 3)
+        self.assertEqual(summary['by_level'], {'ERROR': 2, 'CRITICAL': 1})
+        self.assertEqual(summary['by_source'], {'api.log': 2, 'worker.log': 1})
+
+    def test_byte_ranges_match_single_pass(self):
+        lines = [f"{stamp(self.now - timedelta(minutes=i))} {'ERROR' if i % 3 else 'INFO'} event {i}"
+                 for i in range(2000)]
+        path = self.write('big.log', lines)
+
+        single = scan_error_logs([path], max_workers=1)
+        split = scan_error_logs([path], max_workers=4, chunk_size=1000)
+
+        self.assertEqual(split, single)
+        self.assertEqual(sum(single.values()), sum(1 for i in range(2000) if i % 3))
+
+    def test_incremental_scan_merges_appended_lines(self):
+        recent = stamp(self.now - timedelta(minutes=5))
+        path = self.write('api.log', [f"{recent} ERROR first"])
+        pos_file = os.path.join(self.workdir.name, 'errors.pos')
+
+        analyzer = continuous_improvement.ContinuousImprovementAnalyzer(pos_file=pos_file, log_dir=self.workdir.name)
+        analyzer.analyze_error_logs()
+        self.assertEqual(analyzer.improvement_report['error_analysis']['total'], 1)
+
+        with open(path, 'a') as f:
+            f.write(f"{recent} CRITICAL second\n")
+        analyzer = continuous_improvement.ContinuousImprovementAnalyzer(pos_file=pos_file, log_dir=self.workdir.name)
+        analyzer.analyze_error_logs()
+        self.assertEqual(analyzer.improvement_report['error_analysis']['by_level'], {'ERROR': 1, 'CRITICAL': 1})
+
+    def test_only_log_files_are_scanned(self):
+        for name in ('api.log', 'api.log.1', 'api.log.2.gz', 'api.log.tmp', 'improvement_report.json', 'notes.txt'):
+            self.write(name, [f"{stamp(self.now)} ERROR in {name}"])
+        analyzer = continuous_improvement.ContinuousImprovementAnalyzer(log_dir=self.workdir.name)
+        self.assertEqual([os.path.basename(path) for path in analyzer._error_log_paths()], ['api.log', 'api.log.1'])
+
+
+class TestErrorIndex(unittest.TestCase):
+    def test_windowed_counts_by_source(self):
+        index = ErrorIndex(retention_minutes=120)
+        index.add({(1000, 'ERROR', 'api.log'): 3, (1050, 'CRITICAL', 'db.log'): 1, (1059, 'ERROR', 'api.log'): 2})
+
+        self.assertEqual(index.count(5, now=1059), {'api.log': 2})
+        self.assertEqual(index.count(60, now=1059), {'api.log': 5, 'db.log': 1})
+        self.assertEqual(index.count(60, now=1059, severity='CRITICAL'), {'db.log': 1})
+        self.assertAlmostEqual(index.rate(60, now=1059), 0.1)
+
+    def test_ring_wraparound_expires_old_minutes(self):
+        index = ErrorIndex(retention_minutes=60)
+        index.add({(10, 'ERROR', 'api.log'): 5})
+        index.add({(65, 'ERROR', 'api.log'): 1})
+
+        self.assertEqual(index.count(60, now=65), {'api.log': 6})
+        self.assertEqual(index.count(50, now=65), {'api.log': 1})
+        index.add({(200, 'ERROR', 'api.log'): 2})
+        self.assertEqual(index.count(60, now=200), {'api.log': 2})
+
+    def test_persistence_and_replace_window(self):
+        path = os.path.join(tempfile.mkdtemp(), 'errors.bin')
+        index = ErrorIndex(retention_minutes=120)
+        index.add({(500, 'ERROR', 'api.log'): 4})
+        index.save(path)
+
+        loaded = ErrorIndex.load(path, retention_minutes=120)
+        self.assertEqual(loaded.count(30, now=500), {'api.log': 4})
+        loaded.replace_window(490, 510, {(505, 'ERROR', 'api.log'): 1})
+        self.assertEqual(loaded.count(30, now=510), {'api.log': 1})
+
+    def test_trend_against_baseline(self):
+        index = ErrorIndex(retention_minutes=24 * 60)
+        index.add({(minute, 'ERROR', 'api.log'): 1 for minute in range(1000, 1240, 10)})
+        index.add({(minute, 'ERROR', 'api.log'): 1 for minute in range(1240, 1300)})
+        self.assertGreater(index.trend(60, 240, now=1299), 5)
+
+
+
+class TestMain(unittest.TestCase):
+    def prometheus_used(self, environ, argv=()):
+        with mock.patch.dict(os.environ, environ, clear=True), \
+                mock.patch.object(continuous_improvement, 'ContinuousImprovementAnalyzer') as analyzer, \
+                mock.patch('builtins.print'):
+            analyzer.return_value.generate_improvement_report.return_value = {}
+            continuous_improvement.main(list(argv))
+        return analyzer.call_args.kwargs['prometheus']
+
+    def test_prometheus_is_opt_in(self):
+        self.assertIsNone(self.prometheus_used({}))
+        self.assertEqual(self.prometheus_used({'PROMETHEUS_URL': 'http://prometheus:9090'}).base_url,
+                         'http://prometheus:9090')
+        self.assertIsNotNone(self.prometheus_used({}, ['--prometheus-url', 'http://prometheus:9090']))
+
+
+if __name__ == '__main__':
+    unittest.main()
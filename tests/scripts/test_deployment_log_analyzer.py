@@ -0,0 +1,139 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from script_loader import load_script
+from emrnext_ops.deploy_log import parse_events, read_lines, scan_buffer, scan_log
+
+log_analyzer = load_script('deployment-log-analyzer.py')
+
+SAMPLE_LOG = """\
+2024-01-01 10:00:00 INFO: deployment starting
+2024-01-01 10:00:00 [DEPLOY] build - Started at 2024-01-01 10:00:00 - Completed at 2024-01-01 10:02:30
+2024-01-01 10:02:31 ERROR: migration 42 failed
+2024-01-01 10:02:32 [DEPLOY] migrate - Started at 2024-01-01 10:02:32 - Completed at 2024-01-01 10:03:32
+"""
+
+
+class TestDeploymentAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def write_log(self, content):
+        path = os.path.join(self.workdir.name, 'deployment.log')
+        with open(path, 'w') as log_file:
+            log_file.write(content)
+        return path
+
+    def test_constructing_leaves_logging_alone(self):
+        import logging
+        handlers = list(logging.getLogger().handlers)
+        log_analyzer.DeploymentAnalyzer(self.write_log(SAMPLE_LOG)).parse_deployment_log()
+        self.assertEqual(logging.getLogger().handlers, handlers)
+
+    def test_parse_stages_and_errors(self):
+        analyzer = log_analyzer.DeploymentAnalyzer(self.write_log(SAMPLE_LOG))
+        metrics = analyzer.parse_deployment_log()
+
+        self.assertEqual(metrics['stages']['build'], {
+            'start': '2024-01-01 10:00:00',
+            'end': '2024-01-01 10:02:30',
+            'duration': 150.0
+        })
+        self.assertEqual(metrics['stages']['migrate']['duration'], 60.0)
+        self.assertEqual(metrics['errors'], ['migration 42 failed'])
+        self.assertEqual(metrics['status'], 'Partial Failure')
+
+    def test_error_samples_are_capped(self):
+        content = ''.join(f"ERROR: failure {i}\n" for i in range(500))
+        analyzer = log_analyzer.DeploymentAnalyzer(self.write_log(content))
+        metrics = analyzer.parse_deployment_log()
+
+        self.assertEqual(metrics['error_count'], 500)
+        self.assertEqual(len(metrics['errors']), 100)
+        self.assertEqual(metrics['status'], 'Critical Failure')
+
+    def test_mapped_scan_matches_line_parser(self):
+        path = self.write_log(SAMPLE_LOG + "trailing ERROR: no newline")
+        self.assertEqual(list(scan_log(path)), list(parse_events(read_lines(path))))
+
+    def test_scans_match_line_parser_on_mixed_lines(self):
+        content = SAMPLE_LOG + (
+            "[DEPLOY] smoke - Started at 10:04:00 - Completed at 10:05:00 ERROR: 2 checks failed\n"
+            "ERROR: rollback [DEPLOY] rollback - Started at 10:06:00 - Completed at 10:07:00\n"
+            "[DEPLOY] malformed stage line ERROR: unparsable stage\n"
+            "ERROR: first ERROR: second\n"
+            "[DEPLOY] verify - Started at 10:08:00 - Completed at 10:09:00  \n"
+        )
+        path = self.write_log(content)
+        expected = list(parse_events(read_lines(path)))
+        self.assertEqual([event[0] for event in expected],
+                         ['stage', 'error', 'stage', 'stage', 'stage', 'error', 'error', 'stage'])
+
+        self.assertEqual(list(scan_log(path)), expected)
+        self.assertEqual(list(scan_buffer(content.encode())), expected)
+        gz_path = path + '.1.gz'
+        with gzip.open(gz_path, 'wt') as log_file:
+            log_file.write(content)
+        self.assertEqual(list(scan_log(gz_path)), expected)
+
+    def test_abandoned_scan_releases_the_mapping(self):
+        events = scan_log(self.write_log(SAMPLE_LOG))
+        self.assertEqual(next(events)[0], 'stage')
+        events.close()
+
+    def test_gzip_rotated_log(self):
+        path = os.path.join(self.workdir.name, 'deployment.log.1.gz')
+        with gzip.open(path, 'wt') as log_file:
+            log_file.write(SAMPLE_LOG)
+        metrics = log_analyzer.DeploymentAnalyzer(path).parse_deployment_log()
+        self.assertEqual(set(metrics['stages']), {'build', 'migrate'})
+        self.assertEqual(metrics['error_count'], 1)
+
+    def test_report_flags_stage_regression(self):
+        history_path = os.path.join(self.workdir.name, 'stage_history.json')
+        history_log = ''.join(
+            f"[DEPLOY] build - Started at 2023-12-{day:02d} 10:00:00 - Completed at 2023-12-{day:02d} 10:01:00\n"
+            for day in range(1, 21)
+        )
+        log_analyzer.DeploymentAnalyzer(self.write_log(history_log), history_path=history_path).parse_deployment_log()
+
+        analyzer = log_analyzer.DeploymentAnalyzer(self.write_log(SAMPLE_LOG), history_path=history_path)
+        metrics = analyzer.parse_deployment_log()
+        report = analyzer.generate_deployment_report(os.path.join(self.workdir.name, 'report.md'))
+
+        self.assertEqual(metrics['stage_percentiles']['build']['runs'], 21)
+        self.assertEqual(list(metrics['stage_regressions']), ['build'])
+        self.assertIn('| build | 150.0 (regression) |', report)
+        self.assertIn('Investigate build: took 150.0s, above its historical p95 of 60.0s over 20 runs', report)
+
+    def test_incremental_status_follows_the_latest_deployment(self):
+        path = self.write_log(SAMPLE_LOG + "ERROR: rollback\nERROR: health check failed\n")
+
+        def analyze():
+            analyzer = log_analyzer.DeploymentAnalyzer(path, pos_file=os.path.join(self.workdir.name, 'pos'))
+            return analyzer.parse_deployment_log()
+
+        self.assertEqual(analyze()['status'], 'Critical Failure')
+        with open(path, 'a') as log_file:
+            log_file.write("2024-01-02 10:00:00 [DEPLOY] build - Started at 2024-01-02 10:00:00"
+                           " - Completed at 2024-01-02 10:01:00\n")
+        self.assertEqual(analyze()['status'], 'Success')
+        # Nothing appended: still the latest deployment's status
+        metrics = analyze()
+        self.assertEqual((metrics['status'], metrics['error_count']), ('Success', 3))
+
+        # A truncated log starts over without the old errors
+        self.write_log("ERROR: disk full\n")
+        metrics = analyze()
+        self.assertEqual((metrics['status'], metrics['errors']), ('Partial Failure', ['disk full']))
+
+    def test_missing_log(self):
+        analyzer = log_analyzer.DeploymentAnalyzer(os.path.join(self.workdir.name, 'absent.log'))
+        self.assertEqual(analyzer.parse_deployment_log()['status'], 'Pending')
+
+
+if __name__ == '__main__':
+    unittest.main()
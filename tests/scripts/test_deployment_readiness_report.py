@@ -0,0 +1,168 @@
+import contextlib
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from script_loader import load_script
+from emrnext_ops.readiness_archive import AnalysisCache, analyze_archive, find_deployments, summarize
+from emrnext_ops.report_store import ReportStore
+from emrnext_ops.telemetry import Telemetry
+
+readiness = load_script('deployment-readiness-report.py')
+
+SAMPLE_LOG = """\
+2024-01-01 10:00:00 INFO: Backend Version: 2.4.1
+2024-01-01 10:00:01 INFO: Frontend Version: 1.9.0
+2024-01-01 10:05:00 INFO: Backend Version: 2.4.2
+"""
+
+
+class TestDeploymentReadinessReport(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def test_versions_use_first_match(self):
+        path = os.path.join(self.workdir.name, 'deployment.log')
+        with open(path, 'w') as f:
+            f.write(SAMPLE_LOG)
+
+        report = readiness.DeploymentReadinessReport()
+        report.load_deployment_logs(path)
+        components = report.report['system_components']
+
+        self.assertEqual(components['backend']['version'], '2.4.1')
+        self.assertEqual(components['frontend']['version'], '1.9.0')
+        self.assertEqual(components['database']['version'], 'Unknown')
+
+    def test_versions_from_gzip_log(self):
+        path = os.path.join(self.workdir.name, 'deployment.log.gz')
+        with gzip.open(path, 'wt') as f:
+            f.write(SAMPLE_LOG)
+
+        report = readiness.DeploymentReadinessReport()
+        report.load_deployment_logs(path)
+        self.assertEqual(report.report['system_components']['backend']['version'], '2.4.1')
+
+
+def stage_metrics(failed=()):
+    start = datetime(2024, 3, 1, 12, 0, 0)
+    stages = {}
+    for index, stage in enumerate(('build', 'migrate', 'deploy')):
+        stages[stage] = {
+            "start": (start + timedelta(minutes=index)).isoformat(),
+            "end": (start + timedelta(minutes=index + 1)).isoformat(),
+            "status": "Failed" if stage in failed else "Success"
+        }
+    return {"stages": stages}
+
+
+class TestReadinessArchive(unittest.TestCase):
+    # (deployment id, backend version, failed stages); the last one rolled back to 2.4.1
+    DEPLOYMENTS = [
+        ('2024-03-01', '2.4.0', ()),
+        ('2024-03-02', '2.4.1', ('migrate',)),
+        ('2024-03-03', '2.4.1', ()),
+        ('2024-03-04', '2.5.0', ('migrate', 'deploy')),
+        ('2024-03-05', '2.4.1', ())
+    ]
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.archive = os.path.join(self.workdir.name, 'archive')
+        os.makedirs(self.archive)
+        for index, (deployment_id, backend, failed) in enumerate(self.DEPLOYMENTS):
+            log = f"INFO: Backend Version: {backend}\nINFO: Frontend Version: 1.9.0\n"
+            if index % 2:
+                # Flat files, gzip-rotated log
+                with gzip.open(os.path.join(self.archive, f'deployment_{deployment_id}.log.gz'), 'wt') as f:
+                    f.write(log)
+                metrics_path = os.path.join(self.archive, f'deployment_metrics_{deployment_id}.json')
+            else:
+                os.makedirs(os.path.join(self.archive, deployment_id))
+                with open(os.path.join(self.archive, deployment_id, 'deployment.log'), 'w') as f:
+                    f.write(log)
+                metrics_path = os.path.join(self.archive, deployment_id, 'deployment_metrics.json')
+            with open(metrics_path, 'w') as f:
+                json.dump(stage_metrics(failed), f)
+        self.cache_path = os.path.join(self.workdir.name, 'cache.json')
+
+    def analyze(self, max_workers=1):
+        telemetry = Telemetry('test')
+        analyses = analyze_archive(self.archive, AnalysisCache(self.cache_path), max_workers, telemetry)
+        return analyses, telemetry.counters
+
+    def test_both_layouts_are_found(self):
+        deployments = find_deployments(self.archive)
+        self.assertEqual(list(deployments), [deployment_id for deployment_id, _, _ in self.DEPLOYMENTS])
+        self.assertTrue(all(set(entry) == {'log', 'metrics'} for entry in deployments.values()))
+
+    def test_cross_deployment_summary(self):
+        analyses, counters = self.analyze(max_workers=2)
+        summary = summarize(analyses)
+
+        self.assertEqual(counters['files_read'], 10)
+        self.assertEqual(summary['success_rate'], 0.6)
+        self.assertEqual(summary['stage_failure_rates']['migrate'], {'runs': 5, 'failures': 2, 'failure_rate': 0.4})
+        self.assertEqual(list(summary['stage_failure_rates'])[0], 'migrate')
+        backend = summary['version_drift']['backend']
+        self.assertEqual((backend['latest'], backend['current'], backend['version_changes']), ('2.5.0', '2.4.1', 3))
+        self.assertEqual(backend['deployments_behind_latest'], 4)
+        self.assertEqual(summary['version_drift']['frontend']['distinct_versions'], 1)
+        self.assertIn("Backend was last deployed at 2.4.1, behind 2.5.0", summary['recommendations'])
+
+    def test_unchanged_files_are_not_reparsed(self):
+        first, _ = self.analyze()
+        second, counters = self.analyze()
+        self.assertEqual(first, second)
+        self.assertEqual((counters['files_read'], counters['files_cached']), (0, 10))
+
+        with open(os.path.join(self.archive, '2024-03-03', 'deployment_metrics.json'), 'w') as f:
+            json.dump(stage_metrics(failed=('build',)), f)
+        third, counters = self.analyze()
+        self.assertEqual((counters['files_read'], counters['files_cached']), (1, 9))
+        self.assertEqual(third['2024-03-03']['metrics']['failed_stages'], 1)
+
+    def test_deployments_in_the_order_they_ran(self):
+        archive = os.path.join(self.workdir.name, 'numbered')
+        deployments = (('deploy-10', '2.5.0', 10), ('deploy-9', '2.4.0', 9), ('deploy-11', '2.6.0', None))
+        for deployment_id, backend, day in deployments:
+            os.makedirs(os.path.join(archive, deployment_id))
+            log_path = os.path.join(archive, deployment_id, 'deployment.log')
+            with open(log_path, 'w') as f:
+                f.write(f"INFO: Backend Version: {backend}\n")
+            if day is None:
+                # No metrics: the log's modification time places it
+                os.utime(log_path, (datetime(2024, 3, 11).timestamp(),) * 2)
+                continue
+            start = datetime(2024, 3, day, 12)
+            with open(os.path.join(archive, deployment_id, 'deployment_metrics.json'), 'w') as f:
+                json.dump({"stages": {"build": {"start": start.isoformat(), "status": "Success",
+                                                "end": (start + timedelta(minutes=5)).isoformat()}}}, f)
+
+        analyses = analyze_archive(archive, max_workers=1)
+        self.assertEqual(list(analyses), ['deploy-9', 'deploy-10', 'deploy-11'])
+        backend = summarize(analyses)['version_drift']['backend']
+        self.assertEqual((backend['current'], backend['version_changes']), ('2.6.0', 2))
+
+    def test_single_report_counts_stages(self):
+        report = readiness.DeploymentReadinessReport(self.workdir.name)
+        report.analyze_metrics(stage_metrics(failed=('deploy',)))
+        self.assertEqual(report.report['deployment_metrics'],
+                         {'total_deployment_time': 180.0, 'successful_stages': 2, 'failed_stages': 1})
+
+    def test_command_line_batch_mode(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            readiness.main(['--archive', self.archive, '--log-dir', self.workdir.name, '--workers', '1'])
+        (_, report), = ReportStore(os.path.join(self.workdir.name, 'reports')).last('readiness_archive', 1)
+        self.assertEqual(report['summary']['deployments'], 5)
+        self.assertTrue(os.path.exists(os.path.join(self.workdir.name, 'readiness_cache.json')))
+
+
+if __name__ == '__main__':
+    unittest.main()
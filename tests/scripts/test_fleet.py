@@ -0,0 +1,176 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from script_loader import load_script
+from benchmarks.stubs import StubHTTPServer
+from emrnext_ops.fleet import FleetHealthCheck, FleetProber, Target, load_inventory, read_manifest
+from emrnext_ops.loader import SCRIPTS_DIR
+
+health_checker = load_script('system-health-checker.py')
+
+MANIFEST = os.path.join(os.path.dirname(SCRIPTS_DIR), 'k8s', 'production', 'blue-green-deployment.yaml')
+
+
+class TestInventory(unittest.TestCase):
+    def test_blue_green_manifest(self):
+        layout = read_manifest(MANIFEST)
+        self.assertEqual(layout['live_color'], 'blue')
+        self.assertEqual(layout['deployments']['emrnext-blue'],
+                         {'color': 'blue', 'replicas': 3, 'path': '/health', 'port': 80})
+
+    def test_targets_resolved_through_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'inventory.json')
+            with open(path, 'w') as f:
+                json.dump({'manifest': os.path.relpath(MANIFEST, tmp), 'targets': [
+                    {'name': 'blue-0', 'address': '10.1.0.11', 'deployment': 'emrnext-blue'},
+                    {'name': 'edge', 'url': 'https://emrnext.railway.app/api/health', 'color': 'green'}
+                ]}, f)
+            targets, layout = load_inventory(path)
+
+        self.assertEqual([(t.name, t.url, t.color, t.host) for t in targets], [
+            ('blue-0', 'http://10.1.0.11:80/health', 'blue', '10.1.0.11:80'),
+            ('edge', 'https://emrnext.railway.app/api/health', 'green', 'emrnext.railway.app:443')
+        ])
+        self.assertEqual(layout['live_color'], 'blue')
+
+    def test_ipv6_addresses(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'inventory.json')
+            with open(path, 'w') as f:
+                json.dump({'targets': [
+                    {'name': 'bare', 'address': 'fd00::11'},
+                    {'name': 'bracketed', 'address': '[fd00::12]'},
+                    {'name': 'with-port', 'address': '[fd00::13]:8080'},
+                    {'name': 'v4-with-port', 'address': '10.1.0.14:8080'}
+                ]}, f)
+            targets, _ = load_inventory(path)
+
+        self.assertEqual([(t.url, t.host) for t in targets], [
+            ('http://[fd00::11]:80/health', '[fd00::11]:80'),
+            ('http://[fd00::12]:80/health', '[fd00::12]:80'),
+            ('http://[fd00::13]:8080/health', '[fd00::13]:8080'),
+            ('http://10.1.0.14:8080/health', '10.1.0.14:8080')
+        ])
+
+
+class TestFleetProber(unittest.TestCase):
+    def test_hundreds_of_targets_fan_out(self):
+        with contextlib.ExitStack() as stack:
+            servers = [stack.enter_context(StubHTTPServer(delay=0.1)) for _ in range(10)]
+            targets = [Target(f'replica-{i}', f'{servers[i % 10].url}/health') for i in range(200)]
+            prober = FleetProber(concurrency=100, per_host_rate=100, per_host_burst=20, jitter=0.2, seed=1)
+            started = time.perf_counter()
+            results = prober.run(targets)
+            elapsed = time.perf_counter() - started
+
+        # 200 probes of 100 ms each would take 20 s one after another
+        self.assertLess(elapsed, 3)
+        self.assertEqual({result.status_code for result in results.values()}, {200})
+        self.assertEqual(sum(len(server.received) for server in servers), 200)
+
+    def test_per_host_rate_limit(self):
+        with StubHTTPServer() as server:
+            targets = [Target(f't{i}', f'{server.url}/health') for i in range(6)]
+            started = time.perf_counter()
+            FleetProber(per_host_rate=10, per_host_burst=1, jitter=0).run(targets)
+            elapsed = time.perf_counter() - started
+        # Five tokens refilled at 10 per second
+        self.assertGreaterEqual(elapsed, 0.45)
+
+    def test_deadline_cancels_slow_probes(self):
+        with StubHTTPServer(delay=2) as server:
+            started = time.perf_counter()
+            results = FleetProber(jitter=0, deadline=0.3).run([Target('slow', server.url)])
+            elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, 1)
+        self.assertIsInstance(results['slow'], TimeoutError)
+
+    def test_circuit_breaker_skips_dead_host_across_runs(self):
+        dead = [Target(f'dead-{i}', 'http://127.0.0.1:1/health') for i in range(5)]
+        with tempfile.TemporaryDirectory() as tmp:
+            state = os.path.join(tmp, 'breakers.json')
+            prober = FleetProber(concurrency=1, per_host_rate=1000, per_host_burst=10, jitter=0,
+                                 failure_threshold=2, cooldown=0.3)
+            results = prober.run(dead)
+            prober.save_state(state)
+            outcomes = [type(results[target.name]).__name__ for target in dead]
+            self.assertEqual(outcomes, ['ProbeResult'] * 2 + ['CircuitOpenError'] * 3)
+
+            # A fresh prober (the next cron run) still skips the host until the cooldown passes
+            later = FleetProber(concurrency=1, per_host_rate=1000, per_host_burst=10, jitter=0,
+                                 failure_threshold=2, cooldown=0.3)
+            later.load_state(state)
+            self.assertTrue(all(type(r).__name__ == 'CircuitOpenError' for r in later.run(dead).values()))
+            time.sleep(0.35)
+            trial = later.run(dead)
+        self.assertEqual([type(trial[target.name]).__name__ for target in dead],
+                         ['ProbeResult'] + ['CircuitOpenError'] * 4)
+        self.assertEqual(later.breakers['127.0.0.1:1'].state, 'open')
+
+
+class TestFleetReport(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def test_color_rollups(self):
+        routes = {'/health': (200, b'ok'), '/sick': (503, b'down')}
+        with StubHTTPServer(routes) as blue, StubHTTPServer(routes) as green:
+            targets = [
+                Target('blue-0', f'{blue.url}/health', 'blue', 'emrnext-blue'),
+                Target('blue-1', f'{blue.url}/sick', 'blue', 'emrnext-blue'),
+                Target('green-0', f'{green.url}/health', 'green'),
+                Target('green-1', f'{green.url}/health', 'green')
+            ]
+            check = FleetHealthCheck(targets, read_manifest(MANIFEST), FleetProber(jitter=0),
+                                     state_path=os.path.join(self.workdir.name, 'breakers.json'))
+            check.report_dir = self.workdir.name
+            report = check.generate_report()
+
+        self.assertEqual(report['targets']['blue-1']['status'], 'UNHEALTHY')
+        blue_rollup = report['colors']['blue']
+        # Three replicas expected, one healthy answer
+        self.assertEqual((blue_rollup['expected_replicas'], blue_rollup['health_score']), (3, 0.333))
+        self.assertTrue(blue_rollup['live'])
+        self.assertEqual(report['colors']['green']['health'], 'EXCELLENT')
+        self.assertFalse(report['colors']['green']['live'])
+        self.assertEqual(report['fleet']['overall_health'], 'NEEDS_ATTENTION')
+        self.assertEqual(report['fleet']['statuses'], {'HEALTHY': 3, 'UNHEALTHY': 1})
+        self.assertIsNotNone(report['fleet']['latency_ms']['p95'])
+
+    def test_latency_rollup_skips_unanswered_probes(self):
+        answered = {"status": "HEALTHY", "response_code": 200, "latency": {"total": 20.0}}
+        refused = {"status": "UNREACHABLE", "response_code": None, "latency": {"total": 0.5}}
+        rollup = FleetHealthCheck([])._rollup([answered, refused, refused])
+        self.assertEqual(rollup['latency_ms']['max'], 20.0)
+        self.assertIsNone(FleetHealthCheck([])._rollup([refused])['latency_ms'])
+
+    def test_command_line_fan_out(self):
+        with StubHTTPServer() as server:
+            inventory = os.path.join(self.workdir.name, 'inventory.json')
+            with open(inventory, 'w') as f:
+                json.dump({'targets': [{'name': 'a', 'url': f'{server.url}/health', 'color': 'blue'}]}, f)
+            with mock.patch.object(health_checker.SystemHealthChecker, 'report_dir', self.workdir.name), \
+                    contextlib.redirect_stdout(open(os.devnull, 'w')):
+                health_checker.main(['--inventory', inventory, '--deadline', '5'])
+
+        from emrnext_ops.report_store import ReportStore
+        (_, report), = ReportStore(os.path.join(self.workdir.name, 'reports')).last('fleet', 1)
+        self.assertEqual(report['fleet']['overall_health'], 'EXCELLENT')
+        self.assertTrue(os.path.exists(os.path.join(self.workdir.name, 'fleet_breakers.json')))
+
+    def test_inventory_rejected_in_daemon_mode(self):
+        with contextlib.redirect_stderr(io.StringIO()) as stderr, self.assertRaises(SystemExit):
+            health_checker.main(['--daemon', '--inventory', 'inventory.yml'])
+        self.assertIn('--inventory cannot be combined with --daemon', stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
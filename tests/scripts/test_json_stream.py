@@ -0,0 +1,163 @@
+import io
+import json
+import math
+import os
+import random
+import time
+import tempfile
+import tracemalloc
+import unittest
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from script_loader import timing_test
+from emrnext_ops.json_stream import METRICS_PATHS, read_selected, read_stream
+from emrnext_ops.quantiles import NUMPY_BATCH, DDSketch
+
+STAGES = {
+    "build": {"start": "2024-03-01T12:00:00", "end": "2024-03-01T12:05:00", "status": "Success"},
+    "deploy": {"start": "2024-03-01T12:05:00", "end": "2024-03-01T12:09:00", "status": "Failed"}
+}
+
+
+def large_document(samples):
+    # Selected keys around an unselected block much larger than the read chunk
+    rng = random.Random(4)
+    return {
+        "meta": {"note": "brackets ]}{[ and \"escaped\" quotes \\", "nested": [[1, {"a": "]"}], {}]},
+        "response_time": [round(rng.uniform(50, 500), 3) for _ in range(samples)],
+        "requests": [{"path": f"/api/{i}", "tags": ["x", {"y": [i, 1e-3]}]} for i in range(samples)],
+        "database_query_time": 87.5,
+        "error_rate": 0.4,
+        "stages": STAGES
+    }
+
+
+def measure_peak(function, *args, **kwargs):
+    # A first large batch imports numpy when installed; keep that out of the peak
+    DDSketch().add_many([1.0] * NUMPY_BATCH)
+    tracemalloc.start()
+    try:
+        result = function(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def without_means(selection):
+    # Means are summed batch by batch, so they agree only to rounding between readers
+    selection = json.loads(json.dumps(selection))
+    means = [selection.pop('response_time', None), selection['response_time_samples'].pop('mean')]
+    return selection, means
+
+
+class TestReadSelected(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.workdir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def assertSameSelection(self, first, second):
+        (first, first_means), (second, second_means) = without_means(first), without_means(second)
+        self.assertEqual(first, second)
+        for first_mean, second_mean in zip(first_means, second_means):
+            self.assertAlmostEqual(first_mean, second_mean, places=9)
+
+    def test_stream_matches_accelerated_path(self):
+        path = self.write('performance_metrics.json', json.dumps(large_document(2000)))
+        fast = read_selected(path, METRICS_PATHS, accelerated=True)
+        self.assertSameSelection(read_selected(path, METRICS_PATHS, accelerated=False), fast)
+        # Every value and number split across tiny chunks
+        with open(path, 'rb') as f:
+            self.assertSameSelection(read_stream(f, METRICS_PATHS, chunk_size=7), fast)
+
+        self.assertEqual(set(fast), {'response_time', 'response_time_samples', 'database_query_time', 'stages'})
+        self.assertEqual(fast['database_query_time'], 87.5)
+        self.assertEqual(fast['stages'], STAGES)
+        samples = fast['response_time_samples']
+        self.assertEqual(samples['count'], 2000)
+        self.assertAlmostEqual(fast['response_time'], samples['mean'])
+        self.assertLessEqual(samples['min'], samples['p50'])
+        self.assertLessEqual(samples['p95'], samples['max'])
+
+    def test_ndjson_samples_aggregate_per_key(self):
+        lines = [json.dumps({"ts": i, "response_time": 100 + i, "text": "é ünïcode"}) for i in range(101)]
+        path = self.write('metrics.ndjson', '\n'.join(lines) + '\n')
+        for accelerated in (True, False):
+            result = read_selected(path, ('response_time',), accelerated=accelerated)
+            self.assertEqual(result['response_time'], 150)
+            self.assertEqual(result['response_time_samples']['count'], 101)
+            self.assertEqual((result['response_time_samples']['min'], result['response_time_samples']['max']),
+                             (100, 200))
+
+    def test_numbers_mixed_with_other_elements(self):
+        data = b'{"response_time": [1, 2.5 , -3,4E2,\n 0, {"ms": [1]}, 7, 1e-2]}'
+        for chunk_size in (3, 1024):
+            result = read_stream(io.BytesIO(data), ('response_time',), chunk_size=chunk_size)
+            samples = result['response_time_samples']
+            self.assertEqual((samples['count'], samples['min'], samples['max']), (7, -3, 400))
+            self.assertAlmostEqual(result['response_time'], 407.51 / 7)
+
+    def test_buffer_source_and_wildcard_index(self):
+        data = json.dumps({"runs": [{"ms": 3}, {"ms": 5}], "ms": "ignored"}).encode()
+        self.assertEqual(read_selected(data, ('runs.*.ms',), accelerated=False),
+                         {"runs": {"0": {"ms": 3}, "1": {"ms": 5}}})
+
+    def test_malformed_input_raises_value_error(self):
+        for text in ('', '{"response_time": [1, 2', '{"stages": {"a": 1,}}', '{"x": [1, 2}',
+                     '{"response_time": [1, 2 3, 4]}', '{"response_time": [1,, 2]}'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                read_selected(text.encode(), METRICS_PATHS, accelerated=False)
+
+
+class TestLargeFiles(unittest.TestCase):
+    SELECTED = 1000000
+    UNSELECTED = 2000000
+
+    @classmethod
+    def setUpClass(cls):
+        # Tens of MB: flat arrays of latencies, one selected, and objects with strings
+        cls.workdir = tempfile.TemporaryDirectory()
+        rng = random.Random(8)
+        cls.latencies = [round(rng.uniform(1, 999), 1) for _ in range(cls.SELECTED)]
+        skipped = ', '.join(str(round(rng.uniform(1, 999), 1)) for _ in range(cls.UNSELECTED))
+        requests = json.dumps(large_document(20000)['requests'])
+        cls.path = os.path.join(cls.workdir.name, 'performance_metrics.json')
+        with open(cls.path, 'w') as f:
+            f.write(f'{{"request_latencies": [{skipped}], "requests": {requests}, '
+                    f'"response_time": {json.dumps(cls.latencies)}, "database_query_time": 87.5, '
+                    f'"stages": {json.dumps(STAGES)}}}')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.workdir.cleanup()
+
+    def test_peak_memory_independent_of_size(self):
+        self.assertGreater(os.path.getsize(self.path), 20 * 1000 * 1000)
+        result, peak = measure_peak(read_selected, self.path, METRICS_PATHS, accelerated=False)
+
+        # A few read chunks, however large the arrays
+        self.assertLess(peak, 8 * 1024 * 1024)
+        self.assertEqual(result['response_time_samples']['count'], self.SELECTED)
+        self.assertAlmostEqual(result['response_time'], math.fsum(self.latencies) / self.SELECTED, places=6)
+        self.assertEqual(result['stages'], STAGES)
+
+    @timing_test
+    def test_streaming_keeps_pace_with_json_load(self):
+        started = time.perf_counter()
+        with open(self.path) as f:
+            json.load(f)
+        loaded = time.perf_counter() - started
+        started = time.perf_counter()
+        read_selected(self.path, METRICS_PATHS, accelerated=False)
+        streamed = time.perf_counter() - started
+        # Each kept number costs one float() and a share of a batched sketch update
+        self.assertLess(streamed, 4 * loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import tempfile
+import unittest
+
+from script_loader import load_script
+from benchmarks.stubs import FakePrometheus
+from emrnext_ops.prometheus import PrometheusClient, PrometheusError, merge_selectors
+
+continuous_improvement = load_script('continuous-improvement.py')
+
+SERIES = [
+    ({'__name__': 'process_cpu_seconds_total', 'job': 'emrnext'}, 12.5),
+    ({'__name__': 'process_resident_memory_bytes', 'job': 'emrnext'}, 2048),
+    ({'__name__': 'process_resident_memory_bytes', 'job': 'prometheus'}, 4096),
+    ({'__name__': 'appointment_queue_depth', 'job': 'emrnext'}, 7)
+]
+
+
+class TestSelectorMerging(unittest.TestCase):
+    def test_selectors_with_equal_matchers_are_merged(self):
+        merged, single = merge_selectors([
+            'up', 'process_cpu_seconds_total', 'a{job="x"}', 'b{job="x"}', 'rate(c[5m])'
+        ])
+        self.assertEqual(merged, {
+            '{__name__=~"process_cpu_seconds_total|up"}': {'up': 'up', 'process_cpu_seconds_total': 'process_cpu_seconds_total'},
+            '{__name__=~"a|b",job="x"}': {'a': 'a{job="x"}', 'b': 'b{job="x"}'}
+        })
+        self.assertEqual(single, ['rate(c[5m])'])
+
+    def test_lone_selector_is_sent_unchanged(self):
+        self.assertEqual(merge_selectors(['up', 'x{job="y"}']), ({}, ['up', 'x{job="y"}']))
+
+
+class TestPrometheusClient(unittest.TestCase):
+    def setUp(self):
+        self.server = FakePrometheus(SERIES, expressions={'sum(up)': 3}).__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.client = PrometheusClient(self.server.url)
+        self.addCleanup(self.client.close)
+
+    def test_batch_is_one_request_and_split_by_metric(self):
+        metrics = ['process_cpu_seconds_total', 'process_resident_memory_bytes', 'claims_processed_total']
+        results = self.client.query_many(metrics)
+
+        self.assertEqual(len(self.server.queries), 1)
+        self.assertEqual([series['value'][1] for series in results['process_cpu_seconds_total']], ['12.5'])
+        self.assertEqual(len(results['process_resident_memory_bytes']), 2)
+        self.assertEqual(results['claims_processed_total'], [])
+
+    def test_mixed_batch_and_ttl_cache(self):
+        exprs = ['sum(up)', 'appointment_queue_depth{job="emrnext"}']
+        first = self.client.query_many(exprs)
+        second = self.client.query_many(exprs)
+
+        self.assertEqual(first, second)
+        self.assertEqual(sorted(self.server.queries), sorted(exprs))
+        self.assertEqual(self.client.scalar('sum(up)'), 3)
+
+        self.client.clear_cache()
+        self.client.query('sum(up)')
+        self.assertEqual(len(self.server.queries), 3)
+
+    def test_range_queries(self):
+        results = self.client.query_range_many(
+            ['process_cpu_seconds_total', 'appointment_queue_depth'], start=1000, end=1060, step=15
+        )
+        self.assertEqual(len(self.server.queries), 1)
+        self.assertEqual(len(results['appointment_queue_depth'][0]['values']), 5)
+
+    def test_failed_query_raises(self):
+        client = PrometheusClient('http://127.0.0.1:1', timeout=1)
+        with self.assertRaises(PrometheusError):
+            client.query('up')
+
+    def test_analyzer_reads_live_performance_metrics(self):
+        queries = continuous_improvement.PERFORMANCE_QUERIES
+        for value, expected in ((640.0, {'response_time': 640.0}), ('NaN', {})):
+            server = FakePrometheus(expressions={queries['response_time']: value})
+            with server, tempfile.TemporaryDirectory() as log_dir:
+                analyzer = continuous_improvement.ContinuousImprovementAnalyzer(
+                    log_dir=log_dir, prometheus=PrometheusClient(server.url)
+                )
+                metrics = analyzer._query_performance_metrics()
+
+            # NaN (no traffic in the window) is left out
+            self.assertEqual(metrics, expected)
+            self.assertEqual(sorted(server.queries), sorted(queries.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import builtins
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest import mock
+
+from script_loader import load_script
+from emrnext_ops.collection import collect
+from emrnext_ops.deploy_log import MAX_ERROR_SAMPLES
+from emrnext_ops.report_store import ReportStore
+
+generate_reports = load_script('generate-reports.py')
+continuous_improvement = load_script('continuous-improvement.py')
+log_analyzer = load_script('deployment-log-analyzer.py')
+readiness = load_script('deployment-readiness-report.py')
+
+STAGES = ['deployment_analysis', 'deployment_readiness', 'continuous_improvement']
+
+
+class TestReportPipeline(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.log_dir = self.workdir.name
+
+        recent = (datetime.now() - timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S')
+        self.write('deployment.log', (
+            f"{recent} INFO: Backend Version: 2.4.1\n"
+            f"{recent} [DEPLOY] build - Started at 2024-01-01 10:00:00 - Completed at 2024-01-01 10:02:30\n"
+            f"{recent} ERROR: migration 42 failed\n"
+        ))
+        self.write('deployment_metrics.json', json.dumps({"stages": {
+            "build": {"start": "2024-01-01T10:00:00", "end": "2024-01-01T10:02:30", "status": "Success"},
+            "migrate": {"start": "2024-01-01T10:02:30", "end": "2024-01-01T10:04:00", "status": "Failed"}
+        }}))
+        self.write('performance_metrics.json', json.dumps({"response_time": 620}))
+        self.write('api.log', f"{recent} ERROR request failed\n{recent} CRITICAL database down\n")
+        self.sources = {
+            os.path.join(self.log_dir, name)
+            for name in ('deployment.log', 'deployment_metrics.json', 'performance_metrics.json', 'api.log')
+        }
+
+    def write(self, name, content):
+        with open(os.path.join(self.log_dir, name), 'w') as f:
+            f.write(content)
+
+    def run_counting_reads(self, function):
+        reads = Counter()
+        real_open = builtins.open
+
+        def counting_open(file, mode='r', *args, **kwargs):
+            if 'w' not in mode and file in self.sources:
+                reads[file] += 1
+            return real_open(file, mode, *args, **kwargs)
+
+        with mock.patch('builtins.open', counting_open):
+            return function(), reads
+
+    def test_one_read_per_source(self):
+        pipeline = generate_reports.ReportPipeline(self.log_dir, STAGES, max_workers=1)
+        results, reads = self.run_counting_reads(pipeline.run)
+
+        self.assertEqual(reads, Counter({path: 1 for path in self.sources}))
+        self.assertEqual(set(results), set(STAGES))
+        self.assertTrue(all('error' not in result for result in results.values()), results)
+        self.assertTrue(os.path.exists(os.path.join(self.log_dir, 'deployment_report.md')))
+        store = ReportStore(os.path.join(self.log_dir, 'reports'))
+        self.assertEqual(store.stats('readiness')['reports'], 1)
+        self.assertEqual(store.last('improvement', 1)[0][1]['error_analysis']['total'],
+                         results['continuous_improvement']['error_analysis']['total'])
+
+    def test_stages_match_standalone_reports(self):
+        results = generate_reports.ReportPipeline(self.log_dir, STAGES, max_workers=1).run()
+
+        deployment = log_analyzer.DeploymentAnalyzer(os.path.join(self.log_dir, 'deployment.log')).parse_deployment_log()
+        self.assertEqual(results['deployment_analysis']['stages'], deployment['stages'])
+        self.assertEqual(results['deployment_analysis']['errors'], deployment['errors'])
+
+        report = readiness.DeploymentReadinessReport(self.log_dir)
+        report.load_deployment_logs(os.path.join(self.log_dir, 'deployment.log'))
+        report.analyze_deployment_performance(os.path.join(self.log_dir, 'deployment_metrics.json'))
+        for section in ('system_components', 'deployment_metrics'):
+            self.assertEqual(results['deployment_readiness'][section], report.report[section])
+
+        analyzer = continuous_improvement.ContinuousImprovementAnalyzer(
+            log_dir=self.log_dir, index_path=os.path.join(self.log_dir, 'standalone_index.bin')
+        )
+        analyzer.collect_performance_metrics()
+        analyzer.analyze_error_logs()
+        pipeline_report = results['continuous_improvement']
+        self.assertEqual(pipeline_report['performance_metrics'], analyzer.improvement_report['performance_metrics'])
+        for key in ('total', 'by_level', 'by_source', 'error_frequency'):
+            self.assertEqual(pipeline_report['error_analysis'][key], analyzer.improvement_report['error_analysis'][key])
+        self.assertEqual(pipeline_report['error_analysis']['by_source'], {'deployment.log': 1, 'api.log': 2})
+
+    def test_collection_folds_deployment_log(self):
+        self.write('deployment.log', ''.join(f"ERROR: failure {i}\n" for i in range(5000)) + (
+            "[DEPLOY] build - Started at 2024-01-01 10:00:00 - Completed at 2024-01-01 10:02:30\n"
+        ))
+        deployment = collect(self.log_dir).deployment
+
+        # Only the capped sample of errors is kept, however long the log
+        self.assertEqual(deployment.error_count, 5000)
+        self.assertEqual(len(deployment.errors), MAX_ERROR_SAMPLES)
+        self.assertEqual(deployment.stages['build']['duration'], 150.0)
+        os.remove(os.path.join(self.log_dir, 'deployment.log'))
+        self.assertIsNone(collect(self.log_dir).deployment)
+
+
+if __name__ == '__main__':
+    unittest.main()
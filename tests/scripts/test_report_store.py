@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from emrnext_ops.report_store import ReportStore, legacy_timestamp
+
+DAY = 86400
+START = 1700000000.0
+
+
+class TestReportStore(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.root = os.path.join(self.workdir.name, 'reports')
+
+    def fill(self, store, days, per_day=24):
+        for hour in range(days * per_day):
+            store.append('health', {'run': hour, 'health_score': hour % 7 / 6}, START + hour * DAY / per_day)
+
+    def test_last_and_time_range_queries(self):
+        store = ReportStore(self.root, retention_days=None)
+        self.fill(store, days=10)
+
+        self.assertEqual([report['run'] for _, report in store.last('health', 30)], list(range(239, 209, -1)))
+        week = store.between('health', START + 3 * DAY, START + 10 * DAY)
+        self.assertEqual([report['run'] for _, report in week], list(range(72, 240)))
+        trend = store.series('health', 'health_score', days=1, now=START + 239 * 3600)
+        self.assertEqual(len(trend), 25)  # both ends of the day inclusive
+        self.assertEqual(trend[-1], (START + 239 * 3600, 239 % 7 / 6))
+        self.assertEqual(store.last('improvement', 5), [])
+
+    def test_segments_roll_merge_and_expire(self):
+        store = ReportStore(self.root, segment_max_age=DAY, retention_days=30, merge_max_span=7 * DAY)
+        self.fill(store, days=45, per_day=4)
+
+        stats = store.stats('health')
+        # Whole segments older than 30 days are gone; daily segments merged into weekly ones
+        self.assertLess(stats['segments'], 10)
+        self.assertGreaterEqual(stats['first'], START + 45 * DAY - 31 * DAY - 7 * DAY)
+        self.assertEqual(stats['reports'], len(store.between('health', 0)))
+        runs = [report['run'] for _, report in store.between('health', 0)]
+        self.assertEqual(runs, list(range(runs[0], 180)))
+        self.assertEqual(len(os.listdir(os.path.join(self.root, 'health'))), 2 * stats['segments'] + 2)
+
+    def test_size_cap(self):
+        store = ReportStore(self.root, segment_max_bytes=2048, retention_days=None, max_total_bytes=8192)
+        for run in range(400):
+            store.append('health', {'run': run, 'padding': 'x' * 40}, START + run)
+        self.assertLessEqual(store.stats('health')['bytes'], 8192 + 2048)
+        self.assertEqual(store.last('health', 1)[0][1]['run'], 399)
+
+    def test_partial_write_is_discarded(self):
+        store = ReportStore(self.root)
+        store.append('health', {'run': 1}, START)
+        segment = os.path.join(self.root, 'health', store._read_manifest('health')['segments'][0]['name'])
+        with open(segment, 'ab') as data:
+            data.write(b'{"run": 2, "trunc')
+        store.append('health', {'run': 3}, START + 1)
+        self.assertEqual([report['run'] for _, report in store.between('health', 0)], [1, 3])
+
+    def test_import_legacy_files(self):
+        paths = []
+        for stamp in ('20240102_030405', '20240101_000000'):
+            path = os.path.join(self.workdir.name, f'system_health_{stamp}.json')
+            with open(path, 'w') as f:
+                json.dump({'stamp': stamp}, f, indent=2)
+            paths.append(path)
+
+        store = ReportStore(self.root)
+        self.assertEqual(store.import_files('health', paths, legacy_timestamp), 2)
+        (timestamp, report), = store.last('health', 1)
+        self.assertEqual(report, {'stamp': '20240102_030405'})
+        self.assertEqual(timestamp, datetime(2024, 1, 2, 3, 4, 5).timestamp())
+
+    def legacy_file(self, stamp, report):
+        path = os.path.join(self.workdir.name, f'system_health_{stamp}.json')
+        with open(path, 'w') as f:
+            json.dump(report, f)
+        return path
+
+    def test_backfill_keeps_real_timestamps(self):
+        store = ReportStore(self.root, retention_days=None)
+        store.append('health', {'run': 'new'}, START)
+        old = datetime(2023, 1, 1).timestamp()
+        paths = [self.legacy_file(stamp, {'run': stamp}) for stamp in ('20230101_000000', '20230102_120000')]
+
+        self.assertEqual(store.import_files('health', paths, legacy_timestamp), 2)
+        self.assertEqual([report['run'] for _, report in store.last('health', 3)],
+                         ['new', '20230102_120000', '20230101_000000'])
+        self.assertEqual(store.between('health', 0, old + 10), [(old, {'run': '20230101_000000'})])
+        self.assertEqual(store.last('health', 1), [(START, {'run': 'new'})])
+
+        # Backfill lands in front; later runs still append after the newest report
+        store.append('health', {'run': 'next'}, START + 60)
+        self.assertEqual([report['run'] for _, report in store.between('health', 0)],
+                         ['20230101_000000', '20230102_120000', 'new', 'next'])
+
+    def test_import_inside_stored_range_is_refused(self):
+        store = ReportStore(self.root, retention_days=None)
+        store.append('health', {'run': 1}, START)
+        store.append('health', {'run': 2}, START + 10 * DAY)
+        stamp = datetime.fromtimestamp(START + DAY).strftime('%Y%m%d_%H%M%S')
+        path = self.legacy_file(stamp, {'run': 'between'})
+
+        with self.assertRaises(ValueError):
+            store.import_files('health', [path], legacy_timestamp)
+        self.assertEqual([report['run'] for _, report in store.between('health', 0)], [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import time
+import unittest
+from unittest import mock
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from emrnext_ops.resource_sampler import DEFAULT_INTERVAL, ResourceSampler
+
+
+class SequenceCollector:
+    def __init__(self, values):
+        self.values = iter(values)
+
+    def fields(self):
+        return ['cpu', 'memory', 'disk']
+
+    def __call__(self):
+        value = next(self.values)
+        return {'cpu': value, 'memory': value / 2, 'disk': 10.0}
+
+
+class TestResourceSampler(unittest.TestCase):
+    def test_window_statistics(self):
+        sampler = ResourceSampler(capacity=100, collector=SequenceCollector(range(1, 21)))
+        for _ in range(20):
+            sampler.sample_once()
+
+        cpu = sampler.stats(60)['cpu']
+        self.assertEqual(cpu['min'], 1)
+        self.assertEqual(cpu['avg'], 10.5)
+        self.assertEqual(cpu['p95'], 19)
+        self.assertEqual(cpu['samples'], 20)
+
+    def test_ring_buffer_keeps_latest_samples(self):
+        sampler = ResourceSampler(capacity=5, collector=SequenceCollector(range(1, 13)))
+        for _ in range(12):
+            sampler.sample_once()
+
+        cpu = sampler.stats(60)['cpu']
+        self.assertEqual((cpu['min'], cpu['samples']), (8, 5))
+
+    def test_background_sampling(self):
+        sampler = ResourceSampler(interval=0.01, collector=SequenceCollector(range(10 ** 6))).start()
+        time.sleep(0.2)
+        sampler.stop()
+        self.assertGreater(sampler.stats(60)['cpu']['samples'], 5)
+
+    def test_psutil_sample_cost_within_budget(self):
+        """One real sample costs well under 1% of the default sampling interval"""
+        sampler = ResourceSampler(interval=0.01)
+        sampler.sample_once()
+        started = time.thread_time()
+        for _ in range(20):
+            sampler.sample_once()
+        per_sample = (time.thread_time() - started) / 20
+        self.assertLess(per_sample, 0.01 * DEFAULT_INTERVAL)
+        self.assertIn('cpu_core_0', sampler.stats(60))
+
+    def test_cpu_measured_over_a_full_interval(self):
+        sampler = ResourceSampler(interval=0.2)
+        collector = sampler.collector
+        readings = []
+        cpu_percent = collector.psutil.cpu_percent
+        with mock.patch.object(collector.psutil, 'cpu_percent',
+                               lambda **kwargs: readings.append(time.monotonic()) or cpu_percent(**kwargs)):
+            primed = time.monotonic()
+            sampler.sample_once()
+            sampler.sample_once()
+        # Neither reading follows priming or the previous reading by less than the interval
+        self.assertGreaterEqual(readings[0] - primed, 0.19)
+        self.assertGreaterEqual(readings[1] - readings[0], 0.19)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from emrnext_ops.quantiles import DDSketch
+from emrnext_ops import stage_history
+from emrnext_ops.stage_history import StageHistory
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def stage_line(stage, start, seconds):
+    end = start + timedelta(seconds=seconds)
+    return (f"{start:%Y-%m-%d %H:%M:%S} [DEPLOY] {stage} - Started at {start:%Y-%m-%d %H:%M:%S}"
+            f" - Completed at {end:%Y-%m-%d %H:%M:%S}\n")
+
+
+class TestDDSketch(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.lognormvariate(4, 1.2) for _ in range(20000)]
+
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = DDSketch(relative_accuracy=0.01)
+        for value in self.values:
+            sketch.add(value)
+        for q in (0.0, 0.5, 0.95, 0.99, 1.0):
+            exact = exact_quantile(self.values, q)
+            self.assertLessEqual(abs(sketch.quantile(q) - exact) / exact, 0.01, q)
+
+    def test_merge_matches_single_sketch(self):
+        whole, left, right = DDSketch(), DDSketch(), DDSketch()
+        for index, value in enumerate(self.values):
+            whole.add(value)
+            (left if index % 3 else right).add(value)
+        merged = DDSketch.from_dict(left.merge(right).to_dict())
+        self.assertEqual(merged.bins, whole.bins)
+        self.assertEqual(merged.quantiles([0.5, 0.99]), whole.quantiles([0.5, 0.99]))
+
+    def test_bins_are_bounded(self):
+        sketch = DDSketch(max_bins=256)
+        for value in self.values:
+            sketch.add(value)
+        sketch.add(0)
+        self.assertLessEqual(len(sketch.bins), 256)
+        self.assertEqual(sketch.count, len(self.values) + 1)
+        self.assertEqual(sketch.quantile(0), 0)
+        exact = exact_quantile(self.values, 0.99)
+        self.assertLessEqual(abs(sketch.quantile(0.99) - exact) / exact, 0.01)
+
+
+class TestStageHistory(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.history_path = os.path.join(self.workdir.name, 'stage_history.json')
+
+    def write_logs(self, count):
+        paths = []
+        moment = datetime(2024, 1, 1)
+        for index in range(count):
+            path = os.path.join(self.workdir.name, f'deployment-{index}.log')
+            with open(path, 'w') as log_file:
+                for stage, seconds in (('build', 100 + index), ('migrate', 30)):
+                    log_file.write(stage_line(stage, moment, seconds))
+                    moment += timedelta(minutes=10)
+            paths.append(path)
+        return paths
+
+    def test_bulk_ingest_is_idempotent(self):
+        paths = self.write_logs(40)
+        history = StageHistory(self.history_path)
+        self.assertEqual(history.ingest_logs(paths, max_workers=2), 80)
+        history.save()
+
+        reloaded = StageHistory(self.history_path)
+        self.assertEqual(reloaded.ingest_logs(paths, max_workers=1), 0)
+        percentiles = reloaded.percentiles()
+        self.assertEqual(percentiles['build']['runs'], 40)
+        self.assertLessEqual(abs(percentiles['build']['p50'] - 119) / 119, 0.01)
+        self.assertAlmostEqual(percentiles['migrate']['p99'], 30, delta=0.3)
+
+    def test_older_archives_after_newer_ones(self):
+        paths = self.write_logs(10)
+        history = StageHistory(self.history_path)
+        self.assertEqual(history.ingest_logs(paths[5:], max_workers=1), 10)
+        history.save()
+
+        reloaded = StageHistory(self.history_path)
+        self.assertEqual(reloaded.ingest_logs(paths[:5], max_workers=1), 10)
+        self.assertEqual(reloaded.percentiles()['build']['runs'], 10)
+
+    def test_run_in_several_logs_counted_once(self):
+        paths = self.write_logs(4)
+        # A rotated copy holding the same runs, ingested in the same parallel pass
+        with open(paths[0]) as original, open(os.path.join(self.workdir.name, 'copy.log'), 'w') as copy:
+            copy.write(original.read())
+        history = StageHistory()
+        self.assertEqual(history.ingest_logs(paths + [copy.name], max_workers=2), 8)
+        self.assertEqual(history.percentiles()['build']['runs'], 4)
+
+    def test_dedup_state_is_bounded(self):
+        paths = self.write_logs(30)
+        history = StageHistory(self.history_path)
+        with mock.patch.object(stage_history, 'RECENT_RUNS', 8):
+            self.assertEqual(history.ingest_logs(reversed(paths), max_workers=1), 60)
+            history.save()
+            reloaded = StageHistory(self.history_path)
+            self.assertEqual(reloaded.ingest_logs(paths, max_workers=1), 0)
+
+        self.assertEqual(len(reloaded.recent['build']), 8)
+        self.assertEqual(reloaded.percentiles()['build']['runs'], 30)
+
+    def test_regressions_against_baseline(self):
+        history = StageHistory()
+        history.ingest_logs(self.write_logs(20), max_workers=1)
+        baseline = history.percentiles()
+        stages = {'build': {'duration': 400.0}, 'migrate': {'duration': 29.0}, 'verify': {'duration': 999.0}}
+        self.assertEqual(list(history.regressions(stages, baseline)), ['build'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from script_loader import SCRIPTS_DIR, load_script, timing_test
+from emrnext_ops.report_store import ReportStore
+
+cli = load_script('emrnext-cli.py')
+
+SCRIPTS = [
+    'system-health-checker.py',
+    'continuous-improvement.py',
+    'deployment-log-analyzer.py',
+    'deployment-readiness-report.py',
+    'generate-reports.py',
+    'emrnext-cli.py'
+]
+# Loaded only by the checks or code paths that need them
+DEFERRED = ('requests', 'psutil', 'numpy', 'ssl', 'http.client', 'http.server', 'multiprocessing', 'gzip')
+# Import time of a script beyond the interpreter's own startup, with warm bytecode
+STARTUP_BUDGET_MS = 60
+
+
+def import_times(code, pycache):
+    """``{module: self import time in µs}`` from ``python -X importtime``."""
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-X', f'pycache_prefix={pycache}', '-c', code],
+        check=True, capture_output=True, text=True, env=env
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and 'self [us]' not in line:
+            self_us, _, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(self_us)
+    return times
+
+
+class TestStartup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pycache = tempfile.TemporaryDirectory()
+        cls.baseline = import_times(cls.load_code(None), cls.pycache.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pycache.cleanup()
+
+    @staticmethod
+    def load_code(script):
+        code = f"import sys; sys.path.insert(0, {SCRIPTS_DIR!r}); from emrnext_ops.loader import load_script"
+        return code + (f"; load_script({script!r})" if script else '')
+
+    def added_imports(self, script):
+        """``{module: self import time in µs}`` imported by loading ``script``."""
+        # The first run compiles and caches the bytecode, as a deployed node would have
+        import_times(self.load_code(script), self.pycache.name)
+        times = import_times(self.load_code(script), self.pycache.name)
+        return {name: us for name, us in times.items() if name not in self.baseline}
+
+    def test_heavy_modules_deferred(self):
+        for script in SCRIPTS:
+            with self.subTest(script=script):
+                added = self.added_imports(script)
+                loaded = [name for name in added if name.split('.')[0] in DEFERRED or name in DEFERRED]
+                self.assertEqual(loaded, [], f"{script} imports deferred modules at load")
+
+    @timing_test
+    def test_import_budget(self):
+        for script in SCRIPTS:
+            with self.subTest(script=script):
+                added = self.added_imports(script)
+                self.assertLess(sum(added.values()) / 1000, STARTUP_BUDGET_MS, sorted(
+                    added.items(), key=lambda item: item[1], reverse=True)[:10])
+
+
+class TestMultiCommandCLI(unittest.TestCase):
+    def test_split_commands(self):
+        self.assertEqual(cli.split_commands(['health', 'then', 'improvement', '--incremental']),
+                         [('health', []), ('improvement', ['--incremental'])])
+        with self.assertRaises(ValueError):
+            cli.split_commands(['health', 'then'])
+        with self.assertRaises(ValueError):
+            cli.split_commands(['backup'])
+
+    def test_commands_run_in_one_process(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            argv = ['readiness', '--log-dir', log_dir, 'then', 'readiness', '--bogus', 'then',
+                    'readiness', '--log-dir', log_dir]
+            with open(os.devnull, 'w') as devnull, mock.patch('sys.stdout', devnull), \
+                    mock.patch('sys.stderr', devnull):
+                status = cli.run(argv)
+
+            # The bad options of the second command do not stop the third
+            self.assertEqual(status, 2)
+            self.assertEqual(ReportStore(os.path.join(log_dir, 'reports')).stats('readiness')['reports'], 2)
+        self.assertEqual(cli.run(['unknown']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
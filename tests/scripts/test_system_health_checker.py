@@ -0,0 +1,287 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.request
+from unittest import mock
+
+from script_loader import load_script
+from benchmarks.stubs import StubHTTPServer
+from emrnext_ops.check_registry import DEFAULT_GROUP
+from emrnext_ops.metrics_exporter import DEFAULT_INTERVALS, HealthDaemon, render
+from emrnext_ops.probes import MAX_REDIRECTS, USER_AGENT, ProbeEngine
+from emrnext_ops.resource_sampler import ResourceSampler
+
+health_checker = load_script('system-health-checker.py')
+
+
+class TestProbeEngine(unittest.TestCase):
+    def test_probes_run_concurrently(self):
+        """Slow probes overlap instead of adding up"""
+        engine = ProbeEngine(max_workers=6)
+        with StubHTTPServer(delay=0.3) as server:
+            tasks = {i: (lambda: engine.http_probe(server.url + '/', timeout=2)) for i in range(6)}
+            started = time.perf_counter()
+            results = engine.run(tasks, deadline=5)
+            elapsed = time.perf_counter() - started
+        engine.close()
+
+        self.assertLess(elapsed, 1.2)
+        self.assertTrue(all(result.status_code == 200 for result in results.values()))
+
+    def test_latency_phases_recorded(self):
+        engine = ProbeEngine()
+        with StubHTTPServer() as server:
+            first = engine.http_probe(server.url + '/health')
+            second = engine.http_probe(server.url + '/health')
+        engine.close()
+
+        self.assertEqual(first.status_code, 200)
+        for phase in ('dns', 'connect', 'ttfb', 'total'):
+            self.assertIn(phase, first.latency())
+        self.assertFalse(first.reused)
+        self.assertTrue(second.reused)
+
+    def test_run_deadline(self):
+        engine = ProbeEngine()
+        with StubHTTPServer(delay=1) as server:
+            started = time.perf_counter()
+            results = engine.run({'slow': lambda: engine.http_probe(server.url, timeout=5)}, deadline=0.2)
+            elapsed = time.perf_counter() - started
+        engine.close()
+
+        self.assertLess(elapsed, 0.8)
+        self.assertIsInstance(results['slow'], TimeoutError)
+
+    def test_hung_probe_does_not_delay_exit(self):
+        # A probe still waiting on its socket at the deadline is abandoned
+        code = (
+            "import time, script_loader\n"
+            "from benchmarks.stubs import StubHTTPServer\n"
+            "from emrnext_ops.probes import ProbeEngine\n"
+            "server = StubHTTPServer(delay=10).__enter__()\n"
+            "engine = ProbeEngine()\n"
+            "print(engine.run({'slow': lambda: engine.http_probe(server.url, timeout=30)}, deadline=0.2))\n"
+        )
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(__file__),
+                                capture_output=True, text=True, timeout=60, check=True).stdout
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertIn('TimeoutError', output)
+
+    def test_redirects_followed_with_user_agent(self):
+        engine = ProbeEngine()
+        routes = {'/': (301, b'', {'Location': '/login'}), '/login': (200, b'ok'),
+                  '/loop': (302, b'', {'Location': '/loop'})}
+        with StubHTTPServer(routes=routes) as server:
+            result = engine.http_probe(server.url + '/')
+            looping = engine.http_probe(server.url + '/loop')
+        engine.close()
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.latency()['redirects'], 1)
+        self.assertEqual([path for _, path, _ in server.received[:2]], ['/', '/login'])
+        self.assertEqual(server.headers[0]['User-Agent'], USER_AGENT)
+        # Redirect chains are bounded
+        self.assertEqual(looping.status_code, 302)
+        self.assertEqual(looping.redirects, MAX_REDIRECTS)
+
+    def test_connect_tries_every_address(self):
+        # The first address refuses connections, the second one answers
+        addresses = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 1))]
+        engine = ProbeEngine()
+        with StubHTTPServer() as server:
+            addresses.append((socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', server.port)))
+            with mock.patch('socket.getaddrinfo', return_value=addresses):
+                result = engine.http_probe(f'http://probe.invalid:{server.port}/', timeout=2)
+        engine.close()
+
+        self.assertEqual(result.status_code, 200)
+
+    def test_unreachable(self):
+        engine = ProbeEngine()
+        result = engine.http_probe('http://127.0.0.1:1/', timeout=1)
+        self.assertIsNone(result.status_code)
+        self.assertIsNotNone(result.error)
+
+
+class TestSystemHealthChecker(unittest.TestCase):
+    def test_service_status_from_stub(self):
+        routes = {'/api/health': (200, b'ok'), '/api/db-health': (503, b'down')}
+        with StubHTTPServer(routes=routes) as server:
+            checker = health_checker.SystemHealthChecker(run_deadline=5)
+            checker.services = [
+                {"name": "backend", "url": server.url + '/api/health'},
+                {"name": "database", "url": server.url + '/api/db-health'}
+            ]
+            checker.check_service_status()
+
+        status = checker.health_report['service_status']
+        self.assertEqual(status['backend'], {"status": "HEALTHY", "response_code": 200})
+        self.assertEqual(status['database'], {"status": "UNHEALTHY", "response_code": 503})
+        self.assertIn('ttfb', checker.health_report['probe_latency']['backend'])
+
+    def test_registered_checks_and_weighted_health(self):
+        class ValidTLS:
+            def check_all(self):
+                return {'localhost:443': {'status': 'VALID'}}
+
+        with StubHTTPServer() as server:
+            checker = health_checker.SystemHealthChecker(run_deadline=5, tls_checker=ValidTLS())
+            checker.services = [{"name": "backend", "url": server.url + '/'}]
+            checker.external_sites = [server.url + '/']
+            checker.registry.register('queue_depth', lambda deps: {'queue_depth': 75})
+            checker.registry.criterion('queue_below_50', lambda report: report['queue_depth'] < 50, weight=6)
+
+            outcomes = checker.scheduler.run()
+        for outcome in outcomes.values():
+            checker._merge_sections(outcome.result)
+        # Pin resource usage so the score does not depend on this host
+        checker.health_report['system_resources'] = {'cpu_usage': 10, 'memory_usage': 10, 'disk_usage': 10}
+        checker.determine_overall_health()
+
+        self.assertEqual(checker.health_report['service_status']['backend']['status'], 'HEALTHY')
+        self.assertFalse(checker.health_report['health_criteria']['queue_below_50'])
+        # Six default criteria pass, the heavy queue criterion does not
+        self.assertEqual(checker.health_report['health_score'], 0.5)
+        self.assertEqual(checker.health_report['overall_health'], 'NEEDS_ATTENTION')
+
+    def test_probes_past_deadline_are_unreachable(self):
+        class ValidTLS:
+            def check_all(self):
+                return {'localhost:443': {'status': 'VALID'}}
+
+        with tempfile.TemporaryDirectory() as tmp, StubHTTPServer(delay=3) as server:
+            checker = health_checker.SystemHealthChecker(run_deadline=1, tls_checker=ValidTLS())
+            checker.report_dir = tmp
+            checker.services = [{"name": "backend", "url": server.url + '/api/health'}]
+            checker.external_sites = [server.url + '/']
+            report = checker.generate_health_report()
+
+        self.assertEqual(report['service_status'], {'backend': {'status': 'UNREACHABLE', 'response_code': None}})
+        self.assertEqual(report['network_connectivity'][server.url + '/']['status'], 'UNREACHABLE')
+        self.assertFalse(report['health_criteria']['services_healthy'])
+        self.assertFalse(report['health_criteria']['network_connected'])
+        self.assertNotEqual(report['overall_health'], 'EXCELLENT')
+
+    def test_resources_wait_for_the_sampler_first_tick(self):
+        threads = []
+
+        def collector():
+            threads.append(threading.current_thread().name)
+            return {'cpu': 12.0, 'memory': 40.0, 'disk': 55.0}
+
+        sampler = ResourceSampler(interval=0.2, collector=collector)
+        checker = health_checker.SystemHealthChecker(sampler=sampler)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            checker.check_system_resources()
+            elapsed = time.perf_counter() - started
+        finally:
+            sampler.stop()
+
+        # The first reading is the sampler's, one interval after it started
+        self.assertEqual(threads[0], 'resource-sampler')
+        self.assertGreaterEqual(elapsed, 0.19)
+        self.assertEqual(checker.health_report['system_resources'],
+                         {'cpu_usage': 12.0, 'memory_usage': 40.0, 'disk_usage': 55.0})
+
+    def test_failed_probe_check_lists_every_probe(self):
+        checker = health_checker.SystemHealthChecker()
+        checker.services = [{"name": "backend", "url": 'http://127.0.0.1:1/'}]
+        sections = checker._failed_probe_sections('services', 'timed out after 17s')
+        self.assertEqual(sections['service_status'], {'backend': {'status': 'UNREACHABLE', 'response_code': None}})
+
+        # A section without entries (no probe answered) never passes
+        checker.health_report['system_resources'] = {'cpu_usage': 10, 'memory_usage': 10, 'disk_usage': 10}
+        checker.determine_overall_health()
+        self.assertFalse(checker.health_report['health_criteria']['services_healthy'])
+        self.assertFalse(checker.health_report['health_criteria']['certificates_valid'])
+
+
+class TestHealthDaemon(unittest.TestCase):
+    def test_metrics_served_from_cache(self):
+        hits = []
+        routes = {'/api/health': (200, b'ok')}
+        with StubHTTPServer(routes=routes) as server:
+            checker = health_checker.SystemHealthChecker(run_deadline=5)
+            checker.services = [{"name": "backend", "url": server.url + '/api/health'}]
+            checker.external_sites = [server.url + '/']
+            checker.probe_groups = lambda: {
+                'services': checker._service_probes(),
+                'network': checker._network_probes(),
+                'security': {}
+            }
+            original_probe = checker.probe_engine.http_probe
+            checker.probe_engine.http_probe = lambda *args: hits.append(args) or original_probe(*args)
+
+            daemon = HealthDaemon(checker, intervals={'resources': 60, 'services': 60, 'network': 60,
+                                                      'security': 60}, bind='127.0.0.1', port=0)
+            daemon.run_group('resources')
+            daemon.run_group('services')
+            daemon.run_group('network')
+            daemon.server.start()
+            try:
+                probes_before = len(hits)
+                url = f"http://127.0.0.1:{daemon.server.port}/metrics"
+                body = urllib.request.urlopen(url).read().decode()
+                urllib.request.urlopen(url).read()
+            finally:
+                daemon.stop()
+
+        self.assertEqual(len(hits), probes_before)
+        self.assertIn('emrnext_health_service_up{service="backend"} 1', body)
+        self.assertIn(f'emrnext_health_network_up{{site="{server.url}/"}} 1', body)
+        self.assertIn('emrnext_health_resource_usage_percent{resource="cpu"}', body)
+        self.assertIn('emrnext_health_probe_duration_seconds_bucket{phase="total",probe="backend",le="+Inf"} 1', body)
+        self.assertIn('emrnext_health_check_runs_total{group="services"} 1', body)
+        self.assertIn('emrnext_health_check_run_duration_seconds{group="services"}', body)
+        self.assertIn('emrnext_health_check_last_run_timestamp_seconds{group="services"}', body)
+        # Spans add up over group runs, so they are exported as counters
+        self.assertIn('emrnext_analyzer_span_calls_total{job="system_health",span="group.services"} 1', body)
+        self.assertNotIn('emrnext_analyzer_span_duration_seconds', body)
+        self.assertNotIn('emrnext_analyzer_run_duration_seconds', body)
+
+    def test_registered_checks_run_in_their_group(self):
+        sampler = ResourceSampler(collector=lambda: {'cpu': 12.0, 'memory': 40.0, 'disk': 55.0})
+        checker = health_checker.SystemHealthChecker(sampler=sampler)
+        checker.registry.register('queue_depth', lambda deps: {'queue_depth': 75})
+        checker.registry.register('open_files', lambda deps: {'open_files': 12}, group='resources')
+        daemon = HealthDaemon(checker, bind='127.0.0.1', port=0)
+        try:
+            daemon.run_group('resources')
+            self.assertEqual(checker.health_report['open_files'], 12)
+            self.assertNotIn('queue_depth', checker.health_report)
+            daemon.run_group(DEFAULT_GROUP)
+        finally:
+            daemon.server.httpd.server_close()
+
+        self.assertEqual(checker.health_report['queue_depth'], 75)
+        self.assertEqual(daemon.interval(DEFAULT_GROUP), DEFAULT_INTERVALS[DEFAULT_GROUP])
+        self.assertIn('emrnext_health_check_runs_total{group="checks"} 1', render(daemon.families()).decode())
+
+    def test_failing_group_is_logged(self):
+        checker = health_checker.SystemHealthChecker()
+        daemon = HealthDaemon(checker, intervals={DEFAULT_GROUP: 0.01}, bind='127.0.0.1', port=0)
+
+        def fail(group):
+            # Only one round of the loop
+            daemon._stop.set()
+            raise RuntimeError('boom')
+
+        daemon.run_group = fail
+        try:
+            with self.assertLogs('emrnext_ops.metrics_exporter', 'ERROR') as logs:
+                daemon._loop(DEFAULT_GROUP)
+        finally:
+            daemon.server.httpd.server_close()
+        self.assertIn('Health check group checks failed', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from emrnext_ops.tailing import PositionStore
+
+
+class TestLogTailer(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.log_path = os.path.join(self.workdir.name, 'app.log')
+        self.pos_file = os.path.join(self.workdir.name, 'app.pos')
+
+    def append(self, text, path=None):
+        with open(path or self.log_path, 'a') as f:
+            f.write(text)
+
+    def run_once(self):
+        store = PositionStore(self.pos_file)
+        tailer = store.tailer(self.log_path)
+        lines = list(tailer.read_lines())
+        tailer.commit({'lines': len(lines)})
+        store.save()
+        return lines, tailer
+
+    def test_only_appended_lines_are_read(self):
+        self.append("one\ntwo\n")
+        self.assertEqual(self.run_once()[0], ["one\n", "two\n"])
+        self.append("three\n")
+        self.assertEqual(self.run_once()[0], ["three\n"])
+
+    def test_partial_line_is_carried_over(self):
+        self.append("complete\nhalf")
+        self.assertEqual(self.run_once()[0], ["complete\n"])
+        self.append(" line\n")
+        self.assertEqual(self.run_once()[0], ["half line\n"])
+
+    def test_unchanged_log_is_detected(self):
+        self.append("one\n")
+        self.run_once()
+        store = PositionStore(self.pos_file)
+        self.assertTrue(store.tailer(self.log_path).unchanged())
+        self.assertEqual(store.aggregates(self.log_path), {'lines': 1})
+
+    def test_truncation_restarts_from_zero(self):
+        self.append("one\ntwo\n")
+        self.run_once()
+        with open(self.log_path, 'w') as f:
+            f.write("new\n")
+        lines, tailer = self.run_once()
+        self.assertEqual(lines, ["new\n"])
+        self.assertTrue(tailer.truncated)
+
+    def test_rotation_follows_renamed_file(self):
+        self.append("one\n")
+        self.run_once()
+        self.append("two\n")
+        os.rename(self.log_path, self.log_path + '.1')
+        self.append("fresh\n")
+
+        lines, tailer = self.run_once()
+        self.assertEqual(lines, ["fresh\n"])
+        self.assertTrue(tailer.rotated)
+
+        store = PositionStore(self.pos_file)
+        rotated = store.tailer(self.log_path + '.1')
+        self.assertEqual(list(rotated.read_lines()), ["two\n"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+
+from script_loader import load_script
+from benchmarks.stubs import StubHTTPServer
+from emrnext_ops.telemetry import Telemetry
+
+continuous_improvement = load_script('continuous-improvement.py')
+
+
+class TestTelemetry(unittest.TestCase):
+    def test_spans_and_counters_from_threads(self):
+        telemetry = Telemetry('test')
+
+        def work():
+            for _ in range(100):
+                with telemetry.span('phase'):
+                    telemetry.count('lines', 10)
+
+        with telemetry.run():
+            threads = [threading.Thread(target=work) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        summary = telemetry.summary()
+        self.assertEqual(summary['spans']['phase']['calls'], 400)
+        self.assertEqual(summary['counters'], {'lines': 4000})
+        self.assertGreaterEqual(summary['run_seconds'], summary['spans']['phase']['seconds'] / 4)
+        self.assertNotIn('profile', summary)
+
+    def test_cpu_profile(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'run.prof')
+            telemetry = Telemetry('test', profile='cpu', profile_path=path)
+            with telemetry.run():
+                sorted(str(number) for number in range(20000))
+            profile = telemetry.summary()['profile']
+            self.assertEqual(profile['mode'], 'cpu')
+            self.assertTrue(profile['top_cumulative'])
+            self.assertTrue(pstats.Stats(path).total_calls > 0)
+
+    def test_memory_profile(self):
+        telemetry = Telemetry('test', profile='memory')
+        with telemetry.run():
+            blocks = [bytearray(1024) for _ in range(1000)]
+        del blocks
+        profile = telemetry.summary()['profile']
+        self.assertGreater(profile['peak_bytes'], 1000 * 1024)
+        self.assertIn('test_telemetry.py', profile['top_allocations'][0]['location'])
+
+    def test_prometheus_export(self):
+        telemetry = Telemetry('continuous_improvement')
+        with telemetry.run():
+            telemetry.record('analyze_error_logs', 0.25)
+            telemetry.count('error_log_bytes', 4096)
+
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'emrnext.prom')
+            telemetry.export(metrics_file=path)
+            with open(path) as metrics:
+                text = metrics.read()
+        self.assertIn('emrnext_analyzer_span_duration_seconds{job="continuous_improvement",'
+                      'span="analyze_error_logs"} 0.25', text)
+        self.assertIn('emrnext_analyzer_processed{job="continuous_improvement",counter="error_log_bytes"} 4096',
+                      text)
+        self.assertIn('emrnext_analyzer_last_run_timestamp_seconds{job="continuous_improvement"}', text)
+
+        with StubHTTPServer() as gateway:
+            telemetry.export(pushgateway=gateway.url)
+        (method, path, body), = gateway.received
+        self.assertEqual((method, path), ('PUT', '/metrics/job/continuous_improvement'))
+        self.assertEqual(body.decode(), text)
+
+    def test_report_carries_telemetry(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            with open(os.path.join(log_dir, 'api.log'), 'w') as log:
+                written = log.write('2020-01-01 00:00:00 ERROR old\n')
+            report = continuous_improvement.ContinuousImprovementAnalyzer(log_dir=log_dir).generate_improvement_report()
+
+        telemetry = report['telemetry']
+        self.assertEqual(set(telemetry['spans']), {
+            'collect_performance_metrics', 'analyze_error_logs', 'generate_optimization_recommendations'
+        })
+        self.assertEqual(telemetry['counters'], {'error_log_bytes': written, 'error_lines': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import random
+import unittest
+from datetime import datetime
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from emrnext_ops.timestamps import (
+    TIMESTAMP_FORMAT, duration_seconds, durations, parse_iso, parse_timestamp, to_datetime64
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def fuzzed_timestamps(count, seed=13):
+    """Canonical timestamps plus near misses of every kind the parsers treat differently."""
+    rng = random.Random(seed)
+    field_values = [
+        lambda: f"{rng.randint(1, 9999):04d}", lambda: f"{rng.randint(0, 13):02d}", lambda: f"{rng.randint(0, 32):02d}",
+        lambda: f"{rng.randint(0, 25):02d}", lambda: f"{rng.randint(0, 61):02d}", lambda: f"{rng.randint(0, 61):02d}"
+    ]
+    mutations = [
+        lambda text: text,
+        lambda text: text,
+        lambda text: text.replace(' ', 'T'),
+        lambda text: text.replace(' ', '  '),
+        lambda text: text + rng.choice([' ', 'Z', '.123', '+00:00', '\n']),
+        lambda text: text[:rng.randint(0, 18)],
+        lambda text: text.replace('-0', '-', 1),
+        lambda text: text.replace(':0', ':', 1),
+        lambda text: text.replace('2', '٢', 1),
+        lambda text: text.replace('-', '/', 1),
+        lambda text: ' ' + text,
+        lambda text: text[:rng.randint(0, 18)] + rng.choice('0a:- T') + text[rng.randint(1, 19):]
+    ]
+    corpus = ['', '2024-02-29 12:00:00', '2023-02-29 12:00:00', '0000-01-01 00:00:00', '9999-12-31 23:59:59']
+    for _ in range(count):
+        year, month, day, hour, minute, second = (value() for value in field_values)
+        if rng.random() < 0.5:
+            # Mostly valid dates so the fast paths get exercised
+            month, day = f"{rng.randint(1, 12):02d}", f"{rng.randint(1, 28):02d}"
+            hour, minute, second = f"{rng.randint(0, 23):02d}", f"{rng.randint(0, 59):02d}", f"{rng.randint(0, 59):02d}"
+        text = f"{year}-{month}-{day} {hour}:{minute}:{second}"
+        corpus.append(rng.choice(mutations)(text))
+    return corpus
+
+
+def outcome(function, *args):
+    try:
+        return 'ok', function(*args)
+    except (TypeError, ValueError) as e:
+        return 'error', type(e)
+
+
+def reference_duration(start, end):
+    return (datetime.strptime(end, TIMESTAMP_FORMAT) - datetime.strptime(start, TIMESTAMP_FORMAT)).total_seconds()
+
+
+class TestTimestampParsing(unittest.TestCase):
+    def setUp(self):
+        self.corpus = fuzzed_timestamps(20000)
+
+    def test_agrees_with_strptime(self):
+        for text in self.corpus:
+            self.assertEqual(
+                outcome(parse_timestamp, text), outcome(datetime.strptime, text, TIMESTAMP_FORMAT), repr(text)
+            )
+
+    def test_agrees_with_fromisoformat(self):
+        for text in self.corpus:
+            self.assertEqual(outcome(parse_iso, text), outcome(datetime.fromisoformat, text), repr(text))
+
+    def test_durations_agree_with_datetime_subtraction(self):
+        rng = random.Random(5)
+        for _ in range(20000):
+            start, end = rng.choice(self.corpus), rng.choice(self.corpus)
+            expected = outcome(reference_duration, start, end)
+            self.assertEqual(outcome(duration_seconds, start, end), expected, (start, end))
+
+    @unittest.skipIf(numpy is None, "numpy not installed")
+    def test_bulk_conversion_matches_scalar(self):
+        corpus = self.corpus + [None]
+        converted = to_datetime64(corpus)
+        for text, value in zip(corpus, converted):
+            expected = outcome(parse_timestamp, text)
+            if expected[0] == 'ok':
+                self.assertEqual(value.astype(datetime), expected[1], repr(text))
+            else:
+                self.assertTrue(numpy.isnat(value), repr(text))
+
+        starts, ends = self.corpus[:-1], self.corpus[1:]
+        bulk = durations(starts, ends)
+        scalar = durations(starts, ends, min_batch=len(starts) + 1)
+        self.assertEqual(bulk, scalar)
+        self.assertTrue(all(value is None or type(value) is float for value in bulk))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import socket
+import ssl
+import tempfile
+import unittest
+from unittest import mock
+
+import script_loader  # noqa: F401  (puts scripts/ on sys.path)
+from benchmarks.stubs import StubHTTPServer, make_test_ca, server_tls_context
+from emrnext_ops.tls_check import TLSChecker, split_target
+
+
+@unittest.skipUnless(shutil.which('openssl'), "openssl CLI needed to create the test CA")
+class TestTLSChecker(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.mkdtemp()
+        cls.ca_file, cert_file, key_file = make_test_ca(cls.workdir, days=30)
+        cls.server = StubHTTPServer(tls_context=server_tls_context(cert_file, key_file)).__enter__()
+        cls.target = f"localhost:{cls.server.port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.__exit__(None, None, None)
+        shutil.rmtree(cls.workdir)
+
+    def trusted_context(self):
+        return ssl.create_default_context(cafile=self.ca_file)
+
+    def test_valid_certificate(self):
+        result = TLSChecker([self.target], ssl_context=self.trusted_context()).check(self.target)
+        self.assertEqual(result['status'], 'VALID')
+        self.assertAlmostEqual(result['days_remaining'], 30, delta=1)
+        self.assertIn('handshake_ms', result)
+
+    def test_untrusted_ca_is_invalid(self):
+        result = TLSChecker([self.target]).check(self.target)
+        self.assertEqual(result['status'], 'INVALID')
+        self.assertIn('certificate', result['verification'])
+
+    def test_unreachable_host(self):
+        result = TLSChecker(['127.0.0.1:1'], timeout=1).check('127.0.0.1:1')
+        self.assertEqual(result['status'], 'CHECK_FAILED')
+
+    def test_connect_tries_every_address(self):
+        # The first address refuses connections, the second one answers
+        addresses = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 1)),
+                     (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', self.server.port))]
+        with mock.patch('socket.getaddrinfo', return_value=addresses):
+            result = TLSChecker([self.target], ssl_context=self.trusted_context(), timeout=2).check(self.target)
+        self.assertEqual(result['status'], 'VALID')
+
+    def test_cached_until_refresh_margin(self):
+        cache_path = os.path.join(self.workdir, 'tls_cache.json')
+        checker = TLSChecker([self.target], ssl_context=self.trusted_context(), cache_path=cache_path)
+        self.assertFalse(checker.check_all()[self.target]['cached'])
+        self.assertTrue(checker.check_all()[self.target]['cached'])
+
+        # A refresh margin beyond the remaining validity forces a handshake
+        near_expiry = TLSChecker([self.target], ssl_context=self.trusted_context(), cache_path=cache_path,
+                                 refresh_margin_days=45)
+        self.assertFalse(near_expiry.check_all()[self.target]['cached'])
+
+
+class TestSplitTarget(unittest.TestCase):
+    def test_target_forms(self):
+        self.assertEqual(split_target('example.com'), ('example.com', 443))
+        self.assertEqual(split_target('example.com:8443'), ('example.com', 8443))
+        self.assertEqual(split_target('::1'), ('::1', 443))
+        self.assertEqual(split_target('[::1]'), ('::1', 443))
+        self.assertEqual(split_target('[2001:db8::1]:8443'), ('2001:db8::1', 8443))
+
+
+if __name__ == '__main__':
+    unittest.main()